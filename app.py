@@ -1,12 +1,37 @@
 
+import os
+import re
+import tempfile
+import time
+from functools import partial
 import streamlit as st
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
 import numpy as np
 from PIL import Image
-import time
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from brain_tumor import (
+    BackgroundLoader,
+    BrainTumorClassifier,
+    InferenceScheduler,
+    PredictionCache,
+    StageTimer,
+    configure_tf_threads,
+    load_class_names,
+    preprocess_batch,
+)
+from brain_tumor.backends import BACKEND_ARTIFACTS, DEFAULT_BACKEND
+from brain_tumor.cascade import DEFAULT_STUDENT_PATH, CascadeClassifier
+from brain_tumor.evaluate import load_metrics, metrics_path_for
+from brain_tumor.inference import decode_resized, load_image_uint8, to_rgb_image
+from brain_tumor.tta import MAX_TTA_VIEWS, predict_tta
+from brain_tumor.gradcam import GradCAMExplainer, overlay_heatmap
+from brain_tumor.history import ScanHistory, image_hash
+from brain_tumor.memory import freeze_gc
+from brain_tumor.profiling import profile_model
+from brain_tumor.registry import DEFAULT_REGISTRY_DIR, ModelRegistry, load_manifest_classifier
+from brain_tumor.retrieval import DEFAULT_INDEX_DIR, Embedder, EmbeddingIndex
+from brain_tumor.telemetry import Telemetry, start_http_exporter, start_textfile_exporter
+from brain_tumor.volume import VOLUME_READERS, is_volume_path, make_thumbnail_strip, open_volume, predict_volume, readable_volume_extensions, windowed_slice
 
 # 🎨 Page config with wide layout
 st.set_page_config(
@@ -16,8 +41,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 🎨 Custom CSS for professional template
-st.markdown("""
+# 🎨 Custom CSS for professional template. Every full rerun re-sends it, so comments and indentation are
+# stripped once at import rather than shipped to the browser each time
+APP_CSS = """
 <style>
     /* New, refined color palette */
     :root {
@@ -239,16 +265,460 @@ st.markdown("""
         font-size: 12px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+APP_CSS = re.sub(r"\s+", " ", re.sub(r"/\*.*?\*/", "", APP_CSS, flags=re.S)).strip()
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# ⚙️ Inference tuning (environment variables)
+TF_INTRA_OP_THREADS = int(os.environ.get("BRAIN_TUMOR_INTRA_OP_THREADS", 0)) or None
+TF_INTER_OP_THREADS = int(os.environ.get("BRAIN_TUMOR_INTER_OP_THREADS", 0)) or None
+XLA_JIT = os.environ.get("BRAIN_TUMOR_XLA") == "1"
+SCHEDULER_MAX_BATCH_SIZE = int(os.environ.get("BRAIN_TUMOR_SCHEDULER_BATCH_SIZE", 32))
+SCHEDULER_MAX_WAIT_MS = float(os.environ.get("BRAIN_TUMOR_SCHEDULER_WAIT_MS", 2.0))
+# 🐣 Cascade: the distilled student answers confident scans, the rest escalate to InceptionV3 (off unless a threshold is set)
+CASCADE_THRESHOLD = os.environ.get("BRAIN_TUMOR_CASCADE_THRESHOLD")
+CASCADE_MARGIN = float(os.environ.get("BRAIN_TUMOR_CASCADE_MARGIN", 0.0))
+STUDENT_MODEL_PATH = os.environ.get("BRAIN_TUMOR_STUDENT_MODEL", DEFAULT_STUDENT_PATH)
+# 📚 Versioned models: manifests in the registry directory, the newest (or BRAIN_TUMOR_MODEL_VERSION) is served
+REGISTRY_DIR = os.environ.get("BRAIN_TUMOR_REGISTRY_DIR", DEFAULT_REGISTRY_DIR)
+REGISTRY_MAX_RESIDENT = int(os.environ.get("BRAIN_TUMOR_MAX_RESIDENT_MODELS", 2))
+MODEL_VERSION = os.environ.get("BRAIN_TUMOR_MODEL_VERSION")
+# 📊 Prometheus export of the operational metrics: an HTTP /metrics port and/or a textfile rewritten every 15s
+METRICS_PORT = int(os.environ.get("BRAIN_TUMOR_METRICS_PORT", 0)) or None
+METRICS_FILE = os.environ.get("BRAIN_TUMOR_METRICS_FILE")
+# 🔬 Opt-in layer profiler on the Settings page: reports and traces are written here
+PROFILE_DIR = os.environ.get("BRAIN_TUMOR_PROFILE_DIR")
+# 📜 Opt-in scan history (SQLite): predictions, never images, are kept here and browsable on the History page
+HISTORY_DB = os.environ.get("BRAIN_TUMOR_HISTORY_DB")
+# 🧊 Volume uploads are only offered for formats whose reader is installed (pydicom, nibabel)
+VOLUME_TYPES = [ext[1:] for ext in readable_volume_extensions()]
+SUPPORTED_VOLUME_FORMATS = "".join(label for label, ext in ((", DICOM (.dcm series)", 'dcm'), (", NIfTI (.nii, .nii.gz)", 'nii')) if ext in VOLUME_TYPES)
+MISSING_VOLUME_READERS = sorted({module for ext, module in VOLUME_READERS.items() if ext[1:] not in VOLUME_TYPES})
+
+# 📊 One metrics registry per process, shared by every session and the model loader
+@st.cache_resource
+def load_telemetry():
+    telemetry = Telemetry()
+    if METRICS_PORT:
+        start_http_exporter(telemetry, METRICS_PORT)
+    if METRICS_FILE:
+        start_textfile_exporter(telemetry, METRICS_FILE)
+    return telemetry
+
+@st.cache_resource
+def load_registry():
+    return ModelRegistry(REGISTRY_DIR, max_resident=REGISTRY_MAX_RESIDENT, factory=partial(load_manifest_classifier, jit_compile=XLA_JIT))
+
+# Version served at startup for this backend (None when no manifest is registered for it)
+def startup_version(registry, backend=DEFAULT_BACKEND):
+    return MODEL_VERSION or registry.latest_version(backend)
+
+# 🐣 The served model is wrapped in the cascade when a threshold is set
+def with_cascade(classifier, student):
+    if student is None:
+        return classifier
+    return CascadeClassifier(student, classifier, threshold=float(CASCADE_THRESHOLD), margin=CASCADE_MARGIN)
+
+# 🧬 Load classifier in a background thread at startup (cached, shared across sessions)
+# TensorFlow is only imported inside this thread, so pages that never touch the model render immediately.
+# Warm-up traces the compiled forward pass once, so the first user does not pay for it
+def create_classifier(backend, telemetry, registry):
+    try:
+        configure_tf_threads(TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS)
+        start = time.perf_counter()
+        version = startup_version(registry, backend)
+        if version:
+            # Registered versions are checksum-verified, and their class order comes from the manifest
+            classifier = registry.activate(version).get()
+        else:
+            classifier = BrainTumorClassifier(backend=backend, jit_compile=XLA_JIT, warmup=True)
+        telemetry.set_model_load(version or backend, time.perf_counter() - start)
+        student = None
+        if CASCADE_THRESHOLD:
+            start = time.perf_counter()
+            student = BrainTumorClassifier(model_path=STUDENT_MODEL_PATH, class_names=classifier.class_names, warmup=True)
+            telemetry.set_model_load('student', time.perf_counter() - start)
+        # Keep full GC passes during reruns from walking the model's objects. The registry thaws them again before it
+        # evicts a version, so a model swapped out later is still collected (after that, full passes walk the model)
+        freeze_gc()
+        return with_cascade(classifier, student)
+    except Exception as e:
+        telemetry.count_error('model_load', e)
+        raise
+
+# st.cache_resource keys on the arguments as passed (defaults are not filled in), so every caller passes the backend
+@st.cache_resource
+def start_model_loader(backend=DEFAULT_BACKEND):
+    telemetry = load_telemetry()
+    registry = load_registry()
+    return BackgroundLoader(lambda: create_classifier(backend, telemetry, registry)).start()
+
+# The scheduler holds the model currently served, which changes when another registry version is activated
+def load_classifier(backend=DEFAULT_BACKEND):
+    return load_scheduler(backend).classifier
+
+# 🚦 One scheduler per process: every session's requests share a queue and are batched together
+@st.cache_resource
+def create_scheduler(backend=DEFAULT_BACKEND):
+    return InferenceScheduler(
+        start_model_loader(backend).get(),
+        max_batch_size=SCHEDULER_MAX_BATCH_SIZE,
+        max_wait_ms=SCHEDULER_MAX_WAIT_MS
+    )
+
+def load_scheduler(backend=DEFAULT_BACKEND):
+    loader = start_model_loader(backend)
+    if loader.status == 'loading':
+        with st.spinner('⏳ Loading AI model...'):
+            loader.get()
+    loader.get()
+    return create_scheduler(backend)
+
+# 🔁 Load a registered version in the background, then hand new requests to it; queued ones finish on the old model
+def activate_model_version(version):
+    registry = load_registry()
+    manifest = registry.manifests(DEFAULT_BACKEND)[version]
+    # Result pages index predictions with the app's class order, so only versions sharing it can be served
+    if list(manifest['class_names']) != list(class_names):
+        raise ValueError(f"Model {version} orders its classes {manifest['class_names']}, the app expects {class_names}")
+    scheduler = create_scheduler(DEFAULT_BACKEND)
+    telemetry = load_telemetry()
+
+    def swap(classifier):
+        previous = scheduler.classifier
+        scheduler.swap(with_cascade(classifier, previous.student if isinstance(previous, CascadeClassifier) else None))
+        telemetry.set_model_load(version, registry.load_seconds.get(version, 0.0))
+
+    return registry.activate(version, on_swap=swap)
+
+# Artifact of the version being served, so its metrics file can be shown before the model has loaded
+def serving_artifact(backend=DEFAULT_BACKEND):
+    registry = load_registry()
+    manifests = registry.manifests(backend)
+    version = registry.active_version or startup_version(registry, backend)
+    return manifests[version]['artifact_path'] if version in manifests else BACKEND_ARTIFACTS[backend]
+
+# Backend comes from BRAIN_TUMOR_BACKEND: keras, tflite-fp16, tflite-int8 or onnx
+def load_trained_model(backend=DEFAULT_BACKEND):
+    return load_classifier(backend).model
+
+# 🟢 Live model status for the sidebar
+MODEL_STATUS = {
+    'loading': ('🟡', 'var(--meningioma-color)', '⏳ Loading model...'),
+    'ready': ('🟢', 'var(--success-color)', '✅ Model ready'),
+    'error': ('🔴', 'var(--error-color)', '❌ Model failed to load'),
+}
+
+def render_model_status(loader):
+    status = loader.status
+    dot, color, label = MODEL_STATUS[status]
+    detail = f"{loader.elapsed:.1f}s" + (" elapsed" if status == 'loading' else " load time")
+    if status == 'error':
+        detail = str(loader.error)[:120]
+    st.markdown(f"""
+    <div style="background: var(--card-background); padding: 1rem; border-radius: 10px; margin-bottom: 1rem; border-left: 4px solid {color}; border: 2px solid var(--border-color); box-shadow: 0 4px 15px rgba(0,0,0,0.08);">
+        <h4 style="color: var(--text-color); margin-bottom: 0.5rem; font-weight: 700; text-shadow: none;">{dot} Model Status</h4>
+        <p style="color: var(--secondary-text-color); margin: 0; font-size: 0.9rem; font-weight: 600; text-shadow: none;">{label}</p>
+        <p style="color: var(--secondary-text-color); margin: 0.2rem 0 0 0; font-size: 0.8rem; font-weight: 500; text-shadow: none;">⏱️ {detail}</p>
+        <p style="color: var(--secondary-text-color); margin: 0.2rem 0 0 0; font-size: 0.8rem; font-weight: 500; text-shadow: none;">🔒 Privacy protection active</p>
+    </div>
+    """, unsafe_allow_html=True)
+    # Once loading finishes, rerun the whole app so the fragment stops polling
+    if status != 'loading' and st.session_state.get('model_status_seen') == 'loading':
+        st.session_state['model_status_seen'] = status
+        st.rerun()
+    st.session_state['model_status_seen'] = status
+
+# 📊 Live operational metrics for the Settings page (rendered as a fragment that refreshes itself)
+def format_ms(value):
+    return "—" if value is None else f"{value:.1f} ms"
+
+def render_operational_metrics(telemetry):
+    snapshot = telemetry.snapshot()
+    rows = "".join(
+        f"<tr><td>{name}</td><td>{h['count']}</td><td>{format_ms(h['p50_ms'])}</td><td>{format_ms(h['p95_ms'])}</td><td>{format_ms(h['p99_ms'])}</td></tr>"
+        for name, h in sorted(snapshot['latency'].items())
+    ) or '<tr><td colspan="5">No scans analyzed yet</td></tr>'
+    counts = lambda values: ", ".join(f"{k} {n}" for k, n in sorted(values.items())) or "none"
+    loads = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in snapshot['model_load_seconds'].items()) or "not loaded yet"
+    exporters = [f"http://&lt;host&gt;:{METRICS_PORT}/metrics"] if METRICS_PORT else []
+    exporters += [METRICS_FILE] if METRICS_FILE else []
+    st.markdown(f"""
+    <div class="result-card fade-in">
+        <h3 style="color: var(--info-color); margin-bottom: 1rem;">📊 Operational Metrics</h3>
+        <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid var(--info-color);">
+            <table style="width: 100%; color: var(--text-color); font-size: 0.85rem; margin-bottom: 0.5rem;">
+                <tr><th>Kind / Stage</th><th>Samples</th><th>p50</th><th>p95</th><th>p99</th></tr>{rows}
+            </table>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Scans by Request Kind:</strong> {counts(snapshot['requests'])}</p>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Predictions by Class:</strong> {counts(snapshot['predictions'])}</p>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Errors:</strong> {counts(snapshot['errors'])}</p>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Model Load Time:</strong> {loads}</p>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Process Memory:</strong> {snapshot['rss_mb']:.0f} MB resident (peak {snapshot['peak_rss_mb']:.0f} MB)</p>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Prometheus Export:</strong> {", ".join(exporters) or 'Disabled (set BRAIN_TUMOR_METRICS_PORT or BRAIN_TUMOR_METRICS_FILE)'}</p>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    st.download_button("⬇️ Download metrics (Prometheus text)", telemetry.prometheus_text(), file_name="brain_tumor_metrics.prom", mime="text/plain")
+
+# 🔬 Profile the model behind load_trained_model: TF trace per layer/block plus cProfile of the predict path
+def render_profiler():
+    st.markdown("""
+    <div class="result-card fade-in">
+        <h3 style="color: var(--info-color); margin-bottom: 1rem;">🔬 Layer Profiler</h3>
+        <p style="color: var(--secondary-text-color); margin: 0;">Traces inference calls with the TensorFlow profiler and attributes CPU time and memory to each layer and InceptionV3 block.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    runs = st.slider("Profiled inference calls", min_value=5, max_value=100, value=20)
+    if st.button("🔬 Profile model"):
+        classifier = load_classifier(DEFAULT_BACKEND)
+        classifier = classifier.teacher if isinstance(classifier, CascadeClassifier) else classifier
+        with st.spinner(f"Profiling {runs} inference calls..."):
+            output_dir = os.path.join(PROFILE_DIR, datetime.now().strftime("%Y%m%d-%H%M%S"))
+            st.session_state['profile_report'] = profile_model(classifier, synthetic_profile_scan(), runs, output_dir=output_dir)
+    report = st.session_state.get('profile_report')
+    if report is None:
+        return
+    graph, python = report['graph'], report['python']
+    col1, col2, col3 = st.columns(3)
+    col1.metric("⏱️ Forward p50", f"{graph['forward_ms']['p50_ms']:.1f} ms")
+    col2.metric("🧮 TF Kernels", f"{graph['kernel_ms_per_call']:.1f} ms")
+    col3.metric("🐍 Python Overhead", f"{python['overhead_ms']:.1f} ms")
+    st.dataframe(graph['blocks'], use_container_width=True, hide_index=True)
+    st.dataframe(graph['layers'][:25], use_container_width=True, hide_index=True)
+    st.dataframe(python['functions'], use_container_width=True, hide_index=True)
+    st.caption(f"Trace files in {os.path.dirname(graph['trace_path'])}: trace.json (Perfetto), predict.prof (pstats), trace/ (TensorBoard)")
+    with open(graph['trace_path'], 'rb') as f:
+        st.download_button("⬇️ Download trace (Perfetto / chrome://tracing)", f.read(), file_name="trace.json", mime="application/json")
+
+@st.cache_data
+def synthetic_profile_scan():
+    from brain_tumor.benchmark import synthetic_scan
+    return synthetic_scan(512)
+
+# 📚 Registered versions: activate one without a restart, or compare two side by side on the same scans
+def render_model_registry():
+    registry = load_registry()
+    manifests = registry.manifests(DEFAULT_BACKEND)
+    activation = registry.activation
+    activation_status = f"{activation.status} ({activation.elapsed:.1f}s)" if activation else "—"
+    if activation is not None and activation.status == 'error':
+        activation_status = f"error: {str(activation.error)[:120]}"
+    st.markdown(f"""
+    <div class="result-card fade-in">
+        <h3 style="color: var(--info-color); margin-bottom: 1rem;">📚 Model Registry</h3>
+        <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid var(--info-color);">
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Serving:</strong> {registry.active_version or 'loading...'}</p>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Resident Models:</strong> at most {registry.max_resident} (least recently used evicted first)</p>
+            <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Last Activation:</strong> {activation_status}</p>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    st.dataframe(registry.status(DEFAULT_BACKEND), use_container_width=True, hide_index=True)
+    for name, error in registry.invalid.items():
+        st.warning(f"⚠️ Skipped manifest {name}: {error}")
+
+    versions = list(manifests)
+    active_index = versions.index(registry.active_version) if registry.active_version in versions else len(versions) - 1
+    col1, col2 = st.columns([3, 1])
+    version = col1.selectbox("Version to serve", versions, index=active_index)
+    col2.markdown("<br>", unsafe_allow_html=True)
+    if col2.button("🔁 Activate", disabled=version == registry.active_version):
+        try:
+            activate_model_version(version)
+            st.toast(f"Loading {version}; requests keep going to {registry.active_version} until it is ready")
+        except ValueError as e:
+            st.error(f"❌ {e}")
+
+    st.markdown("#### 🆚 A/B Comparison")
+    col1, col2 = st.columns(2)
+    version_a = col1.selectbox("Model A", versions, index=active_index)
+    version_b = col2.selectbox("Model B", versions, index=(active_index - 1) % len(versions))
+    scans = st.file_uploader("Scans to compare", type=['png', 'jpg', 'jpeg'], accept_multiple_files=True, key="ab_scans")
+    if scans and st.button("🆚 Compare"):
+        imgs = [Image.open(scan) for scan in scans]
+        scheduler = load_scheduler()
+        results = {}
+        with st.spinner(f"Scoring {len(imgs)} scans with {version_a} and {version_b}..."):
+            # Both versions run on the shared scheduler (each request bound to its version), never on this thread
+            for version in dict.fromkeys((version_a, version_b)):
+                classifier = registry.get(version)
+                start = time.perf_counter()
+                preds, _ = predict_images(imgs, scheduler, classifier, StageTimer(), SCHEDULER_MAX_BATCH_SIZE)
+                results[version] = (classifier, preds, time.perf_counter() - start)
+        (classifier_a, preds_a, seconds_a), (classifier_b, preds_b, seconds_b) = results[version_a], results[version_b]
+        rows = []
+        for scan, p_a, p_b in zip(scans, preds_a, preds_b):
+            top_a, conf_a = classifier_a.top_class(p_a)
+            top_b, conf_b = classifier_b.top_class(p_b)
+            rows.append({'scan': scan.name, f'A ({version_a})': top_a, 'A confidence': f"{conf_a * 100:.1f}%",
+                         f'B ({version_b})': top_b, 'B confidence': f"{conf_b * 100:.1f}%", 'agree': top_a == top_b})
+        # Probabilities are compared class by class, so versions with different class orders still line up
+        p_b_aligned = preds_b[:, [classifier_b.class_names.index(c) for c in classifier_a.class_names]] \
+            if set(classifier_a.class_names) == set(classifier_b.class_names) else None
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("🤝 Agreement", f"{sum(row['agree'] for row in rows) / len(rows) * 100:.0f}%")
+        col2.metric("📐 Mean |Δp|", f"{np.abs(preds_a - p_b_aligned).mean():.3f}" if p_b_aligned is not None else "—")
+        col3.metric(f"⏱️ A ({version_a})", f"{seconds_a / len(imgs) * 1000:.0f} ms/scan")
+        col4.metric(f"⏱️ B ({version_b})", f"{seconds_b / len(imgs) * 1000:.0f} ms/scan")
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        metrics_a, metrics_b = (load_model_metrics(manifests[v]['artifact_path']) for v in (version_a, version_b))
+        st.caption(f"Held-out accuracy / macro F1 — A: {format_metric(metrics_a, 'accuracy')} / {format_metric(metrics_a, 'macro_f1')}, "
+                   f"B: {format_metric(metrics_b, 'accuracy')} / {format_metric(metrics_b, 'macro_f1')} (python -m brain_tumor.evaluate)")
+
+# 📜 Scan history: rows go on the writer thread's queue, so recording never waits on SQLite
+@st.cache_resource
+def load_history():
+    return ScanHistory(HISTORY_DB)
+
+def model_version(classifier):
+    if isinstance(classifier, CascadeClassifier):
+        return f"{model_version(classifier.teacher)}+cascade"
+    return getattr(classifier, 'version', None) or classifier.model_id
+
+# Each scan is (upload bytes, file name, softmax vector); timings are those of the request it was part of
+def record_history(kind, scans, classifier, timings):
+    if not HISTORY_DB:
+        return
+    history = load_history()
+    version = model_version(classifier)
+    for data, filename, preds in scans:
+        history.record(image_hash(data), preds, classifier.class_names, version, kind=kind, filename=filename, timings=timings)
+
+# One page at a time: the cursor of every page visited is kept so "Newer" can step back without an OFFSET scan
+def render_history():
+    history = load_history()
+    col1, col2, col3, col4 = st.columns([2, 3, 3, 1])
+    top_class = col1.selectbox("Class", ["All"] + list(class_names), format_func=lambda c: class_info.get(c, {}).get('name', c))
+    low, high = col2.slider("Confidence (%)", 0, 100, (0, 100))
+    today = datetime.now().date()
+    dates = col3.date_input("Analyzed between", (today - timedelta(days=30), today))
+    page_size = col4.selectbox("Rows", [25, 50, 100], index=1)
+    # While a range is being picked the widget holds only its first day
+    since, until = (dates + dates)[:2] if dates else (None, None)
+    filters = {
+        'top_class': None if top_class == "All" else top_class,
+        'min_confidence': low / 100 if low > 0 else None,
+        'max_confidence': high / 100 if high < 100 else None,
+        'since': datetime.combine(since, datetime.min.time()).timestamp() if since else None,
+        'until': datetime.combine(until + timedelta(days=1), datetime.min.time()).timestamp() if until else None,
+    }
+    if st.session_state.get('history_filters') != (filters, page_size):
+        st.session_state['history_filters'] = (filters, page_size)
+        st.session_state['history_cursors'] = [None]
+    cursors = st.session_state['history_cursors']
+    rows, next_cursor = history.page(page_size, cursors[-1], **filters)
+    if not rows:
+        st.info("No scans match these filters.")
+
+    st.dataframe([{
+        'analyzed': datetime.fromtimestamp(row['analyzed_at']).strftime("%Y-%m-%d %H:%M:%S"),
+        'file': row['filename'] or row['image_hash'][:16],
+        'prediction': class_info.get(row['top_class'], {}).get('name', row['top_class']),
+        'confidence': f"{row['confidence'] * 100:.1f}%",
+        **{cls: f"{p * 100:.1f}%" for cls, p in row['preds'].items()},
+        'model': row['model_version'],
+        'kind': row['kind'],
+        'analyses': row['analyses'],
+        'time': format_ms(sum(row['timings'].values()) * 1000),
+    } for row in rows], use_container_width=True, hide_index=True)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("◀ Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col2.caption(f"Page {len(cursors)} · {history.written} scans recorded this session, {history.pending} pending"
+                 + (f", {history.dropped} dropped" if history.dropped else "")
+                 + (f", {history.errors} failed ({history.last_error})" if history.errors else ""))
+    if col3.button("Older ▶", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+# 🗄️ Prediction cache keyed by upload bytes + model identity (survives reruns, shared across sessions)
+@st.cache_resource
+def load_prediction_cache():
+    return PredictionCache(max_entries=512, disk_dir=os.environ.get("BRAIN_TUMOR_CACHE_DIR"))
+
+# 🔥 Grad-CAM explainer over the loaded Keras model (combined activations + softmax pass)
+GRADCAM_AVAILABLE = DEFAULT_BACKEND == 'keras'
+
+# One explainer per resident model version (the leading underscore keeps the classifier out of the cache key)
+@st.cache_resource(max_entries=REGISTRY_MAX_RESIDENT)
+def create_explainer(model_id, _classifier):
+    return GradCAMExplainer(_classifier.model)
+
+def load_explainer(classifier):
+    return create_explainer(classifier.model_id, classifier)
+
+# Heatmaps are cached per image hash, separately from predictions
+@st.cache_resource
+def load_gradcam_cache():
+    cache_dir = os.environ.get("BRAIN_TUMOR_CACHE_DIR")
+    return PredictionCache(max_entries=512, disk_dir=os.path.join(cache_dir, "gradcam") if cache_dir else None)
+
+def gradcam_model_id(classifier, explainer):
+    return f"{classifier.model_id}:gradcam:{explainer.layer_name}"
+
+# 🔍 Similar-case retrieval over a prebuilt reference index (python -m brain_tumor.retrieval build)
+INDEX_DIR = os.environ.get("BRAIN_TUMOR_INDEX_DIR", DEFAULT_INDEX_DIR)
+RETRIEVAL_AVAILABLE = DEFAULT_BACKEND == 'keras' and os.path.exists(os.path.join(INDEX_DIR, "meta.json"))
 
-# 🧬 Load model (cached for speed)
 @st.cache_resource
-def load_trained_model():
+def load_reference_index():
+    return EmbeddingIndex(INDEX_DIR)
+
+# Embeddings are only comparable within one model: the index must have been built by the model being served.
+# Indexes written without a model_id cannot be checked and are trusted
+def index_model_mismatch(classifier):
+    model_id = load_reference_index().meta.get('model_id')
+    return model_id if model_id and model_id != classifier.model_id else None
+
+# The build has to load the served model the same way the app does, or the ids still differ: by registry version when
+# one is served (its id comes from the manifest), otherwise from the model file
+def rebuild_index_command(classifier):
+    command = "python -m brain_tumor.retrieval build <reference dir>"
+    if getattr(classifier, 'version', None):
+        command += f" --version {classifier.version}"
+        if REGISTRY_DIR != DEFAULT_REGISTRY_DIR:
+            command += f" --registry {REGISTRY_DIR}"
+    else:
+        command += f" --model {classifier.model_path}"
+    if INDEX_DIR != DEFAULT_INDEX_DIR:
+        command += f" --index {INDEX_DIR}"
+    return command
+
+@st.cache_resource(max_entries=REGISTRY_MAX_RESIDENT)
+def create_embedder(model_id, _classifier):
+    return Embedder(_classifier.model, _classifier.input_size)
+
+def load_embedder(classifier):
+    return create_embedder(classifier.model_id, classifier)
+
+@st.cache_resource
+def load_embedding_cache():
+    cache_dir = os.environ.get("BRAIN_TUMOR_CACHE_DIR")
+    return PredictionCache(max_entries=512, disk_dir=os.path.join(cache_dir, "embeddings") if cache_dir else None)
+
+# 📈 Metrics written next to the model by `python -m brain_tumor.evaluate` (re-read only when the file changes)
+@st.cache_data
+def read_model_metrics(model_path, mtime_ns):
+    return load_metrics(model_path)
+
+def load_model_metrics(model_path):
     try:
-        # Load .keras model first, then .h5 as fallback
-        return load_model("models/brain_tumor_inceptionv3.keras")
-    except Exception:
-        return load_model("models/brain_tumor_inceptionv3.h5")
+        mtime_ns = os.stat(metrics_path_for(model_path)).st_mtime_ns
+    except OSError:
+        return None
+    return read_model_metrics(model_path, mtime_ns)
+
+def format_metric(metrics, key):
+    return f"{metrics[key] * 100:.1f}%" if metrics else "—"
+
+def format_response_time(metrics):
+    latency = metrics and metrics['throughput'].get('single_scan_ms')
+    if not latency:
+        return "—"
+    return f"{latency['p50_ms'] / 1000:.2f}s" if latency['p50_ms'] >= 1000 else f"{latency['p50_ms']:.0f} ms"
 
 # 🏷 Class names with detailed descriptions
 class_info = {
@@ -290,55 +760,588 @@ class_info = {
     }
 }
 
-class_names = list(class_info.keys())
+class_names = load_class_names()
 
 # Force default page on first visit or reload
 if 'navigation_menu' not in st.session_state:
     st.session_state['navigation_menu'] = "🏠 Home"
 
-# 📊 Enhanced predict function with progress
-def predict_image(img, model):
-    img = img.resize((224, 224))  # match model input size
-    img_array = image.img_to_array(img) / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
-    
-    # Add loading animation
-    with st.spinner('🔬 Analyzing MRI image...'):
-        time.sleep(1)  # Simulate processing time
-        preds = model.predict(img_array, verbose=0)[0]
-    
+# ⏱️ Analysis stages shown in the progress bar, in pipeline order
+ANALYSIS_STAGES = {
+    "cache": "Checking prediction cache...",
+    "decode": "Loading image...",
+    "preprocess": "Preprocessing...",
+    "inference": "Running AI analysis...",
+    "search": "Finding similar cases...",
+    "render": "Generating results...",
+}
+
+def stage_progress(name, fraction=0.0):
+    return int((list(ANALYSIS_STAGES).index(name) + fraction) * 100 / len(ANALYSIS_STAGES))
+
+def update_stage_progress(name, progress_bar, status_text):
+    status_text.text(ANALYSIS_STAGES[name])
+    progress_bar.progress(stage_progress(name))
+
+# 📊 Predict function with real per-stage timings. The classifier is the one the request's cache keys were
+# computed for; the scheduler runs it even if another model version has been activated since
+def predict_image(img, scheduler, classifier, timer):
+    with timer.stage("preprocess"):
+        img_array = np.expand_dims(classifier.preprocess(img), axis=0)
+    with timer.stage("inference"):
+        preds = scheduler.predict(img_array, classifier=classifier)[0]
     return preds
 
-# 📈 Create beautiful charts using Streamlit components
+# 🎲 Test-time augmentation: all views of a scan go through the scheduler as one forward pass
+def predict_image_tta(img, scheduler, classifier, timer, num_views):
+    with timer.stage("preprocess"):
+        img_array = load_image_uint8(img, classifier.input_size)[np.newaxis]
+    with timer.stage("inference"):
+        preds, spread = predict_tta(partial(scheduler.predict, classifier=classifier), img_array, num_views)
+    return preds[0], spread[0]
+
+# 📦 Batch prediction through the shared scheduler, in chunks of at most batch_size model rows
+def predict_images(imgs, scheduler, classifier, timer, batch_size, tta_views=0, progress_callback=None):
+    if tta_views:
+        with timer.stage("preprocess"):
+            img_batch = np.stack([load_image_uint8(img, classifier.input_size) for img in imgs])
+        with timer.stage("inference"):
+            chunk = max(1, batch_size // tta_views)
+            preds, spreads = [], []
+            for start in range(0, len(img_batch), chunk):
+                p, s = predict_tta(partial(scheduler.predict, classifier=classifier), img_batch[start:start + chunk], tta_views)
+                preds.append(p)
+                spreads.append(s)
+                if progress_callback:
+                    progress_callback(min(start + chunk, len(img_batch)), len(img_batch))
+        return np.concatenate(preds), np.concatenate(spreads)
+
+    with timer.stage("preprocess"):
+        img_batch = preprocess_batch(imgs, classifier.input_size)
+    with timer.stage("inference"):
+        # Each chunk goes through the shared scheduler, which may merge it with other sessions' work
+        futures = [scheduler.submit(img_batch[i:i + batch_size], classifier) for i in range(0, len(img_batch), batch_size)]
+        results = []
+        for done, future in enumerate(futures, 1):
+            results.append(future.result())
+            if progress_callback:
+                progress_callback(min(done * batch_size, len(img_batch)), len(img_batch))
+    return np.concatenate(results), None
+
+# TTA results are cached separately (softmax mean and view spread stacked) so they never mix with plain ones
+def prediction_model_id(classifier, tta_views=0):
+    return f"{classifier.model_id}:tta{tta_views}" if tta_views else classifier.model_id
+
+# 🔥 Prediction and Grad-CAM heatmaps from one forward/backward pass (no separate predict call)
+def explain_images(imgs, classifier, explainer, timer, batch_size=32, progress_callback=None):
+    with timer.stage("preprocess"):
+        img_batch = preprocess_batch(imgs, classifier.input_size)
+    with timer.stage("inference"):
+        probs, cams = [], []
+        for start in range(0, len(img_batch), batch_size):
+            p, c = explainer.explain(img_batch[start:start + batch_size], batch_size)
+            probs.append(p)
+            cams.append(c)
+            if progress_callback:
+                progress_callback(min(start + batch_size, len(img_batch)), len(img_batch))
+    return np.concatenate(probs), np.concatenate(cams)
+
+# 🔍 Embedding and softmax from one forward pass, then a top-k search of the reference index
+def embed_images(imgs, classifier, embedder, timer):
+    with timer.stage("preprocess"):
+        img_batch = preprocess_batch(imgs, classifier.input_size)
+    with timer.stage("inference"):
+        return embedder.embed(img_batch)
+
+def find_similar_cases(embedding, timer, k=4):
+    with timer.stage("search"):
+        index = load_reference_index()
+        scores, ids = index.search(embedding[np.newaxis], k)
+        return index.lookup(ids[0], scores[0])
+
+# ⏱️ Per-stage latency breakdown for the result panel
+def create_timing_breakdown(timings, cache_hits=0):
+    total = sum(timings.values())
+    cache_note = f"""
+        <p style="color: var(--success-color); text-align: center; margin: 0.3rem 0;">⚡ {cache_hits} result(s) served from the prediction cache</p>""" if cache_hits else ""
+    rows = "".join(f"""
+            <div style="display: flex; justify-content: space-between; margin: 0.3rem 0;">
+                <span style="color: var(--text-color); font-weight: 600;">{ANALYSIS_STAGES.get(name, name).rstrip('.')}</span>
+                <span style="color: var(--secondary-text-color);">{seconds * 1000:.1f} ms ({seconds / total * 100 if total else 0:.0f}%)</span>
+            </div>""" for name, seconds in timings.items())
+    st.markdown(f"""
+    <div class="result-card">
+        <h4 style="color: var(--text-color); text-align: center;">⏱️ Latency Breakdown</h4>{cache_note}{rows}
+        <div style="display: flex; justify-content: space-between; margin-top: 0.8rem; border-top: 1px solid var(--border-color); padding-top: 0.5rem;">
+            <span style="color: var(--text-color); font-weight: 700;">Total</span>
+            <span style="color: var(--text-color); font-weight: 700;">{total * 1000:.1f} ms</span>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+# 📋 Per-file results table for batch analysis
+def create_results_table(file_names, preds, spreads=None):
+    rows = []
+    for i, (file_name, p) in enumerate(zip(file_names, preds)):
+        top_idx = int(np.argmax(p))
+        row = {
+            "File": file_name,
+            "Prediction": class_info.get(class_names[top_idx], {}).get('name', 'Unknown'),
+            "Confidence (%)": round(float(p[top_idx]) * 100, 1),
+        }
+        if spreads is not None:
+            row["TTA Spread (±%)"] = round(float(spreads[i][top_idx]) * 100, 1)
+        for idx, cls in enumerate(class_names):
+            row[f"{class_info.get(cls, {}).get('name', cls)} (%)"] = round(float(p[idx]) * 100, 1)
+        rows.append(row)
+    return rows
+
+# 📈 Confidence bars for every class, emitted as one element (one message per result instead of one per class).
+# The markup is unindented so the joined bars stay a single HTML block
+PREDICTION_CHART_HEADER = """<div class="result-card">
+<h4 style="color: var(--text-color); text-align: center;">📊 Prediction Confidence by Class</h4>
+</div>"""
+PREDICTION_BAR = """<div style="background: var(--card-background); padding: 1rem; border-radius: 10px; margin: 0.5rem 0; border-left: 4px solid {color}; box-shadow: 0 2px 10px rgba(0,0,0,0.05);">
+<div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 0.5rem;">
+<span style="font-size: 1.1rem; font-weight: 600; color: var(--text-color);">{icon} {name}</span>
+<span style="font-weight: bold; color: {color}; font-size: 1.2rem;">{percent:.1f}%</span>
+</div>
+<div class="custom-progress">
+<div class="custom-progress-fill" style="background: {color}; width: {percent}%;">{percent:.1f}%</div>
+</div>
+</div>"""
+
 def create_prediction_chart(preds):
-    # Create a simple bar chart using Streamlit's built-in components
+    bars = []
+    for idx in np.argsort(preds)[::-1]:
+        info = class_info.get(class_names[idx], {})
+        bars.append(PREDICTION_BAR.format(color=info.get('color', '#546E7A'), icon=info.get('icon', '❓'),
+                                          name=info.get('name', 'Unknown'), percent=preds[idx] * 100))
+    st.markdown(PREDICTION_CHART_HEADER + "\n" + "\n".join(bars), unsafe_allow_html=True)
+
+# 🔍 Nearest confirmed reference scans, shown next to the prediction chart
+def create_similar_cases(matches):
     st.markdown("""
     <div class="result-card">
-        <h4 style="color: var(--text-color); text-align: center;">📊 Prediction Confidence by Class</h4>
+        <h4 style="color: var(--text-color); text-align: center;">🔍 Similar Reference Cases</h4>
     </div>
     """, unsafe_allow_html=True)
-    
-    # Sort predictions for better visualization
-    sorted_indices = np.argsort(preds)[::-1]
-    
-    for idx in sorted_indices:
-        cls = class_names[idx]
-        prob = preds[idx]
-        color = class_info.get(cls, {}).get('color', '#546E7A')
-        icon = class_info.get(cls, {}).get('icon', '❓')
-        name = class_info.get(cls, {}).get('name', 'Unknown')
-        
+    if not matches:
+        st.info("No reference cases found.")
+        return
+    columns = st.columns(len(matches))
+    for column, match in zip(columns, matches):
+        with column:
+            name = class_info.get(match['class'], {}).get('name', match['class'] or 'Unlabeled')
+            caption = f"{name} · {match['similarity']:.2f}"
+            if os.path.exists(match['path']):
+                st.image(match['path'], use_container_width=True, caption=caption)
+            else:
+                st.caption(caption)
+
+# 🧊 One volume (a NIfTI file or a DICOM series) streamed slice by slice through the shared scheduler
+def render_volume(volume_files):
+    label = volume_files[0].name if len(volume_files) == 1 else f"DICOM series of {len(volume_files)} files"
+    st.markdown(f"""
+    <div class="success-indicator fade-in">
+        ✅ Volume uploaded successfully ({label})! Streaming slices through the model...
+    </div>
+    """, unsafe_allow_html=True)
+
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+
+    def update_volume_progress(done, total):
+        status_text.text(f"Running AI analysis... slice {done}/{total}")
+        progress_bar.progress(int(done * 100 / total))
+
+    try:
+        scheduler = load_scheduler()
+        classifier = scheduler.classifier
+        status_text.text("Reading volume...")
+        # Volumes are memory-mapped from disk, so uploads are spilled to a temporary directory first
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for f in volume_files:
+                path = os.path.join(tmp_dir, os.path.basename(f.name))
+                with open(path, 'wb') as out:
+                    out.write(f.getvalue())
+                paths.append(path)
+            volume = open_volume(paths)
+            result = predict_volume(
+                classifier, volume,
+                predict_fn=partial(scheduler.predict, classifier=classifier),
+                progress_callback=update_volume_progress
+            )
+            peak_slice = Image.fromarray(windowed_slice(volume, result['max_slice'], result['window']))
+            del volume
+    except Exception as e:
+        load_telemetry().count_error('volume', e)
+        st.error(f"Error during volume analysis: {str(e)}")
+        return
+    telemetry = load_telemetry()
+    telemetry.count_request('volume', result['num_slices'])
+    telemetry.count_predictions([result['max_class']])
+    telemetry.observe('volume', 'inference', result['seconds'])
+    # A volume is one history entry: its files' bytes, scored by the peak slice
+    record_history('volume', [(b"".join(f.getvalue() for f in volume_files), ", ".join(f.name for f in volume_files),
+                               result['slice_probs'][result['max_slice']])], classifier, {'inference': result['seconds']})
+
+    progress_bar.progress(100)
+    status_text.text("Analysis complete")
+    peak_info = class_info.get(result['max_class'], {})
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("🧠 Slices Analyzed", result['num_slices'])
+    col2.metric("🎯 Peak Finding", f"{peak_info.get('name', 'Unknown')} {result['max_probability'] * 100:.1f}%")
+    col3.metric("⚡ Throughput", f"{result['num_slices'] / result['seconds']:.1f} slices/s")
+
+    col1, col2 = st.columns([1, 1])
+    with col1:
         st.markdown(f"""
-        <div style="background: var(--card-background); padding: 1rem; border-radius: 10px; margin: 0.5rem 0; border-left: 4px solid {color}; box-shadow: 0 2px 10px rgba(0,0,0,0.05);">
-            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 0.5rem;">
-                <span style="font-size: 1.1rem; font-weight: 600; color: var(--text-color);">{icon} {name}</span>
-                <span style="font-weight: bold; color: {color}; font-size: 1.2rem;">{prob*100:.1f}%</span>
-            </div>
-            <div class="custom-progress">
-                <div class="custom-progress-fill" style="background: {color}; width: {prob*100}%;">
-                    {prob*100:.1f}%
+        <div class="result-card">
+            <h3 style="color: var(--text-color); text-align: center;">📷 Peak Slice {result['max_slice']}</h3>
+        </div>
+        """, unsafe_allow_html=True)
+        st.image(peak_slice, use_container_width=True, caption=f"{peak_info.get('icon', '❓')} {peak_info.get('name', 'Unknown')}: {result['max_probability'] * 100:.1f}%")
+    with col2:
+        st.markdown("""
+        <div class="result-card">
+            <h3 style="color: var(--text-color); text-align: center;">📈 Class Probability Along the Z-Axis</h3>
+        </div>
+        """, unsafe_allow_html=True)
+        st.line_chart(
+            {class_info.get(c, {}).get('name', c): result['slice_probs'][:, i] for i, c in enumerate(class_names)},
+            x_label="Slice",
+            y_label="Probability",
+            color=[class_info.get(c, {}).get('color', '#546E7A') for c in class_names]
+        )
+
+    st.markdown("""
+    <div class="result-card">
+        <h3 style="color: var(--text-color); text-align: center;">🎞 Slice Overview</h3>
+    </div>
+    """, unsafe_allow_html=True)
+    st.image(
+        make_thumbnail_strip(result['thumbnails']),
+        use_container_width=True,
+        caption="Slices " + ", ".join(str(z) for z, _ in result['thumbnails'])
+    )
+
+# 🔍 Upload, options and results of the Analyze page. Run as a fragment, so changing an option or uploading
+# another scan re-renders only this panel, not the CSS, sidebar and page header
+def render_analyze():
+    uploaded_files = st.file_uploader(
+        "Choose MRI images",
+        type=['jpg', 'png', 'jpeg', *VOLUME_TYPES],
+        accept_multiple_files=True,
+        help="Upload one brain MRI image for a detailed report, a batch of images, or a volume (NIfTI file or DICOM series)"
+             + (f". Install {' and '.join(MISSING_VOLUME_READERS)} to read the missing volume formats" if MISSING_VOLUME_READERS else "")
+    )
+    show_gradcam = st.toggle(
+        "🔥 Show Grad-CAM heatmaps",
+        value=False,
+        disabled=not GRADCAM_AVAILABLE,
+        help="Highlight the regions that drove the prediction (Keras backend only)"
+    )
+    tta_views = 0
+    if st.toggle("🎲 Test-time augmentation", value=False, help="Average the prediction over flipped, rotated and cropped views of each scan, and report how much the views disagree"):
+        tta_views = st.slider("Augmented views per scan", min_value=2, max_value=MAX_TTA_VIEWS, value=8)
+    show_similar = st.toggle(
+        "🔍 Show similar cases",
+        value=False,
+        disabled=not RETRIEVAL_AVAILABLE,
+        help="Find the closest confirmed scans in the reference index (Keras backend, needs an index built with brain_tumor.retrieval)"
+    )
+
+    # DICOM files form one series, every NIfTI file is a volume of its own, and 2D images take the image paths
+    dicom_files = [f for f in uploaded_files if f.name.lower().endswith('.dcm')]
+    volumes = ([dicom_files] if dicom_files else []) + [[f] for f in uploaded_files if is_volume_path(f.name) and not f.name.lower().endswith('.dcm')]
+    image_files = [f for f in uploaded_files if not is_volume_path(f.name)]
+
+    for volume_files in volumes:
+        render_volume(volume_files)
+
+    if len(image_files) > 1:
+        batch_size = st.select_slider(
+            "⚙️ Inference batch size",
+            options=[1, 2, 4, 8, 16, 32, 64],
+            value=16,
+            help="Number of scans sent to the model per forward pass"
+        )
+
+        st.markdown(f"""
+        <div class="success-indicator fade-in">
+            ✅ {len(image_files)} MRI scans uploaded successfully! Processing your study...
+        </div>
+        """, unsafe_allow_html=True)
+
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+
+        try:
+            scheduler = load_scheduler()
+            classifier = scheduler.classifier
+            cache = load_prediction_cache()
+            timer = StageTimer(on_stage=lambda name: update_stage_progress(name, progress_bar, status_text))
+
+            def update_progress(done, total):
+                status_text.text(f"Running AI analysis... {done}/{total} scans")
+                progress_bar.progress(stage_progress("inference", done / total))
+
+            # Only scans the cache has not seen go through the model
+            with timer.stage("cache"):
+                cache_keys = [cache.make_key(f.getvalue(), prediction_model_id(classifier, tta_views)) for f in image_files]
+                cached = [cache.get(key) for key in cache_keys]
+                if show_gradcam:
+                    explainer = load_explainer(classifier)
+                    gradcam_cache = load_gradcam_cache()
+                    cam_keys = [gradcam_cache.make_key(f.getvalue(), gradcam_model_id(classifier, explainer)) for f in image_files]
+                    cams = [gradcam_cache.get(key) for key in cam_keys]
+                else:
+                    cams = [None] * len(image_files)
+                missing = [i for i, p in enumerate(cached) if p is None or (show_gradcam and cams[i] is None)]
+            preds = np.empty((len(image_files), len(class_names)), dtype=np.float32)
+            spreads = np.zeros_like(preds) if tta_views else None
+            for i, p in enumerate(cached):
+                if p is not None:
+                    if tta_views:
+                        preds[i], spreads[i] = p
+                    else:
+                        preds[i] = p
+
+            if missing:
+                with timer.stage("decode"):
+                    imgs = [decode_resized(image_files[i].getvalue(), classifier.input_size, draft=classifier.fast_decode) for i in missing]
+                if show_gradcam:
+                    # One combined pass yields both the plain predictions and the heatmaps
+                    explained_preds, missing_cams = explain_images(imgs, classifier, explainer, timer, batch_size, update_progress)
+                    for i, cam in zip(missing, missing_cams):
+                        cams[i] = cam
+                        gradcam_cache.put(cam_keys[i], cam)
+                if show_gradcam and not tta_views:
+                    preds[missing] = explained_preds
+                    for i in missing:
+                        cache.put(cache_keys[i], preds[i])
+                else:
+                    todo = [i for i in missing if cached[i] is None]
+                    if todo:
+                        decoded = dict(zip(missing, imgs))
+                        todo_preds, todo_spreads = predict_images([decoded[i] for i in todo], scheduler, classifier, timer, batch_size, tta_views, update_progress)
+                        preds[todo] = todo_preds
+                        if tta_views:
+                            spreads[todo] = todo_spreads
+                        for i in todo:
+                            cache.put(cache_keys[i], np.stack([preds[i], spreads[i]]) if tta_views else preds[i])
+            elapsed = timer.total
+
+            with timer.stage("render"):
+                col1, col2, col3 = st.columns(3)
+                col1.metric("🧠 Scans Analyzed", len(image_files))
+                col2.metric("⏱️ Total Time", f"{elapsed:.2f}s")
+                col3.metric("⚡ Throughput", f"{len(image_files) / elapsed:.1f} images/s")
+
+                st.markdown("""
+                <div class="result-card">
+                    <h3 style="color: var(--text-color); text-align: center;">📋 Batch Results</h3>
                 </div>
-            </div>
+                """, unsafe_allow_html=True)
+                st.dataframe(
+                    create_results_table([f.name for f in image_files], preds, spreads),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+                if show_gradcam:
+                    st.markdown("""
+                    <div class="result-card">
+                        <h3 style="color: var(--text-color); text-align: center;">🔥 Grad-CAM Heatmaps</h3>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    gallery = st.columns(4)
+                    for i, (f, cam) in enumerate(zip(image_files, cams)):
+                        top_cls = class_names[int(np.argmax(preds[i]))]
+                        gallery[i % 4].image(
+                            overlay_heatmap(to_rgb_image(f.getvalue()), cam),
+                            caption=f"{f.name}: {class_info.get(top_cls, {}).get('name', 'Unknown')}",
+                            use_container_width=True
+                        )
+
+            progress_bar.progress(100)
+            status_text.text("Analysis complete")
+            create_timing_breakdown(timer.timings, cache_hits=len(image_files) - len(missing))
+            telemetry = load_telemetry()
+            telemetry.count_request('batch', len(image_files))
+            telemetry.count_predictions([class_names[i] for i in preds.argmax(axis=1)])
+            telemetry.observe_timings('batch', timer.timings)
+            # Only scans that went through the model are new to the history; cache hits are already in it
+            record_history('batch', [(image_files[i].getvalue(), image_files[i].name, preds[i]) for i in missing],
+                           classifier, timer.timings)
+
+        except Exception as e:
+            load_telemetry().count_error('batch', e)
+            st.error(f"Error during prediction: {str(e)}")
+
+    elif image_files:
+        uploaded_file = image_files[0]
+
+        # Show upload success
+        st.markdown("""
+        <div class="success-indicator fade-in">
+            ✅ MRI uploaded successfully! Processing your scan...
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Progress bar driven by the real pipeline stages
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        timer = StageTimer(on_stage=lambda name: update_stage_progress(name, progress_bar, status_text))
+
+        try:
+            scheduler = load_scheduler()
+            classifier = scheduler.classifier
+            cache = load_prediction_cache()
+            cam = None
+            spread = None
+            embedding = None
+            matches = None
+            if show_similar and (index_model := index_model_mismatch(classifier)):
+                st.warning(f"🔍 Similar cases are hidden: the reference index was built with {index_model}, but {classifier.model_id} "
+                           f"is being served. Rebuild it with `{rebuild_index_command(classifier)}`.")
+                show_similar = False
+            with timer.stage("cache"):
+                cache_key = cache.make_key(uploaded_file.getvalue(), prediction_model_id(classifier, tta_views))
+                preds = cache.get(cache_key)
+                if tta_views and preds is not None:
+                    preds, spread = preds
+                if show_gradcam:
+                    explainer = load_explainer(classifier)
+                    gradcam_cache = load_gradcam_cache()
+                    cam_key = gradcam_cache.make_key(uploaded_file.getvalue(), gradcam_model_id(classifier, explainer))
+                    cam = gradcam_cache.get(cam_key)
+                if show_similar:
+                    embedder = load_embedder(classifier)
+                    embedding_cache = load_embedding_cache()
+                    embedding_key = embedding_cache.make_key(uploaded_file.getvalue(), f"{classifier.model_id}:embedding")
+                    embedding = embedding_cache.get(embedding_key)
+            cache_hit = preds is not None and (cam is not None or not show_gradcam) and (embedding is not None or not show_similar)
+
+            # st.image renders the encoded upload directly; only the model input is decoded
+            img = uploaded_file.getvalue()
+            if not cache_hit:
+                with timer.stage("decode"):
+                    # Straight to the model input size, the same decode evaluate.py and serve.py use
+                    scan = decode_resized(img, classifier.input_size, draft=classifier.fast_decode)
+                if show_gradcam and cam is None:
+                    # The heatmap pass also produces the plain prediction, so the scheduler is skipped
+                    explained_preds, explained_cams = explain_images([scan], classifier, explainer, timer)
+                    cam = explained_cams[0]
+                    gradcam_cache.put(cam_key, cam)
+                    if preds is None and not tta_views:
+                        preds = explained_preds[0]
+                        cache.put(cache_key, preds)
+                if show_similar and embedding is None:
+                    # The embedding pass also produces the plain prediction
+                    embedded_preds, embeddings = embed_images([scan], classifier, embedder, timer)
+                    embedding = embeddings[0]
+                    embedding_cache.put(embedding_key, embedding)
+                    if preds is None and not tta_views:
+                        preds = embedded_preds[0]
+                        cache.put(cache_key, preds)
+                if preds is None:
+                    if tta_views:
+                        preds, spread = predict_image_tta(scan, scheduler, classifier, timer, tta_views)
+                        cache.put(cache_key, np.stack([preds, spread]))
+                    else:
+                        preds = predict_image(scan, scheduler, classifier, timer)
+                        cache.put(cache_key, preds)
+            if embedding is not None:
+                matches = find_similar_cases(embedding, timer)
+            top_idx = np.argmax(preds)
+            top_class = class_names[top_idx]
+            confidence = preds[top_idx]
+        except Exception as e:
+            load_telemetry().count_error('single', e)
+            st.error(f"Error during prediction: {str(e)}")
+            return
+
+        # Views that disagree by more than the gap to the runner-up mark a borderline case
+        tta_note = ""
+        if spread is not None:
+            runner_up = np.sort(preds)[-2]
+            borderline = confidence - runner_up < 2 * spread[top_idx]
+            tta_note = f"""
+                    <p style="color: var(--secondary-text-color); margin: 0.3rem 0 0 0; text-align: center;">🎲 {tta_views} augmented views: ±{spread[top_idx]*100:.1f}% spread{' (⚠️ borderline, views disagree)' if borderline else ''}</p>"""
+
+        with timer.stage("render"):
+            # Main content area
+            col1, col2 = st.columns([1, 1])
+
+            with col1:
+                # Display uploaded image
+                st.markdown("""
+                <div class="result-card">
+                    <h3 style="color: var(--text-color); text-align: center;">📷 Uploaded MRI Scan</h3>
+                </div>
+                """, unsafe_allow_html=True)
+
+                st.image(img, use_container_width=True, caption="MRI Scan for Analysis")
+                if cam is not None:
+                    st.image(
+                        overlay_heatmap(to_rgb_image(img), cam),
+                        use_container_width=True,
+                        caption="🔥 Grad-CAM: regions that drove the prediction"
+                    )
+
+                # Success message with centered confidence
+                st.markdown(f"""
+                <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 10px; margin-top: 1rem; border-left: 4px solid {class_info.get(top_class, {}).get('color', 'var(--primary-color)')}; text-align: center;">
+                    <h4 style="color: {class_info.get(top_class, {}).get('color', 'var(--primary-color)')}; margin-bottom: 0.5rem; text-align: center;">{class_info.get(top_class, {}).get('icon', '❓')} Prediction: {class_info.get(top_class, {}).get('name', 'Unknown')}</h4>
+                    <p style="color: var(--text-color); font-weight: bold; margin: 0; text-align: center;">Confidence: {confidence*100:.1f}%</p>{tta_note}
+                </div>
+                """, unsafe_allow_html=True)
+
+                # Class description with entire section centered
+                st.markdown(f"""
+                <div class="result-card" style="text-align: center;">
+                    <h4 style="color: var(--text-color);">ℹ️ About {class_info.get(top_class, {}).get('name', 'Unknown')}</h4>
+                    <p style="color: var(--secondary-text-color); line-height: 1.6; margin-bottom: 1rem;">{class_info.get(top_class, {}).get('description', 'No description available.')}</p>
+                    <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 8px; border-left: 4px solid var(--primary-color); margin-bottom: 1rem;">
+                        <p style="color: var(--text-color); margin: 0.5rem 0;"><strong>Severity Level:</strong> {class_info.get(top_class, {}).get('severity', 'N/A')}</p>
+                        <p style="color: var(--text-color); margin: 0.5rem 0;"><strong>Treatment:</strong> {class_info.get(top_class, {}).get('treatment', 'N/A')}</p>
+                        <p style="color: var(--text-color); margin: 0.5rem 0;"><strong>Prognosis:</strong> {class_info.get(top_class, {}).get('prognosis', 'N/A')}</p>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+            with col2:
+                # Charts
+                create_prediction_chart(preds)
+                if matches is not None:
+                    create_similar_cases(matches)
+
+        progress_bar.progress(100)
+        status_text.text("Analysis complete")
+        with col2:
+            create_timing_breakdown(timer.timings, cache_hits=int(cache_hit))
+        telemetry = load_telemetry()
+        telemetry.count_request('single')
+        telemetry.count_predictions([top_class])
+        telemetry.observe_timings('single', timer.timings)
+        if not cache_hit:
+            record_history('single', [(img, uploaded_file.name, preds)], classifier, timer.timings)
+
+    elif not volumes:
+        # Upload prompt
+        st.markdown(f"""
+        <div class="result-card fade-in">
+            <h3 style="color: var(--text-color);">📤 Upload Your MRI Image</h3>
+            <p style="color: var(--secondary-text-color);">Use the file uploader above to upload one or more brain MRI images for analysis.</p>
+            <div style="font-size: 4rem; margin: 2rem 0; text-align: center;">🧠</div>
+            <p style="color: var(--secondary-text-color); font-size: 0.9rem; text-align: center;">
+                Supported formats: JPG, PNG, JPEG{SUPPORTED_VOLUME_FORMATS}<br>
+                Recommended: Clear, high-resolution images
+            </p>
         </div>
         """, unsafe_allow_html=True)
 
@@ -355,7 +1358,8 @@ def main():
     # Navigation with icons and descriptions
     nav_options = {
         "🏠 Home": "Overview & Model Insights",
-        "🔍 Analyze": "Individual MRI Analysis", 
+        "🔍 Analyze": "MRI Analysis", 
+        **({"📜 History": "Past Scans"} if HISTORY_DB else {}),
         "⚙️ Settings": "Configuration & Info"
     }
 
@@ -371,23 +1375,20 @@ def main():
     st.sidebar.markdown("---")
 
     # Quick stats in sidebar with real performance values
+    metrics = load_model_metrics(serving_artifact())
     st.sidebar.markdown(f"""
     <div style="background: var(--card-background); padding: 1rem; border-radius: 10px; margin-bottom: 1rem; border: 2px solid var(--border-color); box-shadow: 0 4px 15px rgba(0,0,0,0.08);">
         <h4 style="color: var(--text-color); margin-bottom: 0.5rem; font-weight: 700; text-shadow: none;">📊 Quick Stats</h4>
-        <p style="color: var(--secondary-text-color); margin: 0.2rem 0; font-size: 0.9rem; font-weight: 600; text-shadow: none;">🎯 Model Accuracy: 82.0%</p>
-        <p style="color: var(--secondary-text-color); margin: 0.2rem 0; font-size: 0.9rem; font-weight: 600; text-shadow: none;">⚡ Processing Speed: 0.8s</p>
+        <p style="color: var(--secondary-text-color); margin: 0.2rem 0; font-size: 0.9rem; font-weight: 600; text-shadow: none;">🎯 Model Accuracy: {format_metric(metrics, 'accuracy')}</p>
+        <p style="color: var(--secondary-text-color); margin: 0.2rem 0; font-size: 0.9rem; font-weight: 600; text-shadow: none;">⚡ Processing Speed: {format_response_time(metrics)}</p>
         <p style="color: var(--secondary-text-color); margin: 0.2rem 0; font-size: 0.9rem; font-weight: 600; text-shadow: none;">🔍 Classes: 4 tumor types</p>
     </div>
     """, unsafe_allow_html=True)
 
-    # Model status indicator
-    st.sidebar.markdown(f"""
-    <div style="background: var(--card-background); padding: 1rem; border-radius: 10px; margin-bottom: 1rem; border-left: 4px solid var(--success-color); border: 2px solid var(--border-color); box-shadow: 0 4px 15px rgba(0,0,0,0.08);">
-        <h4 style="color: var(--text-color); margin-bottom: 0.5rem; font-weight: 700; text-shadow: none;">🟢 Model Status</h4>
-        <p style="color: var(--secondary-text-color); margin: 0; font-size: 0.9rem; font-weight: 600; text-shadow: none;">✅ All systems operational</p>
-        <p style="color: var(--secondary-text-color); margin: 0.2rem 0 0 0; font-size: 0.8rem; font-weight: 500; text-shadow: none;">🔒 Privacy protection active</p>
-    </div>
-    """, unsafe_allow_html=True)
+    # Model status indicator (polls once per second until the background load finishes)
+    loader = start_model_loader(DEFAULT_BACKEND)
+    with st.sidebar:
+        st.fragment(render_model_status, run_every=1 if loader.status == 'loading' else None)(loader)
 
     # Help section
     with st.sidebar.expander("❓ Quick Help", expanded=False):
@@ -396,7 +1397,7 @@ def main():
             <p style="color: var(--text-color); margin: 0.2rem 0; font-size: 0.85rem; font-weight: 600; text-shadow: none;"><strong>🏠 Home:</strong> App overview and model performance metrics.</p>
         </div>
         <div style="background: var(--card-background); padding: 0.5rem; border-radius: 5px; margin-bottom: 0.5rem; border: 1px solid var(--border-color);">
-            <p style="color: var(--text-color); margin: 0.2rem 0; font-size: 0.85rem; font-weight: 600; text-shadow: none;"><strong>🔍 Analyze:</strong> Upload an individual MRI for analysis</p>
+            <p style="color: var(--text-color); margin: 0.2rem 0; font-size: 0.85rem; font-weight: 600; text-shadow: none;"><strong>🔍 Analyze:</strong> Upload one MRI or a batch of scans for analysis</p>
         </div>
         <div style="background: var(--card-background); padding: 0.5rem; border-radius: 5px; border: 1px solid var(--border-color);">
             <p style="color: var(--text-color); margin: 0.2rem 0; font-size: 0.85rem; font-weight: 600; text-shadow: none;"><strong>⚙️ Settings:</strong> App information and privacy details</p>
@@ -431,7 +1432,7 @@ def main():
             st.markdown(f"""
             <div class="metric-card">
                 <h3 style="color: var(--primary-color); margin-bottom: 0.5rem;">🎯 Model Accuracy</h3>
-                <h2 style="color: var(--text-color); margin: 0;">82.0%</h2>
+                <h2 style="color: var(--text-color); margin: 0;">{format_metric(metrics, 'accuracy')}</h2>
                 <p style="color: var(--secondary-text-color); font-size: 0.9rem; margin: 0;">Overall Performance</p>
             </div>
             """, unsafe_allow_html=True)
@@ -440,7 +1441,7 @@ def main():
             st.markdown(f"""
             <div class="metric-card">
                 <h3 style="color: var(--primary-color); margin-bottom: 0.5rem;">📊 F1 Score</h3>
-                <h2 style="color: var(--text-color); margin: 0;">81.0%</h2>
+                <h2 style="color: var(--text-color); margin: 0;">{format_metric(metrics, 'weighted_f1')}</h2>
                 <p style="color: var(--secondary-text-color); font-size: 0.9rem; margin: 0;">Weighted Average</p>
             </div>
             """, unsafe_allow_html=True)
@@ -449,8 +1450,8 @@ def main():
             st.markdown(f"""
             <div class="metric-card">
                 <h3 style="color: var(--primary-color); margin-bottom: 0.5rem;">⚡ Response Time</h3>
-                <h2 style="color: var(--text-color); margin: 0;">0.8s</h2>
-                <p style="color: var(--secondary-text-color); font-size: 0.9rem; margin: 0;">Per Analysis</p>
+                <h2 style="color: var(--text-color); margin: 0;">{format_response_time(metrics)}</h2>
+                <p style="color: var(--secondary-text-color); font-size: 0.9rem; margin: 0;">Per Scan (p50)</p>
             </div>
             """, unsafe_allow_html=True)
         
@@ -471,33 +1472,32 @@ def main():
             """, unsafe_allow_html=True)
         
         with col2:
-            st.markdown(f"""
-            <div class="result-card">
-                <h3 style="color: var(--primary-color); margin-bottom: 1rem;">📈 Model Performance</h3>
+            if metrics:
+                performance_rows = [
+                    ("Overall Accuracy", format_metric(metrics, 'accuracy'), metrics['accuracy'] * 100),
+                    ("Macro Avg F1", format_metric(metrics, 'macro_f1'), metrics['macro_f1'] * 100),
+                    ("Weighted Avg F1", format_metric(metrics, 'weighted_f1'), metrics['weighted_f1'] * 100),
+                    ("Calibration Error (ECE)", f"{metrics['ece']:.3f}" if metrics['ece'] is not None else "—",
+                     max(0.0, 100 - metrics['ece'] * 100) if metrics['ece'] is not None else 0),
+                    ("Test Samples", f"{metrics['samples']:,}", 100),
+                ]
+                bars = "".join(f"""
                 <div style="margin-bottom: 1rem;">
-                    <p style="margin: 0.5rem 0; color: var(--secondary-text-color);"><strong>Overall Accuracy:</strong> 82.0%</p>
+                    <p style="margin: 0.5rem 0; color: var(--secondary-text-color);"><strong>{label}:</strong> {value}</p>
                     <div style="background: var(--border-color); border-radius: 10px; height: 8px;">
-                        <div style="background: linear-gradient(90deg, var(--secondary-color) 0%, var(--primary-color) 100%); width: 82.0%; height: 100%; border-radius: 10px;"></div>
+                        <div style="background: linear-gradient(90deg, var(--secondary-color) 0%, var(--primary-color) 100%); width: {width:.1f}%; height: 100%; border-radius: 10px;"></div>
                     </div>
-                </div>
-                <div style="margin-bottom: 1rem;">
-                    <p style="margin: 0.5rem 0; color: var(--secondary-text-color);"><strong>Macro Avg F1:</strong> 80.0%</p>
-                    <div style="background: var(--border-color); border-radius: 10px; height: 8px;">
-                        <div style="background: linear-gradient(90deg, var(--secondary-color) 0%, var(--primary-color) 100%); width: 80.0%; height: 100%; border-radius: 10px;"></div>
-                    </div>
-                </div>
-                <div style="margin-bottom: 1rem;">
-                    <p style="margin: 0.5rem 0; color: var(--secondary-text-color);"><strong>Weighted Avg F1:</strong> 81.0%</p>
-                    <div style="background: var(--border-color); border-radius: 10px; height: 8px;">
-                        <div style="background: linear-gradient(90deg, var(--secondary-color) 0%, var(--primary-color) 100%); width: 81.0%; height: 100%; border-radius: 10px;"></div>
-                    </div>
-                </div>
-                <div style="margin-bottom: 1rem;">
-                    <p style="margin: 0.5rem 0; color: var(--secondary-text-color);"><strong>Test Samples:</strong> 1,142</p>
-                    <div style="background: var(--border-color); border-radius: 10px; height: 8px;">
-                        <div style="background: linear-gradient(90deg, var(--secondary-color) 0%, var(--primary-color) 100%); width: 100%; height: 100%; border-radius: 10px;"></div>
-                    </div>
-                </div>
+                </div>""" for label, value, width in performance_rows)
+                per_class = "".join(f"""
+                <p style="margin: 0.3rem 0; color: var(--secondary-text-color);"><strong>{class_info.get(cls, {}).get('icon', '❓')} {class_info.get(cls, {}).get('name', cls)}:</strong> precision {row['precision'] * 100:.1f}% · recall {row['recall'] * 100:.1f}%</p>""" for cls, row in metrics['per_class'].items())
+                evaluated = f"Evaluated {metrics['evaluated_at'][:10]} on {metrics['samples']:,} scans" if metrics.get('evaluated_at') else metrics.get('source', '')
+            else:
+                bars = per_class = ""
+                evaluated = "No metrics yet: run <code>python -m brain_tumor.evaluate brain_tumor_dataset/Testing</code>"
+            st.markdown(f"""
+            <div class="result-card">
+                <h3 style="color: var(--primary-color); margin-bottom: 1rem;">📈 Model Performance</h3>{bars}{per_class}
+                <p style="margin: 0.8rem 0 0 0; color: var(--secondary-text-color); font-size: 0.85rem;">{evaluated}</p>
             </div>
             """, unsafe_allow_html=True)
 
@@ -505,7 +1505,7 @@ def main():
         st.markdown("""
         <div class="main-header fade-in">
             <h1>🔍 MRI Analysis</h1>
-            <p>Upload an individual MRI scan for detailed tumor analysis</p>
+            <p>Upload an individual MRI scan or a full study for tumor analysis</p>
         </div>
         """, unsafe_allow_html=True)
         
@@ -514,101 +1514,20 @@ def main():
         <div class="input-card fade-in">
             <h2 style="color: var(--text-color); margin-bottom: 1rem;">📤 Upload MRI Scan</h2>
             <p style="color: var(--secondary-text-color); font-size: 1.1rem; margin-bottom: 2rem;">
-                Upload a brain MRI image for instant tumor detection and classification.
+                Upload a brain MRI image for instant tumor detection and classification, or select several slices to analyze them in one batch.
             </p>
         </div>
         """, unsafe_allow_html=True)
-        
-        uploaded_file = st.file_uploader(
-            "Choose an MRI image",
-            type=['jpg', 'png', 'jpeg'],
-            help="Upload a clear brain MRI image for analysis"
-        )
-        
-        if uploaded_file is not None:
-            # Show upload success
-            st.markdown("""
-            <div class="success-indicator fade-in">
-                ✅ MRI uploaded successfully! Processing your scan...
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Progress bar
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            # Simulate processing steps
-            steps = ["Loading image...", "Preprocessing...", "Running AI analysis...", "Generating results..."]
-            
-            for i, step in enumerate(steps):
-                status_text.text(step)
-                progress_bar.progress((i + 1) * 25)
-                time.sleep(0.5)
-            
-            # Main content area
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                # Display uploaded image
-                st.markdown("""
-                <div class="result-card">
-                    <h3 style="color: var(--text-color); text-align: center;">📷 Uploaded MRI Scan</h3>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                img = Image.open(uploaded_file).convert('RGB')
-                st.image(img, use_container_width=True, caption="MRI Scan for Analysis")
-
-                # Prediction
-                try:
-                    model = load_trained_model()
-                    preds = predict_image(img, model)
-                    top_idx = np.argmax(preds)
-                    top_class = class_names[top_idx]
-                    confidence = preds[top_idx]
-
-                    # Success message with centered confidence
-                    st.markdown(f"""
-                    <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 10px; margin-top: 1rem; border-left: 4px solid {class_info.get(top_class, {}).get('color', 'var(--primary-color)')}; text-align: center;">
-                        <h4 style="color: {class_info.get(top_class, {}).get('color', 'var(--primary-color)')}; margin-bottom: 0.5rem; text-align: center;">{class_info.get(top_class, {}).get('icon', '❓')} Prediction: {class_info.get(top_class, {}).get('name', 'Unknown')}</h4>
-                        <p style="color: var(--text-color); font-weight: bold; margin: 0; text-align: center;">Confidence: {confidence*100:.1f}%</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Class description with entire section centered
-                    st.markdown(f"""
-                    <div class="result-card" style="text-align: center;">
-                        <h4 style="color: var(--text-color);">ℹ️ About {class_info.get(top_class, {}).get('name', 'Unknown')}</h4>
-                        <p style="color: var(--secondary-text-color); line-height: 1.6; margin-bottom: 1rem;">{class_info.get(top_class, {}).get('description', 'No description available.')}</p>
-                        <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 8px; border-left: 4px solid var(--primary-color); margin-bottom: 1rem;">
-                            <p style="color: var(--text-color); margin: 0.5rem 0;"><strong>Severity Level:</strong> {class_info.get(top_class, {}).get('severity', 'N/A')}</p>
-                            <p style="color: var(--text-color); margin: 0.5rem 0;"><strong>Treatment:</strong> {class_info.get(top_class, {}).get('treatment', 'N/A')}</p>
-                            <p style="color: var(--text-color); margin: 0.5rem 0;"><strong>Prognosis:</strong> {class_info.get(top_class, {}).get('prognosis', 'N/A')}</p>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                except Exception as e:
-                    st.error(f"Error during prediction: {str(e)}")
-            
-            with col2:
-                if 'preds' in locals():
-                    # Charts
-                    create_prediction_chart(preds)
+        st.fragment(render_analyze)()
 
-        else:
-            # Upload prompt
-            st.markdown("""
-            <div class="result-card fade-in">
-                <h3 style="color: var(--text-color);">📤 Upload Your MRI Image</h3>
-                <p style="color: var(--secondary-text-color);">Use the file uploader above to upload a brain MRI image for analysis.</p>
-                <div style="font-size: 4rem; margin: 2rem 0; text-align: center;">🧠</div>
-                <p style="color: var(--secondary-text-color); font-size: 0.9rem; text-align: center;">
-                    Supported formats: JPG, PNG, JPEG<br>
-                    Recommended: Clear, high-resolution images
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
+    elif page == "📜 History":
+        st.markdown("""
+        <div class="main-header fade-in">
+            <h1>📜 Scan History</h1>
+            <p>Past analyses, newest first, filtered by class, confidence and date</p>
+        </div>
+        """, unsafe_allow_html=True)
+        render_history()
 
     elif page == "⚙️ Settings":
         st.markdown("""
@@ -625,13 +1544,70 @@ def main():
             <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid var(--info-color);">
                 <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Model Type:</strong> InceptionV3 Deep Learning</p>
                 <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Framework:</strong> TensorFlow/Keras</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Inference Backend:</strong> {DEFAULT_BACKEND}</p>
                 <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Classes:</strong> 4 tumor types</p>
                 <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Last Updated:</strong> """ + datetime.now().strftime("%B %d, %Y") + """</p>
                 <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Made by:</strong> Akarsh Yadav</p>
             </div>
         </div>
         """, unsafe_allow_html=True)
-        
+
+        # Prediction cache statistics
+        cache_stats = load_prediction_cache().stats()
+        st.markdown(f"""
+        <div class="result-card fade-in">
+            <h3 style="color: var(--info-color); margin-bottom: 1rem;">🗄️ Prediction Cache</h3>
+            <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid var(--info-color);">
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Hits:</strong> {cache_stats['hits']} ({cache_stats['disk_hits']} from disk)</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Misses:</strong> {cache_stats['misses']}</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Hit Rate:</strong> {cache_stats['hit_rate'] * 100:.1f}%</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>In-Memory Entries:</strong> {cache_stats['entries']} / {cache_stats['max_entries']}</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Disk Tier:</strong> {cache_stats['disk_dir'] or 'Disabled (set BRAIN_TUMOR_CACHE_DIR)'}</p>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        if st.button("🗑️ Clear prediction cache"):
+            load_prediction_cache().clear()
+            load_gradcam_cache().clear()
+            load_embedding_cache().clear()
+            st.rerun()
+
+        # Cross-session inference scheduler (only once the model is loaded, Settings never waits for it)
+        if start_model_loader(DEFAULT_BACKEND).status == 'ready':
+            scheduler_stats = create_scheduler(DEFAULT_BACKEND).stats()
+            scheduler_summary = f"""
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Batches Run:</strong> {scheduler_stats['batches']} ({scheduler_stats['requests']} requests, {scheduler_stats['rows']} scans)</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Mean Requests per Batch:</strong> {scheduler_stats['mean_requests_per_batch']:.2f}</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Queue Depth:</strong> {scheduler_stats['queue_depth']}</p>"""
+            classifier = create_scheduler(DEFAULT_BACKEND).classifier
+            if isinstance(classifier, CascadeClassifier):
+                cascade_stats = classifier.stats()
+                scheduler_summary += f"""
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Cascade:</strong> threshold {cascade_stats['threshold']:g}, margin {cascade_stats['margin']:g}; {cascade_stats['escalated']} of {cascade_stats['rows']} scans escalated to InceptionV3 ({cascade_stats['escalation_rate'] * 100:.1f}%)</p>"""
+        else:
+            scheduler_summary = """
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;">Model is still loading</p>"""
+        st.markdown(f"""
+        <div class="result-card fade-in">
+            <h3 style="color: var(--info-color); margin-bottom: 1rem;">🚦 Inference Scheduler</h3>
+            <div style="background: rgba(41, 98, 255, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid var(--info-color);">
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>Max Batch Size:</strong> {SCHEDULER_MAX_BATCH_SIZE} (wait {SCHEDULER_MAX_WAIT_MS:g} ms)</p>
+                <p style="margin: 0.5rem 0; color: var(--text-color); font-weight: 600;"><strong>TF Threads:</strong> intra-op {TF_INTRA_OP_THREADS or 'auto'}, inter-op {TF_INTER_OP_THREADS or 'auto'}</p>{scheduler_summary}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Registered model versions: hot swap and A/B comparison (once the startup model is ready)
+        if load_registry().manifests(DEFAULT_BACKEND) and start_model_loader(DEFAULT_BACKEND).status == 'ready':
+            render_model_registry()
+
+        # Per-layer/per-block profile of the loaded model (opt-in, Keras backend only)
+        if PROFILE_DIR and DEFAULT_BACKEND == 'keras' and start_model_loader(DEFAULT_BACKEND).status == 'ready':
+            render_profiler()
+
+        # Latency percentiles, counters and memory, refreshed every few seconds without rerunning the page
+        st.fragment(render_operational_metrics, run_every=5)(load_telemetry())
+
         # About section with centered layout
         st.markdown(f"""
         <div class="result-card fade-in" style="text-align: center;">
@@ -640,7 +1616,7 @@ def main():
                 The Brain Tumor Detector is an AI ML powered system designed to assist medical professionals in the rapid analysis of brain MRI scans. Leveraging a sophisticated InceptionV3 deep learning model, this application can accurately classify MRI images into one of four categories: Glioma, Meningioma, Pituitary, or No Tumor.
             </p>
             <p style="color: var(--secondary-text-color); font-size: 1.1rem; line-height: 1.8; text-align: justify; display: inline-block; max-width: 800px;">
-                Our model was trained on a comprehensive dataset of over 10,000 images, achieving an overall accuracy of 82.0%. This tool aims to provide a reliable, fast, and user-friendly interface for preliminary diagnosis, helping to streamline the workflow in clinical settings. The system is built with a focus on privacy, ensuring that all image processing is done locally and no patient data is stored or transmitted.
+                Our model was trained on a comprehensive dataset of over 10,000 images, achieving an overall accuracy of {format_metric(metrics, 'accuracy')} on the held-out test set. This tool aims to provide a reliable, fast, and user-friendly interface for preliminary diagnosis, helping to streamline the workflow in clinical settings. The system is built with a focus on privacy, ensuring that all image processing is done locally and no patient data is stored or transmitted.
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -651,7 +1627,7 @@ def main():
             <div style="background: linear-gradient(135deg, var(--success-color) 0%, #66BB6A 100%); padding: 1.5rem; border-radius: 15px; box-shadow: 0 4px 15px rgba(76, 175, 80, 0.3);">
                 <h4 style="color: white; margin-bottom: 1rem; text-align: center; font-size: 1.2rem;">🔒 Privacy Protection Active</h4>
                 <p style="color: white; margin: 0; text-align: center; font-size: 1rem; line-height: 1.5;">
-                    <strong>Patient privacy is protected.</strong> All uploaded images are processed locally and no patient data is stored or transmitted.
+                    <strong>Patient privacy is protected.</strong> All uploaded images are processed locally and {'only predictions and file names are kept, in the local scan history' if HISTORY_DB else 'no patient data is stored'}; nothing is transmitted.
                 </p>
             </div>
         </div>
@@ -0,0 +1,56 @@
+from .cache import PredictionCache
+from .gradcam import GradCAMExplainer
+from .inference import (
+    BrainTumorClassifier,
+    IMG_SIZE,
+    configure_tf_threads,
+    decode_resized,
+    load_class_names,
+    load_image_uint8,
+    load_keras_model,
+    normalize_batch,
+    preprocess_batch,
+    preprocess_image,
+)
+from .loader import BackgroundLoader
+from .scheduler import InferenceScheduler
+from .timing import StageTimer
+
+# Modules that are also command-line tools (python -m brain_tumor.<module>) are imported on first use:
+# importing them here would put them in sys.modules before runpy executes them as __main__
+_LAZY = {
+    "EmbeddingIndex": ".retrieval",
+    "ModelRegistry": ".registry",
+    "ScanHistory": ".history",
+    "Telemetry": ".telemetry",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = [
+    "BackgroundLoader",
+    "BrainTumorClassifier",
+    "EmbeddingIndex",
+    "GradCAMExplainer",
+    "IMG_SIZE",
+    "InferenceScheduler",
+    "ModelRegistry",
+    "PredictionCache",
+    "ScanHistory",
+    "StageTimer",
+    "Telemetry",
+    "configure_tf_threads",
+    "decode_resized",
+    "load_class_names",
+    "load_image_uint8",
+    "load_keras_model",
+    "normalize_batch",
+    "preprocess_batch",
+    "preprocess_image",
+]
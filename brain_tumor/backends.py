@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+
+from .inference import DEFAULT_MODEL_PATH, MODELS_DIR, _load_model_with_path
+
+# 🧩 Inference backends and the artifact each one loads by default
+MODEL_STEM = os.path.splitext(os.path.basename(DEFAULT_MODEL_PATH))[0]
+BACKEND_ARTIFACTS = {
+    'keras': DEFAULT_MODEL_PATH,
+    'tflite-fp16': os.path.join(MODELS_DIR, f"{MODEL_STEM}_fp16.tflite"),
+    'tflite-int8': os.path.join(MODELS_DIR, f"{MODEL_STEM}_int8.tflite"),
+    'onnx': os.path.join(MODELS_DIR, f"{MODEL_STEM}.onnx"),
+}
+BACKENDS = list(BACKEND_ARTIFACTS)
+DEFAULT_BACKEND = os.environ.get("BRAIN_TUMOR_BACKEND", "keras")
+
+
+class TFLiteModel:
+    """TFLite interpreter wrapped in the ``predict_on_batch`` interface of a Keras model."""
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+        self.name = os.path.basename(model_path)
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+
+    def predict_on_batch(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        # The interpreter has a fixed batch dimension; resize only when it changes
+        if len(batch) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(batch)
+        self.interpreter.set_tensor(self.input_index, batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class ONNXModel:
+    """ONNX Runtime session wrapped in the ``predict_on_batch`` interface of a Keras model."""
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.name = os.path.basename(model_path)
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+# 🔌 Load a model for the requested backend; returns (model, artifact_path)
+def load_backend_model(backend=DEFAULT_BACKEND, model_path=None, num_threads=None):
+    if backend not in BACKEND_ARTIFACTS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'keras':
+        return _load_model_with_path(model_path)
+    model_path = model_path or BACKEND_ARTIFACTS[backend]
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"{model_path} not found; create it with `python -m brain_tumor.export_quantized`"
+        )
+    if backend.startswith('tflite'):
+        return TFLiteModel(model_path, num_threads=num_threads), model_path
+    return ONNXModel(model_path, num_threads=num_threads), model_path
@@ -0,0 +1,279 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+from .inference import IMG_SIZE, ROOT_DIR, load_image_uint8, preprocess_image, to_rgb_image
+from .latency import measure_latency
+from .memory import current_rss_mb, peak_rss_mb
+from .retrieval import DEFAULT_NPROBE, EmbeddingIndex, default_num_lists, l2_normalize, write_index
+
+DEFAULT_RESOLUTIONS = (256, 512, 1024, 2048)
+DEFAULT_BATCH_SIZES = (1, 4, 8, 16, 32)
+
+
+# 🧪 Randomly initialized InceptionV3 with the notebook's head: same graph and cost, no weights download
+def build_standin_model(num_classes=4, input_size=IMG_SIZE, seed=0):
+    import tensorflow as tf
+
+    from .train import build_model
+
+    tf.keras.utils.set_random_seed(seed)
+    return build_model(num_classes, weights=None, image_size=input_size)[0]
+
+
+def save_standin_model(path, num_classes=4):
+    build_standin_model(num_classes).save(path)
+    return path
+
+
+# 🖼 Scanner-like synthetic scan (smooth anatomy-ish blob plus noise) encoded as JPEG or PNG
+def synthetic_scan(size, fmt='JPEG', seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[-1:1:size * 1j, -1:1:size * 1j]
+    blob = np.clip(1.2 - np.hypot(xx * 1.1, yy), 0, 1) * 200
+    gray = np.clip(blob + rng.normal(0, 12, (size, size)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(np.stack([gray] * 3, axis=-1)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+# 📏 Peak Python/NumPy heap allocated by one call (PIL's own pixel buffers are not traced)
+def traced_peak_kb(fn):
+    fn()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+# 🧵 Decode, decode+resize and full preprocessing cost per input resolution and format,
+# for the exact path and the JPEG draft-mode fast path
+def bench_decode(resolutions=DEFAULT_RESOLUTIONS, formats=('JPEG', 'PNG'), runs=20, warmup=3):
+    results = []
+    for fmt in formats:
+        for size in resolutions:
+            data = synthetic_scan(size, fmt)
+            out = np.empty((IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+            results.append({
+                'format': fmt.lower(),
+                'resolution': size,
+                'bytes': len(data),
+                'decode': measure_latency(lambda: to_rgb_image(data), runs, warmup),
+                'decode_resize': measure_latency(lambda: load_image_uint8(data), runs, warmup),
+                'preprocess': measure_latency(lambda: preprocess_image(data), runs, warmup),
+                'preprocess_draft': measure_latency(lambda: preprocess_image(data, out=out, draft=True), runs, warmup),
+                'max_abs_diff_draft': float(np.abs(preprocess_image(data, draft=True) - preprocess_image(data)).max()),
+                'preprocess_alloc_kb': traced_peak_kb(lambda: preprocess_image(data)),
+                'preprocess_draft_alloc_kb': traced_peak_kb(lambda: preprocess_image(data, out=out, draft=True)),
+            })
+    return results
+
+
+# 🏭 Runs in a fresh process so load time, import time and peak RSS are not skewed by the parent
+def bench_model(model_path, batch_sizes=DEFAULT_BATCH_SIZES, runs=50, warmup=5, throughput_images=64):
+    rss_start = current_rss_mb()
+    start = time.perf_counter()
+    import tensorflow  # noqa: F401
+    import_seconds = time.perf_counter() - start
+
+    from .inference import BrainTumorClassifier
+
+    start = time.perf_counter()
+    classifier = BrainTumorClassifier(model_path=model_path)
+    load_seconds = time.perf_counter() - start
+    warmup_seconds = classifier.warmup()
+    rss_loaded = current_rss_mb()
+
+    rng = np.random.default_rng(0)
+    img_array = rng.random((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+    upload = synthetic_scan(1024)
+    single_image = {
+        'forward': measure_latency(lambda: classifier.predict_array(img_array), runs, warmup),
+        # Same work as the app's predict_image: decode, resize, normalize, forward
+        'end_to_end_1024px_jpeg': measure_latency(lambda: classifier.predict(upload), runs, warmup),
+    }
+
+    throughput = []
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+        classifier.predict_array(batch, batch_size)
+        iterations = max(2, throughput_images // batch_size)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            classifier.predict_array(batch, batch_size)
+        elapsed = time.perf_counter() - start
+        throughput.append({
+            'batch_size': batch_size,
+            'images_per_second': batch_size * iterations / elapsed,
+            'ms_per_batch': elapsed / iterations * 1000,
+        })
+
+    return {
+        'load': {
+            'tensorflow_import_seconds': import_seconds,
+            'load_seconds': load_seconds,
+            'warmup_seconds': warmup_seconds,
+            'artifact_mb': os.path.getsize(model_path) / 1e6,
+        },
+        'single_image': single_image,
+        'throughput': throughput,
+        'memory': {
+            'rss_start_mb': rss_start,
+            'rss_after_load_mb': rss_loaded,
+            'rss_end_mb': current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+        },
+    }
+
+
+# 🔍 Similar-case search over a synthetic clustered reference set: flat scan vs IVF, with recall against flat
+def bench_retrieval(num_refs=100000, dim=2048, k=5, queries=20, nprobe=DEFAULT_NPROBE, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.abs(rng.standard_normal((64, dim), dtype=np.float32))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw = np.lib.format.open_memmap(os.path.join(tmp_dir, 'raw.npy'), mode='w+', dtype=np.float16, shape=(num_refs, dim))
+        labels = rng.integers(0, len(centers), num_refs)
+        for start in range(0, num_refs, 8192):
+            block = centers[labels[start:start + 8192]]
+            raw[start:start + len(block)] = l2_normalize(np.maximum(block + rng.standard_normal(block.shape, dtype=np.float32), 0))
+        start = time.perf_counter()
+        write_index(os.path.join(tmp_dir, 'index'), raw, labels % 4, [str(i) for i in range(num_refs)],
+                    ['glioma', 'meningioma', 'notumor', 'pituitary'], default_num_lists(num_refs))
+        build_seconds = time.perf_counter() - start
+        index = EmbeddingIndex(os.path.join(tmp_dir, 'index'))
+        query_rows = np.asarray(raw[rng.choice(num_refs, queries, replace=False)], dtype=np.float32)
+        query_rows = query_rows + rng.standard_normal(query_rows.shape, dtype=np.float32) * 0.01
+        _, exact = index.search(query_rows, k, nprobe=0)
+        _, approx = index.search(query_rows, k, nprobe=nprobe)
+        recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx, exact)])
+        return {
+            'references': num_refs,
+            'lists': index.meta['num_lists'],
+            'nprobe': nprobe,
+            'index_mb': os.path.getsize(os.path.join(tmp_dir, 'index', 'embeddings.npy')) / 1e6,
+            'ivf_build_seconds': build_seconds,
+            'flat_query': measure_latency(lambda: index.search(query_rows[:1], k, nprobe=0), 3, 1),
+            'ivf_query': measure_latency(lambda: index.search(query_rows[:1], k, nprobe=nprobe), 50, 5),
+            f'ivf_recall_at_{k}': float(recall),
+        }
+
+
+def _run_in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pillow': Image.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmarks(model_path=None, resolutions=DEFAULT_RESOLUTIONS, batch_sizes=DEFAULT_BATCH_SIZES,
+                   runs=50, warmup=5, decode_runs=20, retrieval_refs=0):
+    report = {'environment': _environment()}
+    report['decode'] = bench_decode(resolutions, runs=decode_runs)
+    if retrieval_refs:
+        report['retrieval'] = bench_retrieval(retrieval_refs)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if model_path is None:
+            model_path = _run_in_fresh_process(save_standin_model, os.path.join(tmp_dir, 'standin_inceptionv3.keras'))
+            report['model'] = 'standin-inceptionv3'
+        else:
+            report['model'] = model_path
+        report.update(_run_in_fresh_process(bench_model, model_path, batch_sizes, runs, warmup))
+    return report
+
+
+# 📉 Flatten two reports and show the relative change of every shared timing/throughput metric
+def compare_reports(current, baseline):
+    def flatten(value, prefix=''):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                yield from flatten(item, f"{prefix}{key}.")
+        elif isinstance(value, list):
+            for item in value:
+                label = item.get('batch_size') or f"{item.get('format')}@{item.get('resolution')}"
+                yield from flatten(item, f"{prefix}{label}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield prefix.rstrip('.'), value
+
+    old = dict(flatten({k: v for k, v in baseline.items() if k != 'environment'}))
+    lines = []
+    for key, value in flatten({k: v for k, v in current.items() if k != 'environment'}):
+        if key.endswith(('_ms', '_seconds', '_per_second', '_mb')) and old.get(key):
+            lines.append(f"{key:<60} {old[key]:>12.2f} -> {value:>12.2f}  ({(value / old[key] - 1) * 100:+.1f}%)")
+    return "\n".join(lines)
+
+
+def format_summary(report):
+    lines = [f"Model: {report['model']}"]
+    load = report['load']
+    lines.append(f"Load {load['load_seconds']:.2f}s (+{load['warmup_seconds']:.2f}s warm-up, "
+                 f"TF import {load['tensorflow_import_seconds']:.2f}s), peak RSS {report['memory']['peak_rss_mb']:.0f} MB")
+    for name, stats in report['single_image'].items():
+        lines.append(f"Single image {name}: p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms  p99 {stats['p99_ms']:.1f} ms")
+    for row in report['throughput']:
+        lines.append(f"Batch {row['batch_size']:>3}: {row['images_per_second']:.1f} images/s")
+    for row in report['decode']:
+        lines.append(f"Decode {row['format']} {row['resolution']}px: decode {row['decode']['p50_ms']:.1f} ms, "
+                     f"+resize {row['decode_resize']['p50_ms']:.1f} ms, +normalize {row['preprocess']['p50_ms']:.1f} ms, "
+                     f"draft path {row['preprocess_draft']['p50_ms']:.1f} ms")
+    if 'retrieval' in report:
+        r = report['retrieval']
+        lines.append(f"Similar-case search over {r['references']} refs: flat p50 {r['flat_query']['p50_ms']:.1f} ms, "
+                     f"IVF ({r['lists']} lists, nprobe {r['nprobe']}) p50 {r['ivf_query']['p50_ms']:.1f} ms, "
+                     f"recall@5 {r['ivf_recall_at_5']:.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline CPU benchmark of preprocessing and inference (JSON output).")
+    parser.add_argument('--model', help="Benchmark this .keras/.h5 file instead of a random-init InceptionV3 stand-in")
+    parser.add_argument('--resolutions', type=int, nargs='+', default=list(DEFAULT_RESOLUTIONS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument('--runs', type=int, default=50, help="Timed single-image calls")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--decode-runs', type=int, default=20)
+    parser.add_argument('--retrieval-refs', type=int, default=0, help="Also time similar-case search over this many synthetic references")
+    parser.add_argument('--output', default='benchmark.json', help="Where to write the JSON report")
+    parser.add_argument('--baseline', help="Earlier report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.model, args.resolutions, args.batch_sizes, args.runs, args.warmup, args.decode_runs,
+                            args.retrieval_refs)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(format_summary(report), file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(compare_reports(report, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """Content-addressed cache of softmax vectors.
+
+    Keys are a sha256 of the model identity plus the raw upload bytes, so the
+    same scan is never sent through the model twice for the same model. A
+    bounded in-memory LRU sits in front of an optional ``.npy`` directory.
+    """
+
+    def __init__(self, max_entries=512, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data, model_id):
+        digest = hashlib.sha256(model_id.encode('utf-8'))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def get(self, key):
+        with self._lock:
+            preds = self._entries.get(key)
+            if preds is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return preds
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                preds = np.load(self._disk_path(key))
+            except (OSError, ValueError):
+                preds = None
+            if preds is not None:
+                self._remember(key, preds)
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return preds
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, preds):
+        preds = np.asarray(preds, dtype=np.float32)
+        self._remember(key, preds)
+        if self.disk_dir:
+            # Write to a temp file and rename so readers never see a partial array
+            tmp_path = self._disk_path(key) + f".{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, preds)
+            os.replace(tmp_path, self._disk_path(key))
+
+    def _remember(self, key, preds):
+        with self._lock:
+            self._entries[key] = preds
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every entry, in memory and in the ``.npy`` directory (subdirectories are other caches)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.npy'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_dir': self.disk_dir,
+            }
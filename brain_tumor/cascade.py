@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .inference import DEFAULT_MODEL_PATH, IMG_SIZE, MODELS_DIR, BrainTumorClassifier, load_image_uint8, normalize_batch
+from .latency import measure_latency
+from .memory import peak_rss_mb
+from .score_dir import iter_decoded_batches, iter_image_paths
+
+DEFAULT_STUDENT_PATH = os.path.join(MODELS_DIR, "brain_tumor_student.keras")
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97, 0.99)
+
+
+# 🐣 MobileNetV2 student taking the same [0, 1] input as InceptionV3 (rescaled to [-1, 1] inside the graph)
+def build_student(num_classes, weights='imagenet', image_size=IMG_SIZE, alpha=0.35):
+    import tensorflow as tf
+    from tensorflow.keras import layers
+    from tensorflow.keras.applications import MobileNetV2
+
+    shape = (image_size[1], image_size[0], 3)
+    base_model = MobileNetV2(input_shape=shape, alpha=alpha, include_top=False, weights=weights)
+    inputs = tf.keras.Input(shape=shape)
+    x = layers.Rescaling(2.0, offset=-1.0)(inputs)
+    x = base_model(x)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.2)(x)
+    outputs = layers.Dense(num_classes, activation='softmax')(x)
+    return tf.keras.Model(inputs, outputs, name='student')
+
+
+# 🌡 Targets are [one-hot label | teacher softmax]; the soft term compares temperature-softened distributions
+def distillation_loss(num_classes, temperature=2.0, hard_weight=0.5):
+    import tensorflow as tf
+
+    def loss(y_true, y_pred):
+        hard, soft = y_true[:, :num_classes], y_true[:, num_classes:]
+        log_student = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0))
+        # softmax(z / T) == normalized p ** (1 / T), so stored probabilities are enough
+        teacher_t = tf.nn.softmax(tf.math.log(tf.clip_by_value(soft, 1e-7, 1.0)) / temperature)
+        log_student_t = tf.nn.log_softmax(log_student / temperature)
+        kl = tf.reduce_sum(teacher_t * (tf.math.log(teacher_t + 1e-7) - log_student_t), axis=1)
+        ce = -tf.reduce_sum(hard * log_student, axis=1)
+        return hard_weight * ce + (1 - hard_weight) * temperature ** 2 * kl
+
+    return loss
+
+
+def _distillation_metrics(num_classes):
+    import tensorflow as tf
+
+    def accuracy(y_true, y_pred):
+        return tf.cast(tf.argmax(y_true[:, :num_classes], 1) == tf.argmax(y_pred, 1), tf.float32)
+
+    def teacher_agreement(y_true, y_pred):
+        return tf.cast(tf.argmax(y_true[:, num_classes:], 1) == tf.argmax(y_pred, 1), tf.float32)
+
+    return [accuracy, teacher_agreement]
+
+
+def teacher_soft_labels(teacher, paths, batch_size=32):
+    from .train import make_dataset
+
+    soft = np.empty((len(paths), len(teacher.class_names)), dtype=np.float32)
+    offset = 0
+    # One pass over the images, so nothing is cached (the default would keep every decoded image in memory)
+    for img_batch, _ in make_dataset(paths, np.zeros(len(paths), dtype=np.int32), batch_size, cache_path=None):
+        soft[offset:offset + len(img_batch)] = teacher.predict_array(img_batch.numpy())
+        offset += len(img_batch)
+    return soft
+
+
+def distill(data_dir, teacher_path=None, output_path=DEFAULT_STUDENT_PATH, epochs=20, batch_size=32, learning_rate=1e-3,
+            temperature=2.0, hard_weight=0.5, alpha=0.35, weights='imagenet', validation_split=0.2, seed=42,
+            patience=3, cache_dir=None):
+    """Train the student on the notebook pipeline against InceptionV3's soft labels.
+
+    The teacher scores every image once (without augmentation); the student
+    then trains on the augmented, uint8-cached pipeline from ``train``.
+    """
+    import tensorflow as tf
+
+    from .train import build_augmentation, list_training_files, make_dataset, make_epoch_stats_callback, split_files
+
+    tf.keras.utils.set_random_seed(seed)
+    paths, labels, class_names = list_training_files(data_dir)
+    teacher = BrainTumorClassifier(model_path=teacher_path)
+    if list(teacher.class_names) != class_names:
+        raise ValueError(f"Teacher classes {teacher.class_names} do not match the data directories {class_names}")
+    (train_paths, train_labels), (val_paths, val_labels) = split_files(paths, labels, validation_split, seed)
+
+    start = time.perf_counter()
+    soft = teacher_soft_labels(teacher, train_paths + val_paths, batch_size)
+    teacher_seconds = time.perf_counter() - start
+    eye = np.eye(len(class_names), dtype=np.float32)
+    train_targets = np.concatenate([eye[train_labels], soft[:len(train_paths)]], axis=1)
+    val_targets = np.concatenate([eye[val_labels], soft[len(train_paths):]], axis=1)
+
+    cache_path = lambda name: os.path.join(cache_dir, name) if cache_dir else ''
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    train_ds = make_dataset(train_paths, train_targets, batch_size, training=True, augmentation=build_augmentation(seed),
+                            cache_path=cache_path('student-train'), seed=seed)
+    val_ds = make_dataset(val_paths, val_targets, batch_size, cache_path=cache_path('student-val'))
+
+    student = build_student(len(class_names), weights=weights, alpha=alpha)
+    student.compile(optimizer=tf.keras.optimizers.Adam(learning_rate),
+                    loss=distillation_loss(len(class_names), temperature, hard_weight),
+                    metrics=_distillation_metrics(len(class_names)))
+    records = []
+    student.fit(train_ds, validation_data=val_ds, epochs=epochs, verbose=2, callbacks=[
+        tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True),
+        make_epoch_stats_callback('student', records),
+    ])
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(os.path.abspath(output_path)), f".tmp-{os.path.basename(output_path)}")
+    # Saved uncompiled (same layers and weights), so loading never needs the custom distillation loss
+    tf.keras.Model(student.inputs, student.outputs, name='student').save(tmp_path)
+    os.replace(tmp_path, output_path)
+    return {
+        'student_path': output_path,
+        'student_params': int(student.count_params()),
+        'teacher_params': int(teacher.model.count_params()) if hasattr(teacher.model, 'count_params') else None,
+        'teacher_soft_label_seconds': teacher_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'epochs': records,
+    }
+
+
+# 🚦 A scan is settled by the student only if its top class is confident AND clear of the runner-up
+def confident_mask(probs, threshold=DEFAULT_THRESHOLD, margin=0.0):
+    top2 = np.partition(probs, -2, axis=1)[:, -2:]
+    return (top2[:, 1] >= threshold) & (top2[:, 1] - top2[:, 0] >= margin)
+
+
+class CascadeClassifier:
+    """Student-first classifier that escalates uncertain scans to InceptionV3.
+
+    Exposes the ``BrainTumorClassifier`` interface (so the scheduler, caches and
+    app work unchanged) and delegates everything else — ``model``,
+    ``class_names``, ``input_size`` — to the teacher. Scans whose student
+    confidence is below ``threshold``, or whose margin over the runner-up is
+    below ``margin``, are re-scored by the teacher in one sub-batch.
+    """
+
+    def __init__(self, student, teacher, threshold=DEFAULT_THRESHOLD, margin=0.0):
+        if list(student.class_names) != list(teacher.class_names):
+            raise ValueError(f"Student classes {student.class_names} do not match teacher classes {teacher.class_names}")
+        self.student = student
+        self.teacher = teacher
+        self.threshold = threshold
+        self.margin = margin
+        self.rows = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name in ('student', 'teacher'):
+            raise AttributeError(name)
+        return getattr(self.teacher, name)
+
+    @property
+    def model_id(self):
+        return f"{self.teacher.model_id}:cascade:{self.student.model_id}:{self.threshold:g}:{self.margin:g}"
+
+    def warmup(self):
+        self.warmup_seconds = self.student.warmup() + self.teacher.warmup()
+        return self.warmup_seconds
+
+    def predict_array(self, img_batch, batch_size=None, progress_callback=None):
+        preds = self.student.predict_array(img_batch, batch_size)
+        escalate = ~confident_mask(preds, self.threshold, self.margin)
+        if escalate.any():
+            preds[escalate] = self.teacher.predict_array(img_batch[escalate], batch_size)
+        with self._lock:
+            self.rows += len(preds)
+            self.escalated += int(escalate.sum())
+        if progress_callback is not None:
+            progress_callback(len(preds), len(preds))
+        return preds
+
+    # Same decode/batching paths as the plain classifier, routed through the cascade's predict_array
+    predict = BrainTumorClassifier.predict
+    predict_batch = BrainTumorClassifier.predict_batch
+    predict_paths = BrainTumorClassifier.predict_paths
+    top_class = BrainTumorClassifier.top_class
+
+    def stats(self):
+        return {
+            'threshold': self.threshold,
+            'margin': self.margin,
+            'rows': self.rows,
+            'escalated': self.escalated,
+            'escalation_rate': self.escalated / self.rows if self.rows else 0.0,
+        }
+
+
+def calibrate(student, teacher, paths, labels=None, thresholds=DEFAULT_THRESHOLDS, margin=0.0, batch_size=32,
+              latency_runs=30):
+    """Score every image with both models once, then evaluate each threshold offline.
+
+    For every threshold: the fraction escalated, the expected mean single-scan
+    latency (student always, teacher for escalated scans; both measured), and
+    agreement/accuracy against running InceptionV3 on every image. Files that
+    cannot be decoded are skipped and listed, as in ``score_dir``.
+    """
+    # Each image is decoded once and scored by both models, like the cascade itself does
+    student_probs, teacher_probs, kept, skipped = [], [], [], []
+    offset = 0
+    for chunk, decoded in iter_decoded_batches('', paths, batch_size, None, 2, teacher.input_size):
+        ok = [i for i, (arr, _) in enumerate(decoded) if arr is not None]
+        skipped += [{'path': chunk[i], 'error': decoded[i][1]} for i in range(len(chunk)) if decoded[i][0] is None]
+        if ok:
+            batch = normalize_batch(np.stack([decoded[i][0] for i in ok]))
+            student_probs.append(student.predict_array(batch, batch_size))
+            teacher_probs.append(teacher.predict_array(batch, batch_size))
+            kept += [offset + i for i in ok]
+        offset += len(chunk)
+    if not kept:
+        raise ValueError(f"None of the {len(paths)} images could be decoded")
+    student_probs, teacher_probs = np.concatenate(student_probs), np.concatenate(teacher_probs)
+    labels = labels[kept] if labels is not None else None
+    sample = normalize_batch(load_image_uint8(paths[kept[0]], teacher.input_size)[np.newaxis])
+    student_ms = measure_latency(lambda: student.predict_array(sample), latency_runs)['mean_ms']
+    teacher_ms = measure_latency(lambda: teacher.predict_array(sample), latency_runs)['mean_ms']
+
+    teacher_top = teacher_probs.argmax(axis=1)
+    accuracy = lambda top: float(np.mean(top == labels)) if labels is not None else None
+    rows = []
+    for threshold in thresholds:
+        escalate = ~confident_mask(student_probs, threshold, margin)
+        cascade_top = np.where(escalate, teacher_top, student_probs.argmax(axis=1))
+        rows.append({
+            'threshold': threshold,
+            'escalated_fraction': float(escalate.mean()),
+            'mean_latency_ms': student_ms + float(escalate.mean()) * teacher_ms,
+            'agreement_with_teacher': float(np.mean(cascade_top == teacher_top)),
+            'accuracy': accuracy(cascade_top),
+        })
+    return {
+        'images': len(kept),
+        'skipped': skipped,
+        'margin': margin,
+        'student_ms': student_ms,
+        'teacher_ms': teacher_ms,
+        'student_accuracy': accuracy(student_probs.argmax(axis=1)),
+        'teacher_accuracy': accuracy(teacher_top),
+        'thresholds': rows,
+    }
+
+
+def format_calibration(report):
+    lines = [f"{report['images']} images; student {report['student_ms']:.1f} ms, teacher {report['teacher_ms']:.1f} ms per scan"]
+    if report['skipped']:
+        lines.append(f"Skipped {len(report['skipped'])} undecodable file(s), e.g. {report['skipped'][0]['path']}: {report['skipped'][0]['error']}")
+    if report['teacher_accuracy'] is not None:
+        lines.append(f"Accuracy: teacher {report['teacher_accuracy'] * 100:.1f}%, student alone {report['student_accuracy'] * 100:.1f}%")
+    lines.append(f"{'threshold':>9} {'escalated':>10} {'mean ms':>8} {'agree':>7} {'accuracy':>9}")
+    for row in report['thresholds']:
+        acc = f"{row['accuracy'] * 100:8.1f}%" if row['accuracy'] is not None else f"{'-':>9}"
+        lines.append(f"{row['threshold']:>9.2f} {row['escalated_fraction'] * 100:>9.1f}% {row['mean_latency_ms']:>8.1f} "
+                     f"{row['agreement_with_teacher'] * 100:>6.1f}% {acc}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distill a student model and calibrate the student -> InceptionV3 cascade.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    distill_parser = subparsers.add_parser('distill', help="Train the student against InceptionV3 soft labels")
+    distill_parser.add_argument('data_dir', help="Training directory with one sub-directory per class")
+    distill_parser.add_argument('--output', default=DEFAULT_STUDENT_PATH)
+    distill_parser.add_argument('--epochs', type=int, default=20)
+    distill_parser.add_argument('--batch-size', type=int, default=32)
+    distill_parser.add_argument('--learning-rate', type=float, default=1e-3)
+    distill_parser.add_argument('--temperature', type=float, default=2.0)
+    distill_parser.add_argument('--hard-weight', type=float, default=0.5, help="Weight of the true-label loss (the rest goes to the teacher)")
+    distill_parser.add_argument('--alpha', type=float, default=0.35, help="MobileNetV2 width multiplier")
+    distill_parser.add_argument('--weights', default='imagenet', help="Student initialization: 'imagenet' or 'none'")
+    distill_parser.add_argument('--seed', type=int, default=42)
+    distill_parser.add_argument('--cache-dir', help="Cache decoded uint8 images on disk instead of in memory")
+    calibrate_parser = subparsers.add_parser('calibrate', help="Escalation rate, latency and accuracy per threshold")
+    calibrate_parser.add_argument('data_dir', help="Labeled directory (root/<class>/<file>), e.g. brain_tumor_dataset/Testing")
+    calibrate_parser.add_argument('--student', default=DEFAULT_STUDENT_PATH)
+    calibrate_parser.add_argument('--thresholds', type=float, nargs='+', default=list(DEFAULT_THRESHOLDS))
+    calibrate_parser.add_argument('--margin', type=float, default=0.0, help="Also escalate when top-1 minus top-2 is below this")
+    calibrate_parser.add_argument('--batch-size', type=int, default=32)
+    calibrate_parser.add_argument('--output', default='cascade_calibration.json')
+    for sub in (distill_parser, calibrate_parser):
+        sub.add_argument('--teacher', default=DEFAULT_MODEL_PATH, help="InceptionV3 model")
+    args = parser.parse_args(argv)
+
+    if args.command == 'distill':
+        report = distill(args.data_dir, args.teacher, args.output, args.epochs, args.batch_size, args.learning_rate,
+                         args.temperature, args.hard_weight, args.alpha,
+                         None if args.weights.lower() == 'none' else args.weights, seed=args.seed, cache_dir=args.cache_dir)
+        print(f"Saved {report['student_path']} ({report['student_params']:,} parameters), peak RSS {report['peak_rss_mb']:.0f} MB", file=sys.stderr)
+        return
+
+    teacher = BrainTumorClassifier(model_path=args.teacher, batch_size=args.batch_size)
+    student = BrainTumorClassifier(model_path=args.student, batch_size=args.batch_size, class_names=teacher.class_names)
+    rel_paths = list(iter_image_paths(args.data_dir))
+    paths = [os.path.join(args.data_dir, p) for p in rel_paths]
+    top_dirs = [p.split(os.sep)[0] for p in rel_paths]
+    labels = np.array([teacher.class_names.index(d) for d in top_dirs]) if all(d in teacher.class_names for d in top_dirs) else None
+    report = calibrate(student, teacher, paths, labels, args.thresholds, args.margin, args.batch_size)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(format_calibration(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+
+import numpy as np
+
+from .backends import BACKEND_ARTIFACTS, BACKENDS
+from .inference import BrainTumorClassifier, load_image_uint8, normalize_batch
+from .memory import current_rss_mb, peak_rss_mb
+from .score_dir import iter_image_paths
+
+
+# 🧪 Runs in a fresh process per backend so resident memory is not shared between backends
+def evaluate_backend(backend, model_path, root, limit, warmup):
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    classifier = BrainTumorClassifier(model_path=model_path, backend=backend, batch_size=1)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    rel_paths = list(islice(iter_image_paths(root), limit))
+    labels, predictions, latencies = [], [], []
+    for rel_path in rel_paths:
+        try:
+            img_array = normalize_batch(load_image_uint8(os.path.join(root, rel_path))[np.newaxis])
+        except OSError:
+            predictions.append(None)
+            labels.append(None)
+            continue
+        start = time.perf_counter()
+        preds = classifier.predict_array(img_array)[0]
+        if len(labels) >= warmup:
+            latencies.append(time.perf_counter() - start)
+        labels.append(os.path.basename(os.path.dirname(rel_path)))
+        predictions.append(classifier.class_names[int(np.argmax(preds))])
+
+    correct = [p == l for p, l in zip(predictions, labels) if l in classifier.class_names]
+    return {
+        'backend': backend,
+        'artifact': classifier.model_path,
+        'artifact_mb': os.path.getsize(classifier.model_path) / 1e6,
+        'images': len(rel_paths),
+        'accuracy': float(np.mean(correct)) if correct else None,
+        'load_seconds': load_seconds,
+        'latency_p50_ms': float(np.percentile(latencies, 50) * 1000) if latencies else None,
+        'latency_p99_ms': float(np.percentile(latencies, 99) * 1000) if latencies else None,
+        'model_rss_mb': rss_loaded - rss_before,
+        'peak_rss_mb': peak_rss_mb(),
+        'predictions': predictions,
+    }
+
+
+def compare_backends(root, backends, artifacts, limit=None, warmup=5):
+    results = []
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            try:
+                results.append(pool.submit(evaluate_backend, backend, artifacts[backend], root, limit, warmup).result())
+            except (FileNotFoundError, ImportError) as e:
+                print(f"Skipping {backend}: {e}")
+
+    # Accuracy delta and top-1 agreement relative to the first backend (Keras by default)
+    predictions = [result.pop('predictions') for result in results]
+    for result, preds in zip(results, predictions):
+        result['agreement'] = float(np.mean([a == b for a, b in zip(preds, predictions[0]) if a is not None]))
+        if result['accuracy'] is not None and results[0]['accuracy'] is not None:
+            result['accuracy_delta'] = result['accuracy'] - results[0]['accuracy']
+    return results
+
+
+def format_report(results):
+    lines = [
+        "| Backend | Size (MB) | Accuracy | Δ Accuracy | Agreement | p50 (ms) | p99 (ms) | Model RSS (MB) | Peak RSS (MB) |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    fmt = lambda v, spec: format(v, spec) if v is not None else "n/a"
+    for r in results:
+        lines.append(
+            f"| {r['backend']} | {r['artifact_mb']:.1f} | {fmt(r['accuracy'], '.2%')} | {fmt(r.get('accuracy_delta'), '+.2%')} "
+            f"| {fmt(r.get('agreement'), '.2%')} | {fmt(r['latency_p50_ms'], '.1f')} | {fmt(r['latency_p99_ms'], '.1f')} "
+            f"| {r['model_rss_mb']:.0f} | {r['peak_rss_mb']:.0f} |"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare accuracy, latency and memory of the Keras, TFLite and ONNX backends.")
+    parser.add_argument('root', help="Labelled split to evaluate, e.g. brain_tumor_dataset/Testing")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--models-dir', help="Directory holding the exported artifacts (default: models/)")
+    parser.add_argument('--limit', type=int, help="Only score the first N images")
+    parser.add_argument('--warmup', type=int, default=5, help="Calls excluded from latency percentiles")
+    parser.add_argument('--output', help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    artifacts = dict(BACKEND_ARTIFACTS)
+    if args.models_dir:
+        artifacts = {b: os.path.join(args.models_dir, os.path.basename(p)) for b, p in artifacts.items()}
+    results = compare_backends(args.root, args.backends, artifacts, limit=args.limit, warmup=args.warmup)
+    print(format_report(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .backends import BACKENDS, DEFAULT_BACKEND
+from .inference import BrainTumorClassifier, normalize_batch
+from .latency import measure_latency
+from .score_dir import iter_decoded_batches, iter_image_paths
+
+ECE_BINS = 15
+
+
+# 📄 The metrics artifact lives next to the model it describes (brain_tumor_inceptionv3.keras -> .metrics.json)
+def metrics_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ".metrics.json"
+
+
+def load_metrics(model_path):
+    try:
+        with open(metrics_path_for(model_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compute_metrics(confusion, bin_counts, bin_confidence, bin_correct, class_names):
+    """Accuracy, per-class precision/recall/F1, macro and weighted F1, and ECE from running totals."""
+    confusion = np.asarray(confusion, dtype=np.int64)
+    total = int(confusion.sum())
+    true_positives = np.diag(confusion).astype(np.float64)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(precision), where=precision + recall > 0)
+    nonempty = bin_counts > 0
+    ece = float(np.sum(np.abs(bin_correct[nonempty] - bin_confidence[nonempty])) / total) if total else 0.0
+    return {
+        'samples': total,
+        'accuracy': float(true_positives.sum() / total) if total else 0.0,
+        'macro_f1': float(f1.mean()),
+        'weighted_f1': float(np.sum(f1 * support) / total) if total else 0.0,
+        'ece': ece,
+        'per_class': {cls: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]),
+                            'support': int(support[i])} for i, cls in enumerate(class_names)},
+        'confusion_matrix': confusion.tolist(),
+        'calibration': [{'confidence': float(bin_confidence[b] / bin_counts[b]), 'accuracy': float(bin_correct[b] / bin_counts[b]),
+                         'count': int(bin_counts[b])} for b in np.flatnonzero(nonempty)],
+    }
+
+
+def evaluate(classifier, root, batch_size=32, workers=None, prefetch=2, num_bins=ECE_BINS, latency_runs=20,
+             progress_callback=None):
+    """Score a labeled split (``root/<class>/<file>``) in one streaming pass.
+
+    Decoding runs in a thread pool ahead of the model (``iter_decoded_batches``),
+    and labels come from the same file list as the images, so nothing is read
+    twice and only running totals (confusion matrix, calibration bins) are kept.
+    """
+    class_names = list(classifier.class_names)
+    rel_paths = [p for p in iter_image_paths(root) if p.split(os.sep)[0] in class_names]
+    confusion = np.zeros((len(class_names), len(class_names)), dtype=np.int64)
+    bin_counts = np.zeros(num_bins, dtype=np.int64)
+    bin_confidence = np.zeros(num_bins)
+    bin_correct = np.zeros(num_bins)
+    errors = 0
+    model_seconds = 0.0
+    last_batch = None
+
+    start = time.perf_counter()
+    done = 0
+    for chunk, decoded in iter_decoded_batches(root, rel_paths, batch_size, workers, prefetch):
+        ok = [(p, img) for p, (img, error) in zip(chunk, decoded) if error is None]
+        errors += len(chunk) - len(ok)
+        if ok:
+            last_batch = normalize_batch(np.stack([img for _, img in ok]))
+            forward_start = time.perf_counter()
+            probs = classifier.predict_array(last_batch, batch_size)
+            model_seconds += time.perf_counter() - forward_start
+            labels = np.array([class_names.index(p.split(os.sep)[0]) for p, _ in ok])
+            top = probs.argmax(axis=1)
+            confidence = probs[np.arange(len(top)), top]
+            np.add.at(confusion, (labels, top), 1)
+            bins = np.minimum((confidence * num_bins).astype(int), num_bins - 1)
+            np.add.at(bin_counts, bins, 1)
+            np.add.at(bin_confidence, bins, confidence)
+            np.add.at(bin_correct, bins, top == labels)
+        done += len(chunk)
+        if progress_callback:
+            progress_callback(done, len(rel_paths))
+    wall_seconds = time.perf_counter() - start
+
+    metrics = compute_metrics(confusion, bin_counts, bin_confidence, bin_correct, class_names)
+    single_scan = measure_latency(lambda: classifier.predict_array(last_batch[:1]), latency_runs) if last_batch is not None else None
+    metrics.update({
+        'class_names': class_names,
+        'decode_errors': errors,
+        'throughput': {
+            'wall_seconds': wall_seconds,
+            'images_per_second': metrics['samples'] / wall_seconds if wall_seconds else 0.0,
+            'model_seconds': model_seconds,
+            'batch_size': batch_size,
+            'single_scan_ms': single_scan,
+        },
+    })
+    return metrics
+
+
+def format_metrics(metrics):
+    lines = [f"{metrics['samples']} images: accuracy {metrics['accuracy'] * 100:.1f}%, macro F1 {metrics['macro_f1'] * 100:.1f}%, "
+             f"weighted F1 {metrics['weighted_f1'] * 100:.1f}%, ECE {metrics['ece']:.3f}"]
+    for cls, row in metrics['per_class'].items():
+        lines.append(f"  {cls:<12} precision {row['precision'] * 100:5.1f}%  recall {row['recall'] * 100:5.1f}%  "
+                     f"F1 {row['f1'] * 100:5.1f}%  n={row['support']}")
+    throughput = metrics['throughput']
+    lines.append(f"{throughput['images_per_second']:.1f} images/s end to end ({throughput['wall_seconds']:.1f}s)"
+                 + (f", single scan p50 {throughput['single_scan_ms']['p50_ms']:.1f} ms" if throughput['single_scan_ms'] else ""))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the model on a labeled split and write its metrics artifact.")
+    parser.add_argument('data_dir', help="Labeled directory (root/<class>/<file>), e.g. brain_tumor_dataset/Testing")
+    parser.add_argument('--model', help="Path to the model artifact (default: the backend's file under models/)")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, help="Decode threads (default: Python's ThreadPoolExecutor default)")
+    parser.add_argument('--prefetch', type=int, default=2, help="Batches decoded ahead of the model")
+    parser.add_argument('--output', help="Where to write the metrics (default: <model>.metrics.json next to the model)")
+    args = parser.parse_args(argv)
+
+    classifier = BrainTumorClassifier(model_path=args.model, batch_size=args.batch_size, backend=args.backend, warmup=True)
+    metrics = evaluate(classifier, args.data_dir, args.batch_size, args.workers, args.prefetch,
+                       progress_callback=lambda done, total: print(f"\r{done}/{total}", end='', file=sys.stderr))
+    print(file=sys.stderr)
+    metrics.update({
+        'model_path': classifier.model_path,
+        'model_id': classifier.model_id,
+        'backend': args.backend,
+        'data_dir': os.path.abspath(args.data_dir),
+        'evaluated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    })
+    output = args.output or metrics_path_for(classifier.model_path)
+    with open(output + '.tmp', 'w') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(output + '.tmp', output)
+    print(format_metrics(metrics))
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
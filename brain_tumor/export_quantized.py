@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+
+from .backends import BACKEND_ARTIFACTS
+from .inference import IMG_SIZE, load_keras_model
+
+
+# 🗜️ float16 weights: half the size, float32 compute on CPU
+def export_tflite_fp16(model, output_path):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+# 🗜️ int8 dynamic-range: int8 weights, activations quantized on the fly, no calibration data needed
+def export_tflite_int8(model, output_path):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+# 🔁 ONNX export (needs tf2onnx) with a dynamic batch dimension
+def export_onnx(model, output_path):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, IMG_SIZE[1], IMG_SIZE[0], 3), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=17, output_path=output_path)
+
+
+EXPORTERS = {
+    'tflite-fp16': export_tflite_fp16,
+    'tflite-int8': export_tflite_int8,
+    'onnx': export_onnx,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export float16/int8 TFLite and ONNX variants of the Keras model.")
+    parser.add_argument('--model', help="Source .keras/.h5 model (default: models/brain_tumor_inceptionv3.keras)")
+    parser.add_argument('--backends', nargs='+', choices=list(EXPORTERS), default=list(EXPORTERS))
+    parser.add_argument('--output-dir', help="Directory for the exported artifacts (default: models/)")
+    args = parser.parse_args(argv)
+
+    model = load_keras_model(args.model)
+    for backend in args.backends:
+        output_path = BACKEND_ARTIFACTS[backend]
+        if args.output_dir:
+            output_path = os.path.join(args.output_dir, os.path.basename(output_path))
+        try:
+            EXPORTERS[backend](model, output_path)
+        except ImportError as e:
+            print(f"Skipping {backend}: {e}", file=sys.stderr)
+            continue
+        print(f"{backend}: {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
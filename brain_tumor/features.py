@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from .inference import IMG_SIZE
+
+FEATURES_FILE = 'features.npy'
+META_FILE = 'meta.json'
+
+
+# 🔐 Identity of the frozen backbone: any change to its weights or input size invalidates the cache
+def backbone_fingerprint(base_model, image_size=IMG_SIZE):
+    digest = hashlib.sha256(f"{base_model.name}:{image_size[0]}x{image_size[1]}".encode('utf-8'))
+    for weight in base_model.weights:
+        digest.update(weight.path.encode('utf-8') if hasattr(weight, 'path') else weight.name.encode('utf-8'))
+        digest.update(np.ascontiguousarray(weight.numpy()).tobytes())
+    return digest.hexdigest()
+
+
+# 📂 Identity of the input set: order, paths and file sizes
+def files_fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f"{path}\0{os.path.getsize(path)}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Memory-mapped ``(N, D)`` float32 array of pooled backbone features.
+
+    ``meta.json`` records the backbone and file-list fingerprints and how many
+    rows are complete. Rows are flushed before the counter is advanced, so an
+    interrupted extraction resumes where it stopped, and a changed backbone or
+    file list starts over.
+    """
+
+    def __init__(self, cache_dir, num_rows, dim, fingerprint):
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint
+        os.makedirs(cache_dir, exist_ok=True)
+        features_path = os.path.join(cache_dir, FEATURES_FILE)
+        meta = self._read_meta()
+        if (meta.get('fingerprint') == fingerprint and meta.get('shape') == [num_rows, dim]
+                and os.path.exists(features_path)):
+            self.completed = int(meta.get('completed', 0))
+            self.features = np.lib.format.open_memmap(features_path, mode='r+')
+        else:
+            self.completed = 0
+            self.features = np.lib.format.open_memmap(features_path, mode='w+', dtype=np.float32, shape=(num_rows, dim))
+            self._write_meta()
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.cache_dir, META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        path = os.path.join(self.cache_dir, META_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'shape': list(self.features.shape), 'completed': self.completed}, f)
+        os.replace(path + '.tmp', path)
+
+    @property
+    def complete(self):
+        return self.completed >= len(self.features)
+
+    def append(self, rows):
+        self.features[self.completed:self.completed + len(rows)] = rows
+        self.features.flush()
+        self.completed += len(rows)
+        self._write_meta()
+
+
+def extract_features(base_model, paths, cache_dir, batch_size=32, image_size=IMG_SIZE, progress_every=20):
+    """Run the frozen backbone once over ``paths`` and return the pooled features (memmap).
+
+    Decoding reuses the training pipeline without augmentation, and features
+    are global-average pooled, exactly what the head's first layer would see.
+    """
+    import tensorflow as tf
+
+    from .train import make_dataset
+
+    fingerprint = hashlib.sha256(f"{backbone_fingerprint(base_model, image_size)}:{files_fingerprint(paths)}".encode('utf-8')).hexdigest()
+    dim = base_model.output_shape[-1]
+    cache = FeatureCache(cache_dir, len(paths), dim, fingerprint)
+    if cache.complete:
+        print(f"Feature cache up to date ({len(paths)} x {dim})", file=sys.stderr)
+        return cache.features
+    if cache.completed:
+        print(f"Resuming feature extraction at {cache.completed}/{len(paths)}", file=sys.stderr)
+
+    @tf.function(input_signature=[tf.TensorSpec((None, image_size[1], image_size[0], 3), tf.float32)])
+    def pooled(img_batch):
+        return tf.reduce_mean(base_model(img_batch, training=False), axis=(1, 2))
+
+    remaining = paths[cache.completed:]
+    # Read once, so nothing is cached: every decoded image would otherwise stay in memory until the end
+    ds = make_dataset(remaining, np.zeros(len(remaining), dtype=np.int32), batch_size, image_size, cache_path=None)
+    start = time.perf_counter()
+    for step, (img_batch, _) in enumerate(ds):
+        cache.append(pooled(img_batch).numpy())
+        if progress_every and (step + 1) % progress_every == 0:
+            rate = (cache.completed - (len(paths) - len(remaining))) / (time.perf_counter() - start)
+            print(f"Features {cache.completed}/{len(paths)} ({rate:.1f} images/s)", file=sys.stderr)
+    return cache.features
+
+
+# 🧠 The classifier head on its own, fed with pooled features instead of images
+def build_head(num_classes, dim=2048):
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    inputs = tf.keras.Input(shape=(dim,))
+    x = layers.Dropout(0.5)(inputs)
+    outputs = layers.Dense(num_classes, activation='softmax')(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+# 🔁 Copy the trained Dense weights into the full image model's final layer
+def transfer_head(head, model):
+    model.layers[-1].set_weights(head.layers[-1].get_weights())
@@ -0,0 +1,90 @@
+import numpy as np
+from PIL import Image
+
+from .inference import IMG_SIZE
+
+# Last mixed block of InceptionV3 (5x5x2048 at 224x224 input)
+DEFAULT_GRADCAM_LAYER = 'mixed10'
+
+
+# 🔎 The backbone is nested inside the classifier (notebook layout) or flattened into it
+def _find_backbone(model, layer_name):
+    for layer in model.layers:
+        if hasattr(layer, 'get_layer'):
+            try:
+                layer.get_layer(layer_name)
+                return layer
+            except ValueError:
+                continue
+    return None
+
+
+# 🧩 Combined forward pass returning (target-layer activations, softmax) from one evaluation
+def build_activation_model(model, layer_name=DEFAULT_GRADCAM_LAYER):
+    import tensorflow as tf
+
+    backbone = _find_backbone(model, layer_name)
+    if backbone is None:
+        combined = tf.keras.Model(model.inputs, [model.get_layer(layer_name).output, model.outputs[0]])
+        return lambda x: combined(x, training=False)
+
+    inner = tf.keras.Model(backbone.inputs, [backbone.get_layer(layer_name).output, backbone.outputs[0]])
+    head = model.layers[model.layers.index(backbone) + 1:]
+
+    def forward(x):
+        activations, features = inner(x, training=False)
+        for layer in head:
+            features = layer(features)
+        return activations, features
+
+    return forward
+
+
+class GradCAMExplainer:
+    """Grad-CAM heatmaps computed in the same pass that produces the prediction.
+
+    ``explain`` takes a preprocessed NHWC batch and returns ``(probs, cams)``:
+    the softmax for every scan and a [0, 1] heatmap over the target layer's
+    spatial grid for the top class, so no separate ``predict`` call is needed.
+    """
+
+    def __init__(self, model, layer_name=DEFAULT_GRADCAM_LAYER, input_size=IMG_SIZE):
+        import tensorflow as tf
+
+        self.layer_name = layer_name
+        forward = build_activation_model(model, layer_name)
+
+        @tf.function(input_signature=[tf.TensorSpec((None, input_size[1], input_size[0], 3), tf.float32)])
+        def explain(img_batch):
+            with tf.GradientTape() as tape:
+                # Watching the input records the whole graph, even if backbone weights are frozen
+                tape.watch(img_batch)
+                activations, probs = forward(img_batch)
+                top_scores = tf.gather(probs, tf.argmax(probs, axis=1), batch_dims=1)
+            # Scans are independent at inference time, so the gradient of the sum is per-scan
+            grads = tape.gradient(top_scores, activations)
+            weights = tf.reduce_mean(grads, axis=(1, 2))
+            cams = tf.nn.relu(tf.einsum('bhwc,bc->bhw', activations, weights))
+            cams = cams / (tf.reduce_max(cams, axis=(1, 2), keepdims=True) + 1e-8)
+            return probs, cams
+
+        self._explain = explain
+
+    def explain(self, img_batch, batch_size=32):
+        probs, cams = [], []
+        for start in range(0, len(img_batch), batch_size):
+            p, c = self._explain(np.asarray(img_batch[start:start + batch_size], dtype=np.float32))
+            probs.append(np.asarray(p))
+            cams.append(np.asarray(c))
+        return np.concatenate(probs), np.concatenate(cams)
+
+
+# 🎨 Blend a heatmap over the scan (jet colormap, bilinear upsampling)
+def overlay_heatmap(img, cam, alpha=0.4, colormap='jet'):
+    from matplotlib import colormaps
+
+    img = img.convert('RGB')
+    heatmap = Image.fromarray(np.uint8(np.clip(cam, 0, 1) * 255)).resize(img.size, Image.BILINEAR)
+    colored = colormaps[colormap](np.asarray(heatmap) / 255.0)[..., :3]
+    blended = (1 - alpha) * np.asarray(img, dtype=np.float32) + alpha * colored * 255
+    return Image.fromarray(np.uint8(np.clip(blended, 0, 255)))
@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+# One row per distinct image (re-analysis updates it in place); class order is stored once per model version.
+# Pages are newest first, so both indexes lead with time and carry confidence: a confidence filter is checked
+# in the index while walking it, instead of collecting every row in the range and sorting them
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    image_hash TEXT PRIMARY KEY,
+    analyzed_at REAL NOT NULL,
+    first_analyzed_at REAL NOT NULL,
+    analyses INTEGER NOT NULL DEFAULT 1,
+    kind TEXT NOT NULL,
+    filename TEXT,
+    top_class TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    model_version TEXT NOT NULL,
+    preds BLOB NOT NULL,
+    timings TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS model_versions (
+    model_version TEXT PRIMARY KEY,
+    class_names TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_analyzed_at ON scans (analyzed_at, confidence);
+CREATE INDEX IF NOT EXISTS scans_class_analyzed_at ON scans (top_class, analyzed_at, confidence);
+"""
+
+UPSERT = """
+INSERT INTO scans (image_hash, analyzed_at, first_analyzed_at, kind, filename, top_class, confidence, model_version, preds, timings)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (image_hash) DO UPDATE SET
+    analyzed_at = excluded.analyzed_at, analyses = analyses + 1, kind = excluded.kind, filename = excluded.filename,
+    top_class = excluded.top_class, confidence = excluded.confidence, model_version = excluded.model_version,
+    preds = excluded.preds, timings = excluded.timings
+"""
+
+COLUMNS = ('analyzed_at', 'image_hash', 'filename', 'kind', 'top_class', 'confidence', 'model_version', 'analyses', 'timings', 'preds', 'class_names')
+
+
+def image_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def connect(path):
+    # WAL lets the page read while the writer commits; NORMAL sync is durable across app crashes in WAL mode
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _filters(top_class=None, min_confidence=None, max_confidence=None, since=None, until=None):
+    clauses, params = [], []
+    for clause, value in (("top_class = ?", top_class), ("confidence >= ?", min_confidence),
+                          ("confidence <= ?", max_confidence), ("analyzed_at >= ?", since), ("analyzed_at < ?", until)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    return clauses, params
+
+
+class ScanHistory:
+    """Persistent scan history in SQLite, written by a background thread.
+
+    ``record`` only puts the row on a bounded queue, so the inference path
+    never waits on disk; when the queue is full the row is dropped and
+    counted. The writer drains whatever has queued up and commits it in one
+    transaction, so bursts (a batch upload) become a single write. ``page``
+    uses keyset pagination on ``(analyzed_at, rowid)`` over the indexes, so
+    page N costs the same as page 1 and the table is never read whole.
+    """
+
+    def __init__(self, path, max_pending=10000, max_batch=512):
+        self.path = path
+        self.max_batch = max_batch
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self._queue = queue.Queue(max_pending)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with connect(path) as conn:
+            conn.executescript(SCHEMA)
+        conn.close()
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, image_hash, preds, class_names, model_version, kind='single', filename=None, timings=None,
+               analyzed_at=None):
+        preds = np.asarray(preds, dtype=np.float32)
+        top_idx = int(np.argmax(preds))
+        analyzed_at = time.time() if analyzed_at is None else analyzed_at
+        row = (image_hash, analyzed_at, analyzed_at, kind, filename, class_names[top_idx], float(preds[top_idx]),
+               model_version, preds.tobytes(), json.dumps(timings or {}))
+        try:
+            self._queue.put_nowait((row, json.dumps(list(class_names))))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.max_batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany("INSERT OR IGNORE INTO model_versions VALUES (?, ?)",
+                                     {(row[7], names) for row, names in items})
+                    conn.executemany(UPSERT, [row for row, _ in items])
+                self.written += len(items)
+            except sqlite3.Error as e:
+                self.errors += len(items)
+                self.last_error = str(e)
+            for _ in items:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every recorded row has been committed (or failed)."""
+        self._queue.join()
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def page(self, limit=50, after=None, **filters):
+        """One page, newest first. ``after`` is the cursor returned with the previous page; returns (rows, next cursor)."""
+        clauses, params = _filters(**filters)
+        if after is not None:
+            clauses.append("(analyzed_at, scans.rowid) < (?, ?)")
+            params += list(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (f"SELECT scans.rowid, {', '.join(COLUMNS)} FROM scans JOIN model_versions USING (model_version) {where} "
+               f"ORDER BY analyzed_at DESC, scans.rowid DESC LIMIT ?")
+        conn = connect(self.path)
+        try:
+            fetched = conn.execute(sql, params + [limit + 1]).fetchall()
+        finally:
+            conn.close()
+        rows = []
+        for rowid, *values in fetched[:limit]:
+            row = dict(zip(COLUMNS, values))
+            row['timings'] = json.loads(row['timings'])
+            row['preds'] = dict(zip(json.loads(row.pop('class_names')), np.frombuffer(row['preds'], dtype=np.float32).tolist()))
+            row['rowid'] = rowid
+            rows.append(row)
+        after = (rows[-1]['analyzed_at'], rows[-1]['rowid']) if len(fetched) > limit else None
+        return rows, after
+
+    def get(self, image_hash):
+        conn = connect(self.path)
+        try:
+            found = conn.execute("SELECT top_class, confidence, model_version, analyzed_at FROM scans WHERE image_hash = ?",
+                                 (image_hash,)).fetchone()
+        finally:
+            conn.close()
+        return dict(zip(('top_class', 'confidence', 'model_version', 'analyzed_at'), found)) if found else None
+
+    def explain(self, **filters):
+        """SQLite's plan for a filtered page, to check it walks an index instead of sorting the table."""
+        clauses, params = _filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = connect(self.path)
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN SELECT rowid FROM scans {where} ORDER BY analyzed_at DESC, rowid DESC LIMIT 50",
+                                params).fetchall()
+        finally:
+            conn.close()
+        return [step[-1] for step in plan]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the scan history, or fill a scratch database and time its pages.")
+    parser.add_argument('db', help="SQLite file (the app's BRAIN_TUMOR_HISTORY_DB)")
+    parser.add_argument('--class', dest='top_class')
+    parser.add_argument('--min-confidence', type=float)
+    parser.add_argument('--max-confidence', type=float)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--synthetic', type=int, default=0, metavar='ROWS', help="First insert this many random scans (for timing)")
+    args = parser.parse_args(argv)
+
+    history = ScanHistory(args.db)
+    if args.synthetic:
+        class_names = ['glioma', 'meningioma', 'notumor', 'pituitary']
+        rng = np.random.default_rng(0)
+        now = time.time()
+        start = time.perf_counter()
+        for i in range(args.synthetic):
+            history.record(os.urandom(32).hex(), rng.dirichlet(np.ones(4) * 0.3), class_names, 'synthetic',
+                           timings={'inference': 0.1}, analyzed_at=now - (args.synthetic - i))
+            if history.pending > 5000:
+                time.sleep(0.01)
+        history.flush()
+        print(f"Inserted {history.written} rows in {time.perf_counter() - start:.1f}s ({history.dropped} dropped)", file=sys.stderr)
+
+    filters = {'top_class': args.top_class, 'min_confidence': args.min_confidence, 'max_confidence': args.max_confidence}
+    print("Plan: " + "; ".join(history.explain(**filters)), file=sys.stderr)
+    after = None
+    for number in range(1, 4):
+        start = time.perf_counter()
+        rows, after = history.page(args.limit, after, **filters)
+        print(f"Page {number}: {len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+        if number == 1:
+            for row in rows:
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['analyzed_at']))}  {row['top_class']:<11}"
+                      f"{row['confidence'] * 100:5.1f}%  {row['model_version']:<16}{row['filename'] or row['image_hash'][:16]}")
+        if after is None:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import io
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+# 📁 Default artifact locations (relative to the repository root)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(ROOT_DIR, "models")
+DEFAULT_MODEL_PATH = os.path.join(MODELS_DIR, "brain_tumor_inceptionv3.keras")
+FALLBACK_MODEL_PATH = os.path.join(MODELS_DIR, "brain_tumor_inceptionv3.h5")
+DEFAULT_CLASS_NAMES_PATH = os.path.join(MODELS_DIR, "class_names.json")
+
+IMG_SIZE = (224, 224)
+
+
+# 🧵 TensorFlow CPU thread pools; must run before TF executes its first op
+def configure_tf_threads(intra_op=None, inter_op=None):
+    if not intra_op and not inter_op:
+        return
+    import tensorflow as tf
+
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+# 🏷 Class order the model was trained with
+def load_class_names(path=DEFAULT_CLASS_NAMES_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+# 🧬 Load the Keras model (.keras first, then .h5 as fallback) and report which file was used.
+# Only a missing or unreadable .keras falls through to the .h5; without one, the .keras error is raised as is
+def _load_model_with_path(model_path=None):
+    from tensorflow.keras.models import load_model
+
+    if model_path is not None:
+        return load_model(model_path), model_path
+    try:
+        return load_model(DEFAULT_MODEL_PATH), DEFAULT_MODEL_PATH
+    except Exception as e:
+        if not os.path.exists(FALLBACK_MODEL_PATH):
+            raise
+        try:
+            return load_model(FALLBACK_MODEL_PATH), FALLBACK_MODEL_PATH
+        except Exception as fallback_error:
+            raise fallback_error from e
+
+
+def load_keras_model(model_path=None):
+    return _load_model_with_path(model_path)[0]
+
+
+# 🪪 Cheap identity for a model artifact: file name, size and modification time
+def model_identity(model_path):
+    stat = os.stat(model_path)
+    return f"{os.path.basename(model_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# JPEG draft decoding keeps at least this multiple of the target size before the final resize
+DRAFT_GAP = 2
+
+
+# 🖼 Accept PIL images, file paths, raw bytes, file-like objects or arrays (decoded lazily, mode untouched)
+def open_image(img):
+    if isinstance(img, Image.Image):
+        return img
+    if isinstance(img, np.ndarray):
+        return Image.fromarray(img)
+    if isinstance(img, (bytes, bytearray)):
+        img = io.BytesIO(img)
+    return Image.open(img)
+
+
+def to_rgb_image(img):
+    return open_image(img).convert('RGB')
+
+
+# 🖼 Decode straight to the model input size. Grayscale scans are resized before the RGB expansion
+# (bit-identical, a third of the work). With draft=True, JPEGs are DCT-downscaled while decoding to
+# >= DRAFT_GAP x the target: several times faster on 2000+ px uploads, but NOT equivalent to a full
+# decode (pixels differ by up to ~7/255 on large scans), so it is opt-in and off wherever metrics apply.
+def decode_resized(img, target_size=IMG_SIZE, draft=False):
+    image = open_image(img)
+    if draft and image.format == 'JPEG':
+        image.draft('RGB', (target_size[0] * DRAFT_GAP, target_size[1] * DRAFT_GAP))
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image = image.resize(target_size)
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+# 🔧 Decode and resize to the model input size, kept as uint8 until batching
+def load_image_uint8(img, target_size=IMG_SIZE, draft=False):
+    return np.asarray(decode_resized(img, target_size, draft), dtype=np.uint8)
+
+
+# 🔧 Same preprocessing as training: resize to 224x224 and scale to [0, 1], written straight into `out`
+def preprocess_image(img, target_size=IMG_SIZE, out=None, draft=False):
+    if out is None:
+        out = np.empty((target_size[1], target_size[0], 3), dtype=np.float32)
+    return np.divide(load_image_uint8(img, target_size, draft), np.float32(255.0), out=out)
+
+
+# 📦 Vectorized normalization of an NHWC uint8 array (one float32 allocation, no astype copy)
+def normalize_batch(batch):
+    return np.divide(batch, np.float32(255.0), dtype=np.float32)
+
+
+# 📦 Vectorized preprocessing: every scan is normalized straight into one preallocated NHWC float32 batch
+def preprocess_batch(imgs, target_size=IMG_SIZE, draft=False):
+    batch = np.empty((len(imgs), target_size[1], target_size[0], 3), dtype=np.float32)
+    for i, img in enumerate(imgs):
+        preprocess_image(img, target_size, out=batch[i], draft=draft)
+    return batch
+
+
+# ⚡ Fixed-signature compiled forward pass: skips the data-adapter machinery of model.predict
+def make_forward_fn(model, input_size=IMG_SIZE, jit_compile=False):
+    import tensorflow as tf
+
+    @tf.function(
+        input_signature=[tf.TensorSpec((None, input_size[1], input_size[0], 3), tf.float32)],
+        jit_compile=jit_compile,
+    )
+    def forward(img_batch):
+        return model(img_batch, training=False)
+
+    return forward
+
+
+class BrainTumorClassifier:
+    """Headless InceptionV3 brain tumor classifier.
+
+    Loads the model and class names once; every ``predict*`` method returns
+    softmax probabilities ordered like ``class_names``. ``backend`` selects
+    Keras or one of the quantized TFLite/ONNX artifacts (see ``backends``).
+    Keras models run through a compiled ``tf.function`` (optionally XLA JIT)
+    unless ``compile=False``; ``warmup=True`` pays the trace cost up front.
+    ``fast_decode=True`` opts into approximate JPEG draft decoding (see ``decode_resized``).
+    """
+
+    def __init__(self, model_path=None, class_names_path=DEFAULT_CLASS_NAMES_PATH,
+                 batch_size=32, model=None, class_names=None, backend='keras',
+                 compile=True, jit_compile=False, warmup=False, fast_decode=False, input_size=IMG_SIZE):
+        if model is None:
+            from .backends import load_backend_model
+
+            model, model_path = load_backend_model(backend, model_path)
+        self.model = model
+        self.backend = backend
+        self.model_path = model_path
+        self.model_id = model_identity(model_path) if model_path else f"{model.name}:{id(model)}"
+        self.class_names = class_names if class_names is not None else load_class_names(class_names_path)
+        self.batch_size = batch_size
+        self.input_size = tuple(input_size)
+        self.fast_decode = fast_decode
+        self.jit_compile = jit_compile if backend == 'keras' and compile else False
+        self._forward_fn = make_forward_fn(model, self.input_size, jit_compile) if backend == 'keras' and compile else None
+        if warmup:
+            self.warmup()
+
+    def warmup(self):
+        # Trace/compile the forward pass (and let TF allocate its buffers) before the first real request
+        start = time.perf_counter()
+        self.forward(np.zeros((1, self.input_size[1], self.input_size[0], 3), dtype=np.float32))
+        self.warmup_seconds = time.perf_counter() - start
+        return self.warmup_seconds
+
+    def forward(self, img_batch):
+        if self._forward_fn is not None:
+            return np.asarray(self._forward_fn(img_batch))
+        return self.model.predict_on_batch(img_batch)
+
+    def preprocess(self, img, out=None):
+        return preprocess_image(img, self.input_size, out=out, draft=self.fast_decode)
+
+    def predict(self, img):
+        img_array = np.empty((1, self.input_size[1], self.input_size[0], 3), dtype=np.float32)
+        self.preprocess(img, out=img_array[0])
+        return self.predict_array(img_array)[0]
+
+    def predict_batch(self, imgs, batch_size=None, progress_callback=None):
+        return self.predict_array(preprocess_batch(imgs, self.input_size, self.fast_decode), batch_size, progress_callback)
+
+    def predict_array(self, img_batch, batch_size=None, progress_callback=None):
+        # img_batch is an already preprocessed NHWC float32 array
+        batch_size = batch_size or self.batch_size
+        preds = np.empty((len(img_batch), len(self.class_names)), dtype=np.float32)
+        for start in range(0, len(img_batch), batch_size):
+            end = min(start + batch_size, len(img_batch))
+            preds[start:end] = self.forward(img_batch[start:end])
+            if progress_callback is not None:
+                progress_callback(end, len(img_batch))
+        return preds
+
+    def predict_paths(self, paths, batch_size=None, progress_callback=None):
+        # Decode one batch at a time so large folders never sit in memory at once
+        batch_size = batch_size or self.batch_size
+        paths = list(paths)
+        preds = np.empty((len(paths), len(self.class_names)), dtype=np.float32)
+        for start in range(0, len(paths), batch_size):
+            end = min(start + batch_size, len(paths))
+            preds[start:end] = self.predict_batch(paths[start:end], batch_size=batch_size)
+            if progress_callback is not None:
+                progress_callback(end, len(paths))
+        return preds
+
+    def top_class(self, preds):
+        top_idx = int(np.argmax(preds))
+        return self.class_names[top_idx], float(preds[top_idx])
@@ -0,0 +1,75 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from .inference import IMG_SIZE, BrainTumorClassifier
+
+
+# ⏱️ Latency percentiles of fn() over repeated calls, after discarding warm-up calls
+def measure_latency(fn, runs=50, warmup=5):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+    }
+
+
+# 🔬 Single-image latency of each execution path on the same model
+def compare_single_image_paths(model_path=None, model=None, runs=50, warmup=5, xla=True):
+    classifier = BrainTumorClassifier(model_path=model_path, model=model, compile=False)
+    img_array = np.random.default_rng(0).random((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+
+    paths = {
+        'model.predict': lambda: classifier.model.predict(img_array, verbose=0),
+        'predict_on_batch': lambda: classifier.model.predict_on_batch(img_array),
+    }
+    compiled = BrainTumorClassifier(model=classifier.model, class_names=classifier.class_names)
+    start = time.perf_counter()
+    compiled.warmup()
+    paths['tf.function'] = lambda: compiled.forward(img_array)
+    first_call = {'tf.function': time.perf_counter() - start}
+    if xla:
+        compiled_xla = BrainTumorClassifier(model=classifier.model, class_names=classifier.class_names, jit_compile=True)
+        first_call['tf.function+xla'] = compiled_xla.warmup()
+        paths['tf.function+xla'] = lambda: compiled_xla.forward(img_array)
+
+    results = {}
+    for name, fn in paths.items():
+        results[name] = measure_latency(fn, runs=runs, warmup=warmup)
+        if name in first_call:
+            results[name]['warmup_seconds'] = first_call[name]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare single-image latency of model.predict against the compiled fast path.")
+    parser.add_argument('--model', help="Path to a .keras/.h5 model (default: models/brain_tumor_inceptionv3.keras)")
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--no-xla', action='store_true', help="Skip the XLA JIT variant")
+    parser.add_argument('--output', help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = compare_single_image_paths(args.model, runs=args.runs, warmup=args.warmup, xla=not args.no_xla)
+    baseline = results['model.predict']['p50_ms']
+    print(f"{'path':<18}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'speedup':>10}")
+    for name, r in results.items():
+        print(f"{name:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{baseline / r['p50_ms']:>9.2f}x")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import threading
+import time
+
+
+class BackgroundLoader:
+    """Runs an expensive ``factory()`` (e.g. model loading) on a daemon thread.
+
+    ``status`` is ``'loading'``, ``'ready'`` or ``'error'``; ``get()`` blocks
+    until the result is available and re-raises any loading error.
+    """
+
+    def __init__(self, factory, name="model-loader"):
+        self.factory = factory
+        self.result = None
+        self.error = None
+        self.load_seconds = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.result = self.factory()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.load_seconds = time.perf_counter() - self.started_at
+            self._done.set()
+
+    @property
+    def status(self):
+        if not self._done.is_set():
+            return 'loading'
+        return 'error' if self.error is not None else 'ready'
+
+    @property
+    def elapsed(self):
+        return self.load_seconds if self.load_seconds is not None else time.perf_counter() - self.started_at
+
+    def get(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Model is still loading")
+        if self.error is not None:
+            raise self.error
+        return self.result
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from .score_dir import iter_image_paths
+
+
+# 🖼 Request bodies: real scans from a directory, or synthetic JPEGs
+def load_bodies(images_dir=None, limit=64, size=512):
+    if images_dir:
+        paths = [os.path.join(images_dir, p) for p in iter_image_paths(images_dir)][:limit]
+        bodies = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                bodies.append(f.read())
+        return bodies
+    rng = np.random.default_rng(0)
+    bodies = []
+    for _ in range(min(limit, 16)):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(buffer, format='JPEG')
+        bodies.append(buffer.getvalue())
+    return bodies
+
+
+async def _post(reader, writer, host, body):
+    writer.write(
+        f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/octet-stream\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    headers = {k.strip().lower(): v.strip() for k, v in (l.split(':', 1) for l in lines[1:] if ':' in l)}
+    payload = json.loads(await reader.readexactly(int(headers['content-length'])))
+    return status, payload
+
+
+# 🔥 Closed-loop load: `concurrency` keep-alive clients send requests back to back
+async def run_load(host, port, bodies, concurrency=16, requests=500):
+    latencies, batch_sizes, errors = [], [], 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in counter:
+                start = time.perf_counter()
+                status, payload = await _post(reader, writer, host, bodies[i % len(bodies)])
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+                    batch_sizes.append(payload['batch_size'])
+                else:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'seconds': elapsed,
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None,
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+        'mean_batch_size': float(np.mean(batch_sizes)) if batch_sizes else None,
+    }
+
+
+async def _wait_healthy(host, port, process, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Inference server exited during startup")
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.5)
+    raise TimeoutError("Inference server did not start in time")
+
+
+# 📐 Start a server per (batch size, wait) setting and measure each one under the same load
+def sweep(batch_sizes, wait_ms_values, bodies, server_args, host='127.0.0.1', port=8765,
+          concurrency=16, requests=500, startup_timeout=600):
+    results = []
+    for batch_size in batch_sizes:
+        for wait_ms in wait_ms_values:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'brain_tumor.serve', '--host', host, '--port', str(port),
+                 '--max-batch-size', str(batch_size), '--max-wait-ms', str(wait_ms)] + server_args,
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                asyncio.run(_wait_healthy(host, port, process, startup_timeout))
+                result = asyncio.run(run_load(host, port, bodies, concurrency, requests))
+            finally:
+                process.terminate()
+                process.wait()
+            result.update({'max_batch_size': batch_size, 'max_wait_ms': wait_ms})
+            results.append(result)
+            print(format_row(result), flush=True)
+    return results
+
+
+def format_row(r):
+    fmt = lambda v: f"{v:.1f}" if v is not None else "n/a"
+    return (f"batch={r.get('max_batch_size', '-'):>4}  wait={r.get('max_wait_ms', '-'):>5} ms  "
+            f"conc={r['concurrency']:>3}  {r['throughput_rps']:8.1f} req/s  p50 {fmt(r['p50_ms'])} ms  "
+            f"p95 {fmt(r['p95_ms'])} ms  p99 {fmt(r['p99_ms'])} ms  mean batch {fmt(r['mean_batch_size'])}  errors {r['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for brain_tumor.serve: throughput and tail latency.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="Target an already running server")
+    parser.add_argument('--images', help="Directory of scans to send (default: synthetic 512x512 JPEGs)")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32], help="Sweep: server max batch sizes")
+    parser.add_argument('--wait-ms', type=float, nargs='+', default=[0, 5, 20], help="Sweep: server max wait times")
+    parser.add_argument('--server-args', default='', help="Extra arguments for spawned servers, e.g. \"--workers 2\"")
+    parser.add_argument('--output', help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    bodies = load_bodies(args.images)
+    if args.port:
+        results = [asyncio.run(run_load(args.host, args.port, bodies, args.concurrency, args.requests))]
+        print(format_row(results[0]))
+    else:
+        results = sweep(args.batch_sizes, args.wait_ms, bodies, args.server_args.split(),
+                        host=args.host, concurrency=args.concurrency, requests=args.requests)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import argparse
+import cProfile
+import glob
+import json
+import os
+import pstats
+import re
+import sys
+import time
+
+import numpy as np
+
+from .inference import BrainTumorClassifier
+from .latency import measure_latency
+
+# InceptionV3 names the concatenation that closes each block mixed0 .. mixed10
+MIXED_BLOCK = re.compile(r'^mixed\d+$')
+TRACE_DIR = 'trace'
+
+
+def _scope_matches(scope, name):
+    # Keras re-enters each layer's name scope, so TF uniquifies it: conv2d -> conv2d_1, conv2d_5 -> conv2d_5_1
+    return scope == name or (scope.startswith(name + '_') and scope[len(name) + 1:].isdigit())
+
+
+# 🧱 Every layer in call order with the block it belongs to: stem, mixed0 .. mixed10 for a nested
+# InceptionV3 (a block ends at its mixedN concat), head for the layers of the outer model
+def layer_blocks(model):
+    rows = []
+    for layer in model.layers:
+        if not hasattr(layer, 'layers'):
+            rows.append((layer.name, layer, 'head'))
+            continue
+        sublayers = layer.layers
+        blocked = any(MIXED_BLOCK.match(sub.name) for sub in sublayers)
+        # The stem runs up to the first layer whose output feeds several branches
+        in_stem = blocked
+        pending = []
+        for sub in sublayers:
+            pending.append(sub)
+            if in_stem and len(getattr(sub, '_outbound_nodes', [])) > 1:
+                rows += [(f"{layer.name}/{l.name}", l, 'stem') for l in pending]
+                pending, in_stem = [], False
+            elif MIXED_BLOCK.match(sub.name) or not blocked:
+                rows += [(f"{layer.name}/{l.name}", l, sub.name if blocked else layer.name) for l in pending]
+                pending = []
+        rows += [(f"{layer.name}/{l.name}", l, f"{layer.name} tail") for l in pending]
+    return rows
+
+
+# 🗺️ Graph op name -> qualified layer name, by walking the traced forward graph's name scopes in creation order
+def op_layer_map(model, forward_fn):
+    graph = forward_fn.get_concrete_function().graph
+    children = {None: model.layers}
+    for layer in model.layers:
+        if hasattr(layer, 'layers'):
+            children[layer.name] = layer.layers
+    assigned = set()
+    scopes = {}
+    mapping = {}
+    for op in graph.get_operations():
+        parts = op.name.split('/')
+        # parts[0] is the outer model's own scope, then one part per (nested) layer
+        parent, qualified = None, None
+        for depth in range(1, len(parts) - 1):
+            key = '/'.join(parts[:depth + 1])
+            if key not in scopes:
+                candidates = children.get(parent, [])
+                layer = next((l for l in candidates if id(l) not in assigned and _scope_matches(parts[depth], l.name)), None)
+                if layer is not None:
+                    assigned.add(id(layer))
+                scopes[key] = layer
+            layer = scopes[key]
+            if layer is None:
+                break
+            qualified = f"{parent}/{layer.name}" if parent else layer.name
+            if layer.name not in children:
+                break
+            parent = layer.name
+        if qualified is not None:
+            mapping[op.name] = qualified
+    return mapping
+
+
+def _layer_memory(layer, batch_size):
+    params = sum(int(np.prod(w.shape)) * np.dtype(w.dtype).itemsize for w in layer.weights)
+    try:
+        outputs = layer.output if isinstance(layer.output, (list, tuple)) else [layer.output]
+        activations = sum(batch_size * int(np.prod(o.shape[1:])) * np.dtype(o.dtype).itemsize for o in outputs)
+    except (AttributeError, ValueError, TypeError):
+        activations = 0
+    return params, activations
+
+
+def _read_xspace(log_dir):
+    from tensorflow.tsl.profiler.protobuf import xplane_pb2
+
+    path = sorted(glob.glob(os.path.join(log_dir, 'plugins', 'profile', '*', '*.xplane.pb')))[-1]
+    xspace = xplane_pb2.XSpace()
+    with open(path, 'rb') as f:
+        xspace.ParseFromString(f.read())
+    return xspace, path
+
+
+# 📜 Kernel events of the TF executor threads, as (op name, op type, start_us, duration_us, thread)
+def _kernel_events(xspace):
+    for plane in xspace.planes:
+        if not plane.name.startswith('/host:'):
+            continue
+        for line in plane.lines:
+            if not line.name.startswith('tf_Compute'):
+                continue
+            for event in line.events:
+                name = plane.event_metadata[event.metadata_id].name
+                op_name, _, op_type = name.rpartition(':')
+                if not op_name or '::' in name:
+                    continue
+                yield op_name, op_type, line.timestamp_ns / 1000 + event.offset_ps / 1e6, event.duration_ps / 1e6, line.id
+
+
+def _peak_allocator_bytes(xspace):
+    peak = 0
+    for plane in xspace.planes:
+        stat_names = {k: v.name for k, v in plane.stat_metadata.items()}
+        for line in plane.lines:
+            for event in line.events:
+                for stat in event.stats:
+                    if stat_names.get(stat.metadata_id) == 'peak_bytes_in_use':
+                        peak = max(peak, stat.int64_value or stat.uint64_value)
+    return peak
+
+
+def _summarize(rows, runs, total_us):
+    rows = sorted(rows, key=lambda r: -r['op_us'])
+    for row in rows:
+        row['ms_per_call'] = row.pop('op_us') / runs / 1000
+        row['share'] = row['ms_per_call'] * runs * 1000 / total_us if total_us else 0.0
+    return rows
+
+
+def profile_graph(classifier, runs=20, batch_size=1, output_dir='profile', warmup=3):
+    """Trace ``runs`` forward passes with the TF profiler and attribute kernel time to layers and blocks.
+
+    Writes the raw ``.xplane.pb`` (TensorBoard's Profile tab) under ``output_dir/trace`` and a
+    Chrome/Perfetto ``trace.json`` whose events carry their layer and block. Memory per layer is
+    parameters plus output activations at ``batch_size``; the allocator peak comes from the trace.
+    """
+    import tensorflow as tf
+
+    if getattr(classifier, '_forward_fn', None) is None:
+        raise ValueError("Layer profiling needs the compiled Keras backend")
+    model = classifier.model
+    img_batch = np.random.default_rng(0).random((batch_size, classifier.input_size[1], classifier.input_size[0], 3), dtype=np.float32)
+    for _ in range(warmup):
+        classifier.forward(img_batch)
+    blocks = {name: block for name, _, block in layer_blocks(model)}
+    op_layers = op_layer_map(model, classifier._forward_fn)
+
+    log_dir = os.path.join(output_dir, TRACE_DIR)
+    options = tf.profiler.experimental.ProfilerOptions(host_tracer_level=2, python_tracer_level=0, device_tracer_level=0)
+    wall = []
+    tf.profiler.experimental.start(log_dir, options=options)
+    try:
+        for step in range(runs):
+            with tf.profiler.experimental.Trace('forward', step_num=step, _r=1):
+                start = time.perf_counter()
+                classifier.forward(img_batch)
+                wall.append(time.perf_counter() - start)
+    finally:
+        tf.profiler.experimental.stop()
+    xspace, xplane_path = _read_xspace(log_dir)
+
+    per_layer = {}
+    per_type = {}
+    trace_events = []
+    total_us = 0.0
+    for op_name, op_type, start_us, duration_us, thread in _kernel_events(xspace):
+        layer = op_layers.get(op_name, '(graph)')
+        block = blocks.get(layer, '(graph)')
+        per_layer[layer] = per_layer.get(layer, 0.0) + duration_us
+        per_type[op_type] = per_type.get(op_type, 0.0) + duration_us
+        total_us += duration_us
+        trace_events.append({'name': op_type, 'ph': 'X', 'ts': start_us, 'dur': duration_us, 'pid': 0, 'tid': thread,
+                             'args': {'op': op_name, 'layer': layer, 'block': block}})
+    trace_path = os.path.join(output_dir, 'trace.json')
+    with open(trace_path, 'w') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+    layer_rows, block_rows = [], {}
+    layer_objects = {name: layer for name, layer, _ in layer_blocks(model)}
+    for name, op_us in per_layer.items():
+        params, activations = _layer_memory(layer_objects[name], batch_size) if name in layer_objects else (0, 0)
+        block = blocks.get(name, '(graph)')
+        layer_rows.append({'layer': name, 'block': block, 'op_us': op_us,
+                           'params_mb': params / 2 ** 20, 'activations_mb': activations / 2 ** 20})
+        row = block_rows.setdefault(block, {'block': block, 'op_us': 0.0, 'layers': 0, 'params_mb': 0.0, 'activations_mb': 0.0})
+        row['op_us'] += op_us
+        row['layers'] += 1
+        row['params_mb'] += params / 2 ** 20
+        row['activations_mb'] += activations / 2 ** 20
+    wall_ms = np.array(wall) * 1000
+    return {
+        'runs': runs,
+        'batch_size': batch_size,
+        'forward_ms': {'p50_ms': float(np.percentile(wall_ms, 50)), 'mean_ms': float(wall_ms.mean())},
+        'kernel_ms_per_call': total_us / runs / 1000,
+        'peak_allocator_mb': _peak_allocator_bytes(xspace) / 2 ** 20,
+        'blocks': _summarize(list(block_rows.values()), runs, total_us),
+        'layers': _summarize(layer_rows, runs, total_us),
+        'op_types': _summarize([{'op_type': t, 'op_us': us} for t, us in per_type.items()], runs, total_us),
+        'xplane_path': xplane_path,
+        'trace_path': trace_path,
+    }
+
+
+def profile_python(classifier, image, runs=20, output_dir='profile', top=25):
+    """cProfile the Python-side single-scan path (decode, preprocess, forward) the app's ``predict_image`` runs.
+
+    ``predict.prof`` loads into ``pstats`` or snakeviz. A batch-1 forward pass is
+    timed alongside, so the Python overhead is measured against the same batch size.
+    """
+    classifier.predict(image)
+    latency = measure_latency(lambda: classifier.predict(image), runs=runs, warmup=0)
+    one = np.random.default_rng(0).random((1, classifier.input_size[1], classifier.input_size[0], 3), dtype=np.float32)
+    forward = measure_latency(lambda: classifier.forward(one), runs=runs, warmup=1)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(runs):
+        classifier.predict(image)
+    profiler.disable()
+    prof_path = os.path.join(output_dir, 'predict.prof')
+    profiler.dump_stats(prof_path)
+    stats = pstats.Stats(profiler)
+    functions = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        functions.append({'function': f"{os.path.basename(filename)}:{line}({name})", 'calls': calls,
+                          'tottime_ms_per_call': tottime / runs * 1000, 'cumtime_ms_per_call': cumtime / runs * 1000})
+    functions.sort(key=lambda f: -f['tottime_ms_per_call'])
+    return {'runs': runs, 'predict_ms': latency, 'forward_ms': forward,
+            'overhead_ms': latency['p50_ms'] - forward['p50_ms'], 'functions': functions[:top], 'prof_path': prof_path}
+
+
+def format_report(report, top=15):
+    graph, python = report['graph'], report.get('python')
+    lines = [f"Forward pass (batch {graph['batch_size']}, {graph['runs']} runs): p50 {graph['forward_ms']['p50_ms']:.1f} ms wall, "
+             f"{graph['kernel_ms_per_call']:.1f} ms in TF kernels, allocator peak {graph['peak_allocator_mb']:.0f} MB"]
+    if python:
+        lines.append(f"predict() on one scan: p50 {python['predict_ms']['p50_ms']:.1f} ms = {python['forward_ms']['p50_ms']:.1f} ms "
+                     f"batch-1 forward + {python['overhead_ms']:.1f} ms Python (decode, preprocess, dispatch)")
+    lines.append(f"\n{'block':<20}{'ms/call':>10}{'share':>8}{'layers':>8}{'params MB':>11}{'act. MB':>10}")
+    for row in graph['blocks']:
+        lines.append(f"{row['block']:<20}{row['ms_per_call']:>10.2f}{row['share'] * 100:>7.1f}%{row['layers']:>8}"
+                     f"{row['params_mb']:>11.2f}{row['activations_mb']:>10.2f}")
+    lines.append(f"\n{'layer':<44}{'block':<12}{'ms/call':>10}{'share':>8}{'params MB':>11}{'act. MB':>10}")
+    for row in graph['layers'][:top]:
+        lines.append(f"{row['layer']:<44}{row['block']:<12}{row['ms_per_call']:>10.2f}{row['share'] * 100:>7.1f}%"
+                     f"{row['params_mb']:>11.2f}{row['activations_mb']:>10.2f}")
+    if python:
+        lines.append(f"\n{'function (Python, per predict call)':<60}{'calls':>8}{'own ms':>10}{'cum ms':>10}")
+        for row in python['functions'][:top]:
+            lines.append(f"{row['function'][:59]:<60}{row['calls'] // python['runs']:>8}{row['tottime_ms_per_call']:>10.2f}"
+                         f"{row['cumtime_ms_per_call']:>10.2f}")
+    return "\n".join(lines)
+
+
+def profile_model(classifier, image=None, runs=20, batch_size=1, output_dir='profile'):
+    os.makedirs(output_dir, exist_ok=True)
+    report = {'model_id': classifier.model_id, 'graph': profile_graph(classifier, runs, batch_size, output_dir)}
+    if image is not None:
+        report['python'] = profile_python(classifier, image, runs, output_dir)
+    with open(os.path.join(output_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-layer and per-block CPU profile of the Keras model, plus a cProfile of predict().")
+    parser.add_argument('--model', help="Path to the .keras model (default: models/brain_tumor_inceptionv3.keras)")
+    parser.add_argument('--standin', action='store_true', help="Profile a random-init InceptionV3 stand-in instead (no LFS model needed)")
+    parser.add_argument('--image', help="Scan to run through predict() for the Python profile (default: a synthetic JPEG)")
+    parser.add_argument('--runs', type=int, default=20, help="Profiled inference calls")
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--output-dir', default='profile', help="Where to write report.json, trace.json, predict.prof and the TF trace")
+    parser.add_argument('--top', type=int, default=15, help="Layers and functions shown in the printed report")
+    args = parser.parse_args(argv)
+
+    if args.standin:
+        from .benchmark import build_standin_model
+
+        classifier = BrainTumorClassifier(model=build_standin_model(), class_names=[f"class_{i}" for i in range(4)], warmup=True)
+    else:
+        classifier = BrainTumorClassifier(model_path=args.model, warmup=True)
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image = f.read()
+    else:
+        from .benchmark import synthetic_scan
+
+        image = synthetic_scan(512)
+    report = profile_model(classifier, image, args.runs, args.batch_size, args.output_dir)
+    print(format_report(report, args.top))
+    print(f"Wrote {args.output_dir}/report.json, trace.json (Perfetto / chrome://tracing), predict.prof and "
+          f"{report['graph']['xplane_path']} (TensorBoard)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
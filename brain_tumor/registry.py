@@ -0,0 +1,263 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from .backends import BACKENDS
+from .inference import DEFAULT_CLASS_NAMES_PATH, IMG_SIZE, MODELS_DIR, BrainTumorClassifier, load_class_names
+from .loader import BackgroundLoader
+from .memory import unfreeze_gc
+
+DEFAULT_REGISTRY_DIR = os.path.join(MODELS_DIR, "registry")
+MANIFEST_KEYS = ('name', 'version', 'artifact', 'sha256', 'class_names', 'input_size', 'backend')
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 📜 A manifest describes one model version; its artifact path is relative to the manifest's directory
+def load_manifest(path):
+    with open(path) as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError(f"{path}: manifest is not a JSON object")
+    missing = [key for key in MANIFEST_KEYS if key not in manifest]
+    if missing:
+        raise ValueError(f"{path}: manifest is missing {', '.join(missing)}")
+    if manifest['backend'] not in BACKENDS:
+        raise ValueError(f"{path}: unknown backend {manifest['backend']!r}, expected one of {BACKENDS}")
+    manifest['input_size'] = tuple(manifest['input_size'])
+    manifest['artifact_path'] = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)), manifest['artifact']))
+    manifest['manifest_path'] = path
+    return manifest
+
+
+def write_manifest(registry_dir, artifact, version, backend='keras', class_names=None, input_size=IMG_SIZE,
+                   name=None, notes=None):
+    os.makedirs(registry_dir, exist_ok=True)
+    manifest = {
+        'name': name or os.path.splitext(os.path.basename(artifact))[0],
+        'version': version,
+        'artifact': os.path.relpath(os.path.abspath(artifact), os.path.abspath(registry_dir)),
+        'sha256': file_sha256(artifact),
+        'class_names': list(class_names if class_names is not None else load_class_names()),
+        'input_size': list(input_size),
+        'backend': backend,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'notes': notes,
+    }
+    path = os.path.join(registry_dir, f"{version}.json")
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def verify_artifact(manifest):
+    if not os.path.exists(manifest['artifact_path']):
+        raise FileNotFoundError(f"Model {manifest['version']}: artifact {manifest['artifact_path']} not found")
+    actual = file_sha256(manifest['artifact_path'])
+    if actual != manifest['sha256']:
+        raise ValueError(f"Model {manifest['version']}: checksum mismatch for {manifest['artifact_path']} "
+                         f"(manifest {manifest['sha256'][:12]}..., file {actual[:12]}...)")
+
+
+# 🧬 Verified classifier for a manifest; its model_id is content-addressed, so caches never mix versions
+def load_manifest_classifier(manifest, verify=True, warmup=True, **kwargs):
+    if verify:
+        verify_artifact(manifest)
+    classifier = BrainTumorClassifier(
+        model_path=manifest['artifact_path'], backend=manifest['backend'], class_names=manifest['class_names'],
+        input_size=manifest['input_size'], warmup=warmup, **kwargs
+    )
+    classifier.model_id = f"{manifest['name']}:{manifest['version']}:{manifest['sha256'][:16]}"
+    classifier.version = manifest['version']
+    return classifier
+
+
+class ModelRegistry:
+    """Versioned models described by the manifests in ``registry_dir``, at most ``max_resident`` loaded.
+
+    ``get`` returns a resident model or loads and checksum-verifies it, evicting
+    the least recently used model that is not active. ``activate`` loads a
+    version on a background thread and only switches ``active_version`` (and
+    calls ``on_swap``) once it is ready, so the previous model keeps serving
+    until the new one can take over. Evicted models stay alive for as long as
+    an in-flight request still holds them; ``status`` reports any that are
+    still in memory after that. A manifest that cannot be read is skipped and
+    its error kept in ``invalid``, so one bad file never hides the others.
+    """
+
+    def __init__(self, registry_dir=DEFAULT_REGISTRY_DIR, max_resident=2, factory=load_manifest_classifier):
+        self.registry_dir = registry_dir
+        self.max_resident = max(1, max_resident)
+        self.factory = factory
+        self.active_version = None
+        self.activation = None
+        self.load_seconds = {}
+        self.invalid = {}
+        self._resident = OrderedDict()
+        self._evicted = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def manifests(self, backend=None):
+        try:
+            names = sorted(name for name in os.listdir(self.registry_dir) if name.endswith('.json'))
+        except FileNotFoundError:
+            return {}
+        manifests, invalid = [], {}
+        for name in names:
+            try:
+                manifests.append(load_manifest(os.path.join(self.registry_dir, name)))
+            except (OSError, ValueError, TypeError) as e:
+                invalid[name] = str(e)
+        self.invalid = invalid
+        manifests.sort(key=lambda m: (m.get('created_at') or '', m['version']))
+        return {m['version']: m for m in manifests if backend is None or m['backend'] == backend}
+
+    def latest_version(self, backend=None):
+        versions = list(self.manifests(backend))
+        return versions[-1] if versions else None
+
+    def load(self, version):
+        """Start loading ``version`` in the background (unless it already is); returns its loader."""
+        with self._lock:
+            loader = self._loading.get(version)
+            if loader is None or loader.status == 'error':
+                manifest = self.manifests().get(version)
+                if manifest is None:
+                    raise KeyError(f"No manifest for model version {version!r} in {self.registry_dir}")
+                loader = self._loading[version] = BackgroundLoader(lambda: self._load(manifest), name=f"model-loader-{version}").start()
+            return loader
+
+    def _load(self, manifest):
+        start = time.perf_counter()
+        classifier = self.factory(manifest)
+        with self._lock:
+            self.load_seconds[manifest['version']] = time.perf_counter() - start
+            self._resident[manifest['version']] = classifier
+            self._evicted.pop(manifest['version'], None)
+            self._loading.pop(manifest['version'], None)
+            self._evict(keep=manifest['version'])
+        return classifier
+
+    def _evict(self, keep=None):
+        # The active model and the one just loaded stay resident even if that briefly exceeds max_resident
+        for version in list(self._resident):
+            if len(self._resident) <= self.max_resident:
+                break
+            if version not in (self.active_version, keep):
+                # Tracks the model itself: the classifier is freed by refcount, the model's reference cycles need the GC.
+                # A model frozen out of the GC (memory.freeze_gc) would never be collected once dropped
+                classifier = self._resident.pop(version)
+                self._evicted[version] = weakref.ref(getattr(classifier, 'model', classifier))
+                unfreeze_gc()
+
+    def get(self, version):
+        with self._lock:
+            if version in self._resident:
+                self._resident.move_to_end(version)
+                return self._resident[version]
+        return self.load(version).get()
+
+    def activate(self, version, on_swap=None):
+        def swap():
+            classifier = self.get(version)
+            with self._lock:
+                self.active_version = version
+                self._evict()
+            if on_swap is not None:
+                on_swap(classifier)
+            return classifier
+
+        self.activation = BackgroundLoader(swap, name=f"model-activate-{version}").start()
+        return self.activation
+
+    @property
+    def active(self):
+        with self._lock:
+            return self._resident.get(self.active_version)
+
+    def released(self, version):
+        """False while an evicted version's model is still alive (call ``gc.collect()`` first to rule out cycles)."""
+        ref = self._evicted.get(version)
+        return ref is None or ref() is None
+
+    def status(self, backend=None):
+        with self._lock:
+            resident = list(self._resident)
+            loading = {version: loader.status for version, loader in self._loading.items()}
+            evicted_alive = [version for version in self._evicted if not self.released(version)]
+        return [{
+            'version': version,
+            'name': m['name'],
+            'backend': m['backend'],
+            'created_at': m.get('created_at'),
+            'sha256': m['sha256'][:12],
+            'active': version == self.active_version,
+            'resident': version in resident,
+            'evicted_alive': version in evicted_alive,
+            'loading': loading.get(version) == 'loading',
+            'load_seconds': self.load_seconds.get(version),
+            'artifact': m['artifact_path'],
+        } for version, m in self.manifests(backend).items()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Register, list and verify versioned model manifests.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    register = subparsers.add_parser('register', help="Write a manifest (with the artifact's sha256) for a model file")
+    register.add_argument('artifact')
+    register.add_argument('--version', required=True)
+    register.add_argument('--backend', choices=BACKENDS, default='keras')
+    register.add_argument('--name', help="Model name (default: the artifact's file name)")
+    register.add_argument('--class-names', default=DEFAULT_CLASS_NAMES_PATH, help="JSON list with the model's class order")
+    register.add_argument('--input-size', type=int, nargs=2, default=list(IMG_SIZE), metavar=('WIDTH', 'HEIGHT'))
+    register.add_argument('--notes')
+    subparsers.add_parser('list', help="List registered versions")
+    verify = subparsers.add_parser('verify', help="Check artifact checksums against their manifests")
+    verify.add_argument('versions', nargs='*', help="Versions to check (default: all)")
+    for sub in subparsers.choices.values():
+        sub.add_argument('--registry', default=DEFAULT_REGISTRY_DIR, help="Manifest directory")
+    args = parser.parse_args(argv)
+
+    if args.command == 'register':
+        path = write_manifest(args.registry, args.artifact, args.version, args.backend, load_class_names(args.class_names),
+                              args.input_size, args.name, args.notes)
+        print(f"Wrote {path}", file=sys.stderr)
+        return
+
+    registry = ModelRegistry(args.registry)
+    manifests = registry.manifests()
+    for name, error in registry.invalid.items():
+        print(f"Skipping invalid manifest {name}: {error}", file=sys.stderr)
+    if args.command == 'list':
+        for version, m in manifests.items():
+            print(f"{version:<16}{m['backend']:<13}{m['sha256'][:12]}  {m.get('created_at') or '-':<26}{m['artifact_path']}")
+        return
+
+    failed = 0
+    for version in args.versions or list(manifests):
+        try:
+            verify_artifact(manifests[version])
+            print(f"{version}: ok")
+        except (KeyError, OSError, ValueError) as e:
+            failed += 1
+            print(f"{version}: {e}")
+    sys.exit(1 if failed or registry.invalid else 0)
+
+
+if __name__ == "__main__":
+    main()
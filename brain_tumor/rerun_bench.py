@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+NAVIGATION = "📋 Navigation Menu"
+UPLOADER = "Choose MRI images"
+TTA_TOGGLE = "🎲 Test-time augmentation"
+TTA_SLIDER = "Augmented views per scan"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# 🚀 The app under a real Streamlit server, so reruns go through the same websocket and message cache as a browser's
+# Started from the app's directory so its .streamlit/config.toml applies; XSRF is off only so uploads need no cookie
+def start_app(app_path=APP_PATH, port=None, timeout=120, options=()):
+    port = port or _free_port()
+    proc = subprocess.Popen([
+        sys.executable, "-m", "streamlit", "run", os.path.abspath(app_path), "--server.headless", "true",
+        "--server.port", str(port), "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none", *options,
+    ], cwd=os.path.dirname(os.path.abspath(app_path)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2):
+                return proc, port
+        except OSError:
+            time.sleep(0.5)
+    proc.kill()
+    raise TimeoutError(f"Streamlit did not come up on port {port} within {timeout}s")
+
+
+class AppSession:
+    """One browser tab: sends reruns the way the frontend does and measures what comes back.
+
+    Widgets are found by label in the deltas the server sends. A widget that
+    was rendered inside a fragment reruns only that fragment, as in the
+    browser, and the hashes of cacheable messages are reported back so large
+    elements that were already received arrive as references.
+    """
+
+    def __init__(self, conn, base_url):
+        self.conn = conn
+        self.base_url = base_url
+        self.widgets = {}
+        self.cached_hashes = set()
+        self.session_id = None
+        self.page_script_hash = ''
+
+    @classmethod
+    async def connect(cls, port):
+        from tornado.websocket import websocket_connect
+
+        conn = await websocket_connect(f"ws://127.0.0.1:{port}/_stcore/stream", max_message_size=1 << 30)
+        return cls(conn, f"http://127.0.0.1:{port}")
+
+    async def _send(self, **fields):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        await self.conn.write_message(BackMsg(**fields).SerializeToString(), binary=True)
+
+    async def _receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        data = await self.conn.read_message()
+        if data is None:
+            raise ConnectionError("The app closed the websocket")
+        msg = ForwardMsg()
+        msg.ParseFromString(data)
+        if msg.WhichOneof('type') == 'new_session':
+            self.session_id = msg.new_session.initialize.session_id or self.session_id
+            self.page_script_hash = msg.new_session.page_script_hash
+        if msg.metadata.cacheable:
+            self.cached_hashes.add(msg.hash)
+        if msg.WhichOneof('type') == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            element = getattr(msg.delta.new_element, msg.delta.new_element.WhichOneof('type'))
+            if getattr(element, 'id', '') and getattr(element, 'label', ''):
+                self.widgets[element.label] = (element.id, msg.delta.fragment_id)
+        return msg, len(data)
+
+    async def rerun(self, state=None):
+        from streamlit.proto.ClientState_pb2 import ClientState
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        fragment_id = next((f for wid, f in self.widgets.values() if state is not None and wid == state.id), '')
+        client_state = ClientState(page_script_hash=self.page_script_hash, fragment_id=fragment_id,
+                                   cached_message_hashes=sorted(self.cached_hashes))
+        if state is not None:
+            client_state.widget_states.widgets.append(state)
+        start = time.perf_counter()
+        await self._send(rerun_script=client_state)
+        total_bytes = messages = 0
+        while True:
+            msg, size = await self._receive()
+            total_bytes += size
+            messages += 1
+            # A script that calls st.rerun() finishes early and immediately starts over
+            if msg.WhichOneof('type') == 'script_finished' and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        return {'ms': (time.perf_counter() - start) * 1000, 'bytes': total_bytes, 'messages': messages,
+                'fragment': bool(fragment_id)}
+
+    def widget(self, label, **value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        return WidgetState(id=self.widgets[label][0], **value)
+
+    async def upload(self, label, path):
+        from streamlit.proto.Common_pb2 import FileURLsRequest, FileUploaderState, UploadedFileInfo
+
+        name = os.path.basename(path)
+        await self._send(file_urls_request=FileURLsRequest(request_id=name, file_names=[name], session_id=self.session_id))
+        while True:
+            msg, _ = await self._receive()
+            if msg.WhichOneof('type') == 'file_urls_response':
+                urls = msg.file_urls_response.file_urls[0]
+                break
+        with open(path, 'rb') as f:
+            data = f.read()
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        request = urllib.request.Request(self.base_url + urls.upload_url, data=body, method='PUT',
+                                         headers={'Content-Type': f"multipart/form-data; boundary={boundary}"})
+        urllib.request.urlopen(request).close()
+        return self.widget(label, file_uploader_state_value=FileUploaderState(uploaded_file_info=[
+            UploadedFileInfo(id=1, name=name, size=len(data), file_id=urls.file_id, file_urls=urls)]))
+
+
+# 🔍 Open Analyze, upload a scan, then change the options around its result
+async def run_scenario(port, image_path):
+    session = await AppSession.connect(port)
+    steps = [("first load (Home)", await session.rerun()), ("rerun (Home)", await session.rerun())]
+    steps.append(("open Analyze", await session.rerun(session.widget(NAVIGATION, string_value="🔍 Analyze - MRI Analysis"))))
+    steps.append(("upload scan", await session.rerun(await session.upload(UPLOADER, image_path))))
+    steps.append(("rerun (result shown)", await session.rerun()))
+    steps.append(("TTA on", await session.rerun(session.widget(TTA_TOGGLE, bool_value=True))))
+    steps.append(("TTA 4 views", await session.rerun(session.widget(TTA_SLIDER, double_array_value={'data': [4]}))))
+    steps.append(("TTA off", await session.rerun(session.widget(TTA_TOGGLE, bool_value=False))))
+    session.conn.close()
+    return steps
+
+
+def measure(image_path, app_path=APP_PATH, sessions=3, port=None, options=()):
+    """Median time and bytes per step over ``sessions`` fresh tabs, after one warm-up tab loads the model and caches."""
+    proc, port = start_app(app_path, port, options=options)
+    try:
+        asyncio.run(run_scenario(port, image_path))
+        runs = [asyncio.run(run_scenario(port, image_path)) for _ in range(sessions)]
+    finally:
+        proc.terminate()
+        proc.wait()
+    return [{
+        'step': name,
+        'ms': statistics.median(run[i][1]['ms'] for run in runs),
+        'bytes': int(statistics.median(run[i][1]['bytes'] for run in runs)),
+        'messages': int(statistics.median(run[i][1]['messages'] for run in runs)),
+        'fragment': runs[0][i][1]['fragment'],
+    } for i, (name, _) in enumerate(runs[0])]
+
+
+def format_steps(steps):
+    lines = [f"{'step':<24}{'run':>10}{'payload':>12}{'msgs':>7}  scope"]
+    for step in steps:
+        lines.append(f"{step['step']:<24}{step['ms']:>8.0f}ms{step['bytes'] / 1024:>10.1f}KB{step['messages']:>7}  "
+                     f"{'fragment' if step['fragment'] else 'full app'}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure script run time and websocket payload per rerun of the Streamlit app.")
+    parser.add_argument('image', help="Scan to upload on the Analyze page")
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--sessions', type=int, default=3, help="Measured browser sessions (medians are reported)")
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--output', help="Also write the steps as JSON")
+    parser.add_argument('--option', action='append', default=[], metavar='NAME=VALUE',
+                        help="Extra Streamlit config option, e.g. browser.gatherUsageStats=true (repeatable)")
+    args = parser.parse_args(argv)
+
+    options = [f"--{option}" for option in args.option]
+    steps = measure(args.image, args.app, args.sessions, args.port, options)
+    print(format_steps(steps))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(steps, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
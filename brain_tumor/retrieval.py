@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from .inference import IMG_SIZE, MODELS_DIR, BrainTumorClassifier, load_image_uint8, normalize_batch
+from .registry import DEFAULT_REGISTRY_DIR, ModelRegistry, load_manifest_classifier
+from .score_dir import iter_decoded_batches, iter_image_paths
+
+DEFAULT_INDEX_DIR = os.path.join(MODELS_DIR, "reference_index")
+# Below this many references a flat scan is fast enough and exact
+IVF_MIN_REFERENCES = 10000
+DEFAULT_NPROBE = 16
+
+
+def l2_normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-12)
+
+
+class Embedder:
+    """Penultimate ``GlobalAveragePooling2D`` embeddings and the softmax from one forward pass.
+
+    ``embed`` takes a preprocessed NHWC batch and returns ``(probs, embeddings)``,
+    so a scan's prediction comes for free when its embedding is computed.
+    """
+
+    def __init__(self, model, input_size=IMG_SIZE):
+        import tensorflow as tf
+
+        pooling = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)]
+        if not pooling:
+            raise ValueError("Model has no GlobalAveragePooling2D layer to take embeddings from")
+        combined = tf.keras.Model(model.inputs, [pooling[-1].output, model.outputs[0]])
+        self.dim = pooling[-1].output.shape[-1]
+
+        @tf.function(input_signature=[tf.TensorSpec((None, input_size[1], input_size[0], 3), tf.float32)])
+        def embed(img_batch):
+            embeddings, probs = combined(img_batch, training=False)
+            return probs, embeddings
+
+        self._embed = embed
+
+    def embed(self, img_batch, batch_size=32):
+        probs, embeddings = [], []
+        for start in range(0, len(img_batch), batch_size):
+            p, e = self._embed(np.asarray(img_batch[start:start + batch_size], dtype=np.float32))
+            probs.append(np.asarray(p))
+            embeddings.append(np.asarray(e))
+        return np.concatenate(probs), np.concatenate(embeddings)
+
+
+# 🎯 Spherical k-means (cosine) on a sample of unit vectors
+def spherical_kmeans(vectors, num_lists, iterations=10, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = ~sums.any(axis=1)
+        # Reseed empty lists with random members so every list stays in use
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+def _merge_topk(best_scores, best_ids, scores, ids, k):
+    scores = np.concatenate([best_scores, scores], axis=-1)
+    ids = np.concatenate([best_ids, ids], axis=-1)
+    if scores.shape[-1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        scores = np.take_along_axis(scores, keep, axis=-1)
+        ids = np.take_along_axis(ids, keep, axis=-1)
+    return scores, ids
+
+
+class EmbeddingIndex:
+    """Memory-mapped float16 matrix of unit-norm reference embeddings with labels and paths.
+
+    Without ``centroids.npy`` every query is an exact blocked scan. With it
+    (IVF mode) rows are stored grouped by their nearest centroid, and a query
+    only scans the ``nprobe`` closest lists, each a contiguous slice.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, 'paths.json')) as f:
+            self.paths = json.load(f)
+        self.class_names = self.meta['class_names']
+        self.embeddings = np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r')
+        self.labels = np.load(os.path.join(index_dir, 'labels.npy'))
+        centroids_path = os.path.join(index_dir, 'centroids.npy')
+        if os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+            self.offsets = np.load(os.path.join(index_dir, 'offsets.npy'))
+        else:
+            self.centroids = self.offsets = None
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def _scan_flat(self, queries, k, block_rows):
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        buffer = np.empty((min(block_rows, len(self)), self.embeddings.shape[1]), dtype=np.float32)
+        for start in range(0, len(self), block_rows):
+            block = buffer[:min(block_rows, len(self) - start)]
+            np.copyto(block, self.embeddings[start:start + len(block)])
+            scores = queries @ block.T
+            ids = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            best_scores, best_ids = _merge_topk(best_scores, best_ids, scores, ids, k)
+        return best_scores, best_ids
+
+    def _scan_ivf(self, query, k, nprobe):
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        ranges = [(self.offsets[l], self.offsets[l + 1]) for l in probe if self.offsets[l + 1] > self.offsets[l]]
+        rows = np.concatenate([self.embeddings[a:b] for a, b in ranges]).astype(np.float32)
+        ids = np.concatenate([np.arange(a, b) for a, b in ranges])
+        return _merge_topk(np.empty(0, np.float32), np.empty(0, np.int64), rows @ query, ids, min(k, len(ids)))
+
+    def search(self, queries, k=5, nprobe=DEFAULT_NPROBE, block_rows=8192):
+        """Top-``k`` cosine neighbours of each query embedding: ``(scores, ids)``, best first.
+
+        ``nprobe=None`` (or an index built without lists) scans every reference.
+        """
+        queries = l2_normalize(np.atleast_2d(queries))
+        k = min(k, len(self))
+        if self.centroids is None or not nprobe:
+            scores, ids = self._scan_flat(queries, k, block_rows)
+        else:
+            results = [self._scan_ivf(q, k, nprobe) for q in queries]
+            width = min(len(s) for s, _ in results)
+            scores = np.stack([s[:width] for s, _ in results]) if width else np.empty((len(queries), 0), np.float32)
+            ids = np.stack([i[:width] for _, i in results]) if width else np.empty((len(queries), 0), np.int64)
+        order = np.argsort(-scores, axis=-1)
+        return np.take_along_axis(scores, order, axis=-1), np.take_along_axis(ids, order, axis=-1)
+
+    def lookup(self, ids, scores=None):
+        root = self.meta.get('root') or ''
+        return [{
+            'path': os.path.join(root, self.paths[i]),
+            'class': self.class_names[self.labels[i]] if self.labels[i] >= 0 else None,
+            'similarity': float(scores[j]) if scores is not None else None,
+        } for j, i in enumerate(ids)]
+
+
+# 💾 Finalize embeddings (already unit-norm, in input order) into an index, grouping rows by list in IVF mode
+def write_index(index_dir, embeddings, labels, paths, class_names, num_lists=0, root=None, model_id=None,
+                sample_size=32768, block_rows=8192, seed=0):
+    os.makedirs(index_dir, exist_ok=True)
+    for name in ('centroids.npy', 'offsets.npy'):
+        if os.path.exists(os.path.join(index_dir, name)):
+            os.remove(os.path.join(index_dir, name))
+    labels = np.asarray(labels, dtype=np.int16)
+    num_rows, dim = embeddings.shape
+    order = None
+    if num_lists:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(num_rows, min(num_rows, max(sample_size, num_lists)), replace=False))
+        centroids = spherical_kmeans(np.asarray(embeddings[sample], dtype=np.float32), num_lists, seed=seed)
+        assign = np.empty(num_rows, dtype=np.int32)
+        for start in range(0, num_rows, block_rows):
+            block = np.asarray(embeddings[start:start + block_rows], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable')
+        np.save(os.path.join(index_dir, 'centroids.npy'), centroids)
+        np.save(os.path.join(index_dir, 'offsets.npy'), np.searchsorted(assign[order], np.arange(num_lists + 1)))
+
+    tmp_path = os.path.join(index_dir, '.embeddings.tmp.npy')
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16, shape=(num_rows, dim))
+    for start in range(0, num_rows, block_rows):
+        rows = order[start:start + block_rows] if order is not None else slice(start, start + block_rows)
+        out[start:start + block_rows] = embeddings[rows]
+    out.flush()
+    del out
+    os.replace(tmp_path, os.path.join(index_dir, 'embeddings.npy'))
+    np.save(os.path.join(index_dir, 'labels.npy'), labels[order] if order is not None else labels)
+    with open(os.path.join(index_dir, 'paths.json'), 'w') as f:
+        json.dump([paths[i] for i in order] if order is not None else list(paths), f)
+    with open(os.path.join(index_dir, 'meta.json'), 'w') as f:
+        json.dump({'class_names': list(class_names), 'count': num_rows, 'dim': dim, 'num_lists': num_lists,
+                   'root': root, 'model_id': model_id}, f, indent=2)
+
+
+def default_num_lists(num_rows):
+    return int(4 * np.sqrt(num_rows)) if num_rows >= IVF_MIN_REFERENCES else 0
+
+
+def build_index(classifier, root, index_dir=DEFAULT_INDEX_DIR, batch_size=32, workers=None, prefetch=2,
+                num_lists=None, progress_callback=None):
+    """Embed every image under ``root`` (``root/<class>/<file>``) into an index.
+
+    Embeddings are streamed into a float16 memmap, so the reference set never
+    has to fit in memory. ``num_lists=None`` enables IVF lists for large sets.
+    """
+    rel_paths = list(iter_image_paths(root))
+    class_names = list(classifier.class_names)
+    embedder = Embedder(classifier.model, classifier.input_size)
+    os.makedirs(index_dir, exist_ok=True)
+    raw_path = os.path.join(index_dir, '.raw.npy')
+    raw = np.lib.format.open_memmap(raw_path, mode='w+', dtype=np.float16, shape=(len(rel_paths), embedder.dim))
+    kept_paths, labels = [], []
+    for chunk, decoded in iter_decoded_batches(root, rel_paths, batch_size, workers, prefetch):
+        ok = [(p, img) for p, (img, error) in zip(chunk, decoded) if error is None]
+        if not ok:
+            continue
+        _, embeddings = embedder.embed(normalize_batch(np.stack([img for _, img in ok])), batch_size)
+        raw[len(kept_paths):len(kept_paths) + len(ok)] = l2_normalize(embeddings)
+        for path, _ in ok:
+            cls = path.split(os.sep)[0]
+            kept_paths.append(path)
+            labels.append(class_names.index(cls) if cls in class_names else -1)
+        if progress_callback:
+            progress_callback(len(kept_paths), len(rel_paths))
+    num_lists = default_num_lists(len(kept_paths)) if num_lists is None else num_lists
+    write_index(index_dir, raw[:len(kept_paths)], labels, kept_paths, class_names, num_lists,
+                root=os.path.abspath(root), model_id=classifier.model_id)
+    del raw
+    os.remove(raw_path)
+    return EmbeddingIndex(index_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the similar-case index of reference scans.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Embed a reference set (root/<class>/<file>) into an index")
+    build.add_argument('root')
+    build.add_argument('--lists', type=int, help="IVF lists (0 = exact flat scan; default 4*sqrt(N) from 10k references)")
+    build.add_argument('--batch-size', type=int, default=32)
+    build.add_argument('--workers', type=int, help="Decode threads (default: Python's ThreadPoolExecutor default)")
+    query = subparsers.add_parser('query', help="Print the nearest reference scans for images")
+    query.add_argument('images', nargs='+')
+    query.add_argument('-k', type=int, default=5)
+    query.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE, help="IVF lists scanned per query (0 = exact)")
+    for sub in (build, query):
+        sub.add_argument('--index', default=DEFAULT_INDEX_DIR, help="Index directory")
+        sub.add_argument('--model', help="Path to the Keras model (default: models/brain_tumor_inceptionv3.keras)")
+        sub.add_argument('--version', help="Registered model version instead of --model (the app's BRAIN_TUMOR_MODEL_VERSION)")
+        sub.add_argument('--registry', default=DEFAULT_REGISTRY_DIR, help="Manifest directory for --version")
+    args = parser.parse_args(argv)
+
+    # The index records the model's id; the app only searches an index built by the model it serves
+    if args.version:
+        classifier = load_manifest_classifier(ModelRegistry(args.registry).manifests()[args.version])
+    else:
+        classifier = BrainTumorClassifier(model_path=args.model)
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = build_index(classifier, args.root, args.index, args.batch_size, args.workers, num_lists=args.lists,
+                            progress_callback=lambda done, total: print(f"\r{done}/{total}", end='', file=sys.stderr))
+        print(f"\nIndexed {len(index)} scans ({index.meta['num_lists']} lists) in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        return
+
+    index = EmbeddingIndex(args.index)
+    if index.meta.get('model_id') not in (None, classifier.model_id):
+        print(f"Warning: the index was built with {index.meta['model_id']}, not {classifier.model_id}", file=sys.stderr)
+    embedder = Embedder(classifier.model, classifier.input_size)
+    batch = normalize_batch(np.stack([load_image_uint8(path, classifier.input_size) for path in args.images]))
+    _, embeddings = embedder.embed(batch)
+    start = time.perf_counter()
+    scores, ids = index.search(embeddings, args.k, args.nprobe)
+    elapsed = (time.perf_counter() - start) * 1000
+    for path, row_scores, row_ids in zip(args.images, scores, ids):
+        print(path)
+        for match in index.lookup(row_ids, row_scores):
+            print(f"  {match['similarity']:.3f}  {match['class'] or '-':<12} {match['path']}")
+    print(f"Searched {len(index)} references in {elapsed:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class InferenceScheduler:
+    """Single-threaded model executor shared by every caller in the process.
+
+    Callers from any thread ``submit`` preprocessed NHWC arrays and get a
+    ``Future``; one scheduler thread coalesces whatever is queued (up to
+    ``max_batch_size`` rows, waiting at most ``max_wait_ms`` for more) into a
+    single forward pass, so concurrent sessions never contend for TF's thread
+    pools and batch together instead.
+
+    Each request is bound to the classifier that was current when it was
+    submitted, so ``swap`` takes effect for new requests only and queued ones
+    still finish on the model they were submitted to.
+    """
+
+    def __init__(self, classifier, max_batch_size=32, max_wait_ms=2.0):
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.swaps = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, img_batch, classifier=None):
+        future = Future()
+        self._queue.put((np.asarray(img_batch, dtype=np.float32), future, classifier if classifier is not None else self.classifier))
+        return future
+
+    def predict(self, img_batch, timeout=None, classifier=None):
+        return self.submit(img_batch, classifier).result(timeout)
+
+    # 🔁 Serve new requests with another model (a single reference assignment, so it is atomic)
+    def swap(self, classifier):
+        previous, self.classifier = self.classifier, classifier
+        self.swaps += 1
+        return previous
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            rows = len(items[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch_size:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+                rows += len(item[0])
+            self._run_batch(items)
+
+    def _run_batch(self, items):
+        items = [item for item in items if item[1].set_running_or_notify_cancel()]
+        # Requests straddling a swap are split into one forward pass per model
+        groups = {}
+        for item in items:
+            groups.setdefault(id(item[2]), []).append(item)
+        for group in groups.values():
+            self._run_group(group[0][2], group)
+
+    def _run_group(self, classifier, items):
+        start = time.perf_counter()
+        try:
+            batch = items[0][0] if len(items) == 1 else np.concatenate([arr for arr, _, _ in items])
+            preds = classifier.predict_array(batch, batch_size=self.max_batch_size)
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+        self.busy_seconds += time.perf_counter() - start
+        self.batches += 1
+        self.requests += len(items)
+        self.rows += len(batch)
+
+        offset = 0
+        for arr, future, _ in items:
+            future.set_result(preds[offset:offset + len(arr)])
+            offset += len(arr)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'rows': self.rows,
+            'queue_depth': self._queue.qsize(),
+            'mean_requests_per_batch': self.requests / self.batches if self.batches else 0.0,
+            'mean_rows_per_batch': self.rows / self.batches if self.batches else 0.0,
+            'busy_seconds': self.busy_seconds,
+            'swaps': self.swaps,
+        }
@@ -0,0 +1,165 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from .backends import BACKENDS, DEFAULT_BACKEND
+from .inference import IMG_SIZE, BrainTumorClassifier, load_image_uint8, normalize_batch
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# 📂 Walk a Kaggle-style tree (root/<class>/<file>) in a stable order
+def iter_image_paths(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(dirpath, filename), root)
+
+
+# 🧵 Decode in a thread pool (PIL releases the GIL) with a bounded number of batches in flight
+def iter_decoded_batches(root, rel_paths, batch_size, workers, prefetch, target_size=IMG_SIZE):
+    def decode(rel_path):
+        try:
+            return load_image_uint8(os.path.join(root, rel_path), target_size), None
+        except Exception as e:
+            return None, str(e)
+
+    rel_paths = iter(rel_paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def submit_next():
+            chunk = list(islice(rel_paths, batch_size))
+            if chunk:
+                pending.append((chunk, [pool.submit(decode, p) for p in chunk]))
+
+        for _ in range(prefetch):
+            submit_next()
+        while pending:
+            chunk, futures = pending.popleft()
+            submit_next()
+            yield chunk, [f.result() for f in futures]
+
+
+# ♻️ Collect already-scored paths and drop a truncated trailing record from an interrupted run
+def load_completed(output_path, fmt):
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)
+    lines = data[:end].decode('utf-8').splitlines()
+    rows = [json.loads(line) for line in lines if line.strip()] if fmt == 'jsonl' else csv.DictReader(lines)
+    # Rows that failed to decode are not done, so a resumed run tries those files again
+    return {row['path'] for row in rows if not row.get('error')}
+
+
+class PredictionWriter:
+    """Appends one record per scan to a CSV or JSONL file, flushing every batch."""
+
+    def __init__(self, output_path, fmt, class_names):
+        self.fmt = fmt
+        self.fields = ['path', 'label', 'prediction', 'confidence'] + [f'prob_{c}' for c in class_names] + ['error']
+        write_header = fmt == 'csv' and (not os.path.exists(output_path) or os.path.getsize(output_path) == 0)
+        self.file = open(output_path, 'a', newline='')
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fields)
+            if write_header:
+                self.writer.writeheader()
+
+    def write(self, record):
+        if self.fmt == 'jsonl':
+            self.file.write(json.dumps(record) + '\n')
+        else:
+            self.writer.writerow(record)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def score_directory(classifier, root, output_path, fmt='csv', batch_size=32, workers=None,
+                    prefetch=2, resume=True, log_every=10):
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+    completed = load_completed(output_path, fmt)
+    rel_paths = (p for p in iter_image_paths(root) if p not in completed)
+    class_names = classifier.class_names
+    writer = PredictionWriter(output_path, fmt, class_names)
+
+    scored = 0
+    start_time = time.perf_counter()
+    try:
+        batches = iter_decoded_batches(root, rel_paths, batch_size, workers or os.cpu_count(), prefetch)
+        for batch_idx, (chunk, decoded) in enumerate(batches):
+            ok = [i for i, (arr, _) in enumerate(decoded) if arr is not None]
+            preds = None
+            if ok:
+                preds = classifier.predict_array(normalize_batch(np.stack([decoded[i][0] for i in ok])), batch_size)
+            pred_rows = dict(zip(ok, preds if preds is not None else []))
+
+            for i, rel_path in enumerate(chunk):
+                parent = os.path.basename(os.path.dirname(rel_path))
+                record = {'path': rel_path, 'label': parent if parent in class_names else ''}
+                if i in pred_rows:
+                    p = pred_rows[i]
+                    top_idx = int(np.argmax(p))
+                    record.update({'prediction': class_names[top_idx], 'confidence': round(float(p[top_idx]), 6)})
+                    record.update({f'prob_{c}': round(float(p[j]), 6) for j, c in enumerate(class_names)})
+                    record['error'] = ''
+                else:
+                    record['error'] = decoded[i][1]
+                writer.write(record)
+            writer.flush()
+
+            scored += len(chunk)
+            if log_every and (batch_idx + 1) % log_every == 0:
+                elapsed = time.perf_counter() - start_time
+                print(f"Scored {scored} images ({scored / elapsed:.1f} images/s)", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    return scored, len(completed), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a directory tree of MRI images and stream predictions to CSV or JSONL.")
+    parser.add_argument('root', help="Directory to score, e.g. brain_tumor_dataset/Testing")
+    parser.add_argument('-o', '--output', required=True, help="Output file (.csv or .jsonl)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="Output format (default: from the output extension)")
+    parser.add_argument('--model', help="Path to the model artifact (default: the backend's file under models/)")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--xla', action='store_true', help="JIT-compile the Keras forward pass with XLA")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Decode threads")
+    parser.add_argument('--prefetch', type=int, default=2, help="Batches decoded ahead of the model")
+    parser.add_argument('--overwrite', action='store_true', help="Start over instead of resuming from an existing output file")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('jsonl' if args.output.endswith('.jsonl') else 'csv')
+    classifier = BrainTumorClassifier(model_path=args.model, batch_size=args.batch_size, backend=args.backend,
+                                      jit_compile=args.xla)
+    scored, skipped, elapsed = score_directory(
+        classifier, args.root, args.output, fmt=fmt, batch_size=args.batch_size,
+        workers=args.workers, prefetch=args.prefetch, resume=not args.overwrite
+    )
+    rate = scored / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {scored} images in {elapsed:.1f}s ({rate:.1f} images/s), skipped {skipped} already scored", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from .backends import BACKENDS, DEFAULT_BACKEND
+from .inference import BrainTumorClassifier, configure_tf_threads, load_class_names, load_image_uint8, normalize_batch
+from .telemetry import PROMETHEUS_CONTENT_TYPE, Telemetry
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Content Too Large',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+DEFAULT_MAX_BODY_MB = 32
+
+
+# 🏭 Model worker process: loads its own classifier, then scores the uint8 batches sent over its pipe.
+# A pipe per worker (rather than shared queues) means a worker that is killed holds no lock the others need
+def worker_main(conn, model_path, backend, threads):
+    try:
+        if backend == 'keras' and threads:
+            configure_tf_threads(intra_op=threads, inter_op=1)
+        classifier = BrainTumorClassifier(model_path=model_path, backend=backend, warmup=True)
+    except Exception as e:
+        conn.send(('error', None, f"{type(e).__name__}: {e}"))
+        return
+    conn.send(('ready', os.getpid(), classifier.model_id))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            # The server closed the pipe or died without stopping us
+            break
+        if task is None:
+            break
+        batch_id, batch = task
+        try:
+            preds = classifier.predict_array(normalize_batch(batch), batch_size=len(batch))
+            conn.send(('done', batch_id, preds))
+        except Exception as e:
+            conn.send(('failed', batch_id, f"{type(e).__name__}: {e}"))
+
+
+class NoWorkersError(RuntimeError):
+    pass
+
+
+class Worker:
+    def __init__(self, worker_id, process, conn):
+        self.id = worker_id
+        self.process = process
+        self.conn = conn
+        self.ready = False
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batches and fans them out to model worker processes.
+
+    A batch closes when it reaches ``max_batch_size`` or ``max_wait_ms`` after its
+    first request. At most one batch per worker is in flight, so requests that
+    arrive while every worker is busy accumulate into the next, larger batch.
+    A worker that dies fails the batch it was scoring (never leaving its
+    requests waiting) and is replaced by a fresh process. If replacements die
+    before loading the model and no worker is left, every pending request
+    fails with ``NoWorkersError`` and new ones are refused immediately.
+    """
+
+    def __init__(self, workers=1, max_batch_size=32, max_wait_ms=5.0, max_queue=1024,
+                 model_path=None, backend=DEFAULT_BACKEND, threads_per_worker=None, worker_target=worker_main):
+        self.num_workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.model_path = model_path
+        self.backend = backend
+        self.threads_per_worker = threads_per_worker
+        self.worker_target = worker_target
+        self.out_of_workers = False
+        self.batches = 0
+        self.batched_requests = 0
+        self.worker_restarts = 0
+        self.workers = {}
+        self._ctx = get_context('spawn')
+        self._worker_ids = itertools.count()
+        self._batch_ids = itertools.count()
+        self._in_flight = {}
+        self._busy = {}
+        self._next_get = None
+        self._stopping = False
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=self.worker_target,
+            args=(child_conn, self.model_path, self.backend, self.threads_per_worker),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = Worker(next(self._worker_ids), process, parent_conn)
+        self.workers[worker.id] = worker
+        return worker
+
+    def start(self, timeout=600):
+        workers = [self._spawn() for _ in range(self.num_workers)]
+        # Block until every worker has loaded and warmed up its model
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            try:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError(f"no answer within {timeout}s")
+                kind, _, detail = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                kind, detail = 'error', f"{type(e).__name__}: {e or 'the process exited'}"
+            if kind == 'error':
+                self.stop()
+                raise RuntimeError(f"Model worker failed to start: {detail}")
+            worker.ready = True
+            self.model_id = detail
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        # Ids of workers waiting for a batch; one that died while waiting is skipped
+        self.idle = asyncio.Queue()
+        for worker_id in self.workers:
+            self.idle.put_nowait(worker_id)
+        threading.Thread(target=self._collect_results, name="result-collector", daemon=True).start()
+        while True:
+            worker_id = await self.idle.get()
+            if worker_id not in self.workers:
+                continue
+            items = [await self._next_item(None)]
+            deadline = self.loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                item = self._next_item_nowait()
+                if item is None:
+                    remaining = deadline - self.loop.time()
+                    if remaining <= 0:
+                        break
+                    item = await self._next_item(remaining)
+                    if item is None:
+                        break
+                items.append(item)
+            self._dispatch(worker_id, items)
+
+    async def _next_item(self, timeout):
+        # Keep one pending get() alive across timeouts so no request is ever dropped
+        if self._next_get is None:
+            self._next_get = asyncio.ensure_future(self.queue.get())
+        done, _ = await asyncio.wait({self._next_get}, timeout=timeout)
+        if not done:
+            return None
+        item, self._next_get = self._next_get.result(), None
+        return item
+
+    def _next_item_nowait(self):
+        if self._next_get is not None:
+            if not self._next_get.done():
+                return None
+            item, self._next_get = self._next_get.result(), None
+            return item
+        if self.queue.empty():
+            return None
+        return self.queue.get_nowait()
+
+    def _dispatch(self, worker_id, items):
+        batch_id = next(self._batch_ids)
+        self._in_flight[batch_id] = [future for _, future in items]
+        self._busy[worker_id] = batch_id
+        self.batches += 1
+        self.batched_requests += len(items)
+        try:
+            self.workers[worker_id].conn.send((batch_id, np.stack([arr for arr, _ in items])))
+        except (KeyError, OSError, ValueError):
+            # The worker died while this batch was being collected; its replacement is already on the way
+            self._busy.pop(worker_id, None)
+            self._fail(batch_id, "Model worker exited before the batch could be sent")
+
+    # 📬 Runs on its own thread: waits on every worker's pipe and process sentinel, and hands results
+    # and deaths to the event loop in the order they happened. Only this thread changes ``workers`` after start
+    def _collect_results(self):
+        while not self._stopping:
+            conns = {worker.conn: worker for worker in self.workers.values()}
+            sentinels = {worker.process.sentinel: worker for worker in self.workers.values()}
+            for ready in wait(list(conns) + list(sentinels), timeout=1):
+                if ready in conns:
+                    self._receive(conns[ready])
+                elif sentinels[ready].id in self.workers:
+                    self._replace(sentinels[ready])
+
+    def _receive(self, worker):
+        try:
+            kind, batch_id, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            # The process is gone; its sentinel reports it
+            return False
+        worker.ready = worker.ready or kind == 'ready'
+        self.loop.call_soon_threadsafe(self._complete, worker.id, kind, batch_id, payload)
+        return True
+
+    def _replace(self, worker):
+        # Results the worker sent before it died are delivered first
+        while worker.conn.poll() and self._receive(worker):
+            pass
+        del self.workers[worker.id]
+        worker.conn.close()
+        worker.process.join(timeout=5)
+        exitcode = worker.process.exitcode
+        if self._stopping:
+            return
+        if worker.ready:
+            self.worker_restarts += 1
+            self._spawn()
+        else:
+            # A worker that cannot load the model would fail the same way again
+            print(f"Model worker {worker.process.pid} exited with code {exitcode} before it was ready; not restarting it",
+                  file=sys.stderr, flush=True)
+        self.loop.call_soon_threadsafe(self._worker_died, worker.id, exitcode)
+        if not self.workers:
+            self.loop.call_soon_threadsafe(self._no_workers_left)
+
+    def _worker_died(self, worker_id, exitcode):
+        batch_id = self._busy.pop(worker_id, None)
+        if batch_id is not None:
+            self._fail(batch_id, f"Model worker exited with code {exitcode} while scoring this batch")
+
+    def _no_workers_left(self):
+        # Nothing would ever take the queued requests: fail them (and any batch still in flight) now
+        self.out_of_workers = True
+        error = NoWorkersError("No model workers are running")
+        for batch_id in list(self._in_flight):
+            self._fail(batch_id, error)
+        if self._next_get is not None:
+            if self._next_get.done():
+                self.queue.put_nowait(self._next_get.result())
+            else:
+                self._next_get.cancel()
+            self._next_get = None
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(error)
+
+    def _complete(self, worker_id, kind, batch_id, payload):
+        if kind in ('ready', 'error'):
+            # A replacement worker: ready to take batches, or it could not load the model and will exit
+            if kind == 'ready':
+                self.idle.put_nowait(worker_id)
+            return
+        self._busy.pop(worker_id, None)
+        self.idle.put_nowait(worker_id)
+        if kind != 'done':
+            self._fail(batch_id, payload)
+            return
+        futures = self._in_flight.pop(batch_id, [])
+        for i, future in enumerate(futures):
+            if not future.done():
+                future.set_result((payload[i], len(futures)))
+
+    def _fail(self, batch_id, error):
+        error = error if isinstance(error, Exception) else RuntimeError(error)
+        for future in self._in_flight.pop(batch_id, []):
+            if not future.done():
+                future.set_exception(error)
+
+    async def submit(self, arr):
+        if self.out_of_workers:
+            raise NoWorkersError("No model workers are running")
+        future = self.loop.create_future()
+        self.queue.put_nowait((arr, future))
+        return await future
+
+    def stats(self):
+        return {
+            'workers': self.num_workers,
+            'workers_alive': sum(worker.ready and worker.process.is_alive() for worker in list(self.workers.values())),
+            'worker_restarts': self.worker_restarts,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self.queue.qsize(),
+            'batches': self.batches,
+            'requests': self.batched_requests,
+            'mean_batch_size': self.batched_requests / self.batches if self.batches else 0.0,
+        }
+
+    def stop(self):
+        self._stopping = True
+        workers = list(self.workers.values())
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker.process.join(timeout=5)
+
+
+# Request line and headers; raises ValueError for anything that is not a well-formed HTTP/1.x head
+def parse_request_head(head):
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split(' ')
+    if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+        raise ValueError(f"bad request line {lines[0][:100]!r}")
+    headers = {k.strip().lower(): v.strip() for k, v in (l.split(':', 1) for l in lines[1:] if ':' in l)}
+    length = headers.get('content-length', '0')
+    if not length.isdigit():
+        raise ValueError(f"bad Content-Length {length[:40]!r}")
+    return parts[0], parts[1], headers, int(length)
+
+
+class InferenceServer:
+    """Minimal asyncio HTTP/1.1 front end: POST /predict (raw image bytes), GET /health, GET /stats, GET /metrics."""
+
+    def __init__(self, batcher, class_names, decode_threads=None, telemetry=None, max_body_bytes=DEFAULT_MAX_BODY_MB << 20):
+        self.batcher = batcher
+        self.class_names = class_names
+        self.telemetry = telemetry or Telemetry()
+        self.max_body_bytes = max_body_bytes
+        self.decode_pool = ThreadPoolExecutor(max_workers=decode_threads or os.cpu_count())
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                try:
+                    method, path, headers, length = parse_request_head(head)
+                except ValueError as e:
+                    self.telemetry.count_error('http', e)
+                    await self.respond(writer, 400, {'error': f"Malformed request: {e}"}, keep_alive=False)
+                    break
+                # Refused before reading, so a client cannot make the server buffer an arbitrary body
+                if length > self.max_body_bytes:
+                    self.telemetry.count_error('http', 'body_too_large')
+                    await self.respond(writer, 413, {'error': f"Body of {length} bytes exceeds the {self.max_body_bytes} byte limit"},
+                                       keep_alive=False)
+                    break
+                try:
+                    body = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                status, payload = await self.route(method, path.split('?')[0], body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        # /metrics answers in the Prometheus text format, everything else in JSON
+        if isinstance(payload, str):
+            content_type, data = PROMETHEUS_CONTENT_TYPE, payload.encode('utf-8')
+        else:
+            content_type, data = 'application/json', json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            if self.batcher.out_of_workers:
+                return 503, {'status': 'no model workers', 'model_id': self.batcher.model_id, 'workers': 0}
+            return 200, {'status': 'ok', 'model_id': self.batcher.model_id, 'workers': self.batcher.num_workers}
+        if path == '/stats':
+            return 200, self.batcher.stats()
+        if path == '/metrics':
+            return 200, self.telemetry.prometheus_text()
+        if path != '/predict':
+            return 404, {'error': f"Unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST with the image bytes as the request body"}
+        return await self.predict(body)
+
+    async def predict(self, body):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        self.telemetry.count_request('http')
+        try:
+            # Decode/resize off the event loop; PIL releases the GIL
+            arr = await loop.run_in_executor(self.decode_pool, load_image_uint8, body)
+        except Exception as e:
+            self.telemetry.count_error('http', e)
+            return 400, {'error': f"Could not decode image: {e}"}
+        decoded = time.perf_counter()
+        try:
+            preds, batch_size = await self.batcher.submit(arr)
+        except asyncio.QueueFull as e:
+            self.telemetry.count_error('http', e)
+            return 503, {'error': "Request queue is full"}
+        except NoWorkersError as e:
+            self.telemetry.count_error('http', e)
+            return 503, {'error': str(e)}
+        except RuntimeError as e:
+            self.telemetry.count_error('http', e)
+            return 500, {'error': str(e)}
+        end = time.perf_counter()
+        top_idx = int(np.argmax(preds))
+        # Queueing and batching are part of the inference stage as a client sees it
+        self.telemetry.observe_timings('http', {'decode': decoded - start, 'inference': end - decoded})
+        self.telemetry.count_predictions([self.class_names[top_idx]])
+        return 200, {
+            'prediction': self.class_names[top_idx],
+            'confidence': float(preds[top_idx]),
+            'probabilities': {c: float(p) for c, p in zip(self.class_names, preds)},
+            'batch_size': batch_size,
+            'latency_ms': (end - start) * 1000,
+        }
+
+
+async def serve(host, port, batcher, class_names, decode_threads=None, telemetry=None, max_body_bytes=DEFAULT_MAX_BODY_MB << 20):
+    server = InferenceServer(batcher, class_names, decode_threads, telemetry, max_body_bytes)
+    batch_loop = asyncio.ensure_future(batcher.run())
+    http_server = await asyncio.start_server(server.handle_connection, host, port)
+    print(f"Serving on http://{host}:{port} with {batcher.num_workers} worker(s), "
+          f"max batch {batcher.max_batch_size}, max wait {batcher.max_wait * 1000:.1f} ms", flush=True)
+    # SIGTERM/SIGINT stop the server cleanly so main() can shut the model workers down
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    async with http_server:
+        await stop.wait()
+    batch_loop.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP inference service with dynamic micro-batching.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', help="Path to the model artifact (default: the backend's file under models/)")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument('--workers', type=int, default=1, help="Model worker processes")
+    parser.add_argument('--threads-per-worker', type=int, help="TF intra-op threads per worker (default: TF decides)")
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help="How long a batch waits for more requests")
+    parser.add_argument('--max-queue', type=int, default=1024, help="Pending requests before returning 503")
+    parser.add_argument('--decode-threads', type=int, help="Image decode threads (default: CPU count)")
+    parser.add_argument('--max-body-mb', type=float, default=DEFAULT_MAX_BODY_MB, help="Larger uploads get 413 without being read")
+    args = parser.parse_args(argv)
+
+    batcher = MicroBatcher(
+        workers=args.workers, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue, model_path=args.model, backend=args.backend,
+        threads_per_worker=args.threads_per_worker,
+    )
+    telemetry = Telemetry()
+    start = time.perf_counter()
+    batcher.start()
+    telemetry.set_model_load(args.backend, time.perf_counter() - start)
+    try:
+        asyncio.run(serve(args.host, args.port, batcher, load_class_names(), args.decode_threads, telemetry,
+                          int(args.max_body_mb * (1 << 20))))
+    finally:
+        batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
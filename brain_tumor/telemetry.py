@@ -0,0 +1,230 @@
+import argparse
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .memory import current_rss_mb, peak_rss_mb
+
+# Geometric bucket bounds in seconds (0.5 ms .. ~55 s, x1.25 per step), so a quantile is off by at most one 25% bucket
+LATENCY_BUCKETS = tuple(round(0.0005 * 1.25 ** i, 6) for i in range(53))
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram (the Prometheus model): O(log buckets) to record, constant memory."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate like PromQL's ``histogram_quantile``: linear interpolation inside the target bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.sum / self.count * 1000 if self.count else None,
+            **{f"p{int(q * 100)}_ms": (self.quantile(q) * 1000 if self.count else None) for q in (0.5, 0.95, 0.99)},
+        }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Telemetry:
+    """Process-wide operational metrics: per-stage latency, request/prediction/error counts, model load time.
+
+    Recording takes one short lock and no allocation beyond the first sample of
+    a new label, so it is safe to call on every scan. RSS is read only when the
+    metrics are exported, never on the request path.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self.latency = {}
+        self.requests = {}
+        self.predictions = {}
+        self.errors = {}
+        self.model_load_seconds = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind, stage, seconds):
+        with self._lock:
+            self._histogram(kind, stage).observe(seconds)
+
+    def observe_timings(self, kind, timings):
+        """Record every stage of a ``StageTimer`` plus their sum as ``stage="total"``."""
+        with self._lock:
+            for stage, seconds in timings.items():
+                self._histogram(kind, stage).observe(seconds)
+            self._histogram(kind, 'total').observe(sum(timings.values()))
+
+    def _histogram(self, kind, stage):
+        histogram = self.latency.get((kind, stage))
+        if histogram is None:
+            histogram = self.latency[kind, stage] = LatencyHistogram(self.buckets)
+        return histogram
+
+    def count_request(self, kind, scans=1):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + scans
+
+    def count_predictions(self, class_names):
+        with self._lock:
+            for cls in class_names:
+                self.predictions[cls] = self.predictions.get(cls, 0) + 1
+
+    def count_error(self, kind, error):
+        key = (kind, type(error).__name__ if isinstance(error, BaseException) else str(error))
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def set_model_load(self, name, seconds):
+        with self._lock:
+            self.model_load_seconds[name] = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_seconds': time.time() - self.started_at,
+                'latency': {f"{kind}/{stage}": h.summary() for (kind, stage), h in self.latency.items()},
+                'requests': dict(self.requests),
+                'predictions': dict(self.predictions),
+                'errors': {f"{kind}/{error}": n for (kind, error), n in self.errors.items()},
+                'model_load_seconds': dict(self.model_load_seconds),
+                'rss_mb': current_rss_mb(),
+                'peak_rss_mb': peak_rss_mb(),
+            }
+
+    def prometheus_text(self, prefix='brain_tumor'):
+        """Render the text exposition format (0.0.4) a Prometheus scraper or node_exporter's textfile collector reads."""
+        lines = [
+            f"# HELP {prefix}_stage_latency_seconds Wall-clock time per pipeline stage, by request kind.",
+            f"# TYPE {prefix}_stage_latency_seconds histogram",
+        ]
+        with self._lock:
+            for (kind, stage), h in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f"{prefix}_stage_latency_seconds_bucket{_labels(kind=kind, stage=stage, le=f'{bound:g}')} {cumulative}")
+                lines.append(f"{prefix}_stage_latency_seconds_bucket{_labels(kind=kind, stage=stage, le='+Inf')} {h.count}")
+                lines.append(f"{prefix}_stage_latency_seconds_sum{_labels(kind=kind, stage=stage)} {h.sum:.6f}")
+                lines.append(f"{prefix}_stage_latency_seconds_count{_labels(kind=kind, stage=stage)} {h.count}")
+            lines += [f"# HELP {prefix}_requests_total Scans submitted, by request kind.",
+                      f"# TYPE {prefix}_requests_total counter"]
+            lines += [f"{prefix}_requests_total{_labels(kind=k)} {n}" for k, n in sorted(self.requests.items())]
+            lines += [f"# HELP {prefix}_predictions_total Scans scored, by predicted class.",
+                      f"# TYPE {prefix}_predictions_total counter"]
+            lines += [f"{prefix}_predictions_total{_labels(**{'class': c})} {n}" for c, n in sorted(self.predictions.items())]
+            lines += [f"# HELP {prefix}_errors_total Failed requests, by request kind and exception type.",
+                      f"# TYPE {prefix}_errors_total counter"]
+            lines += [f"{prefix}_errors_total{_labels(kind=k, error=e)} {n}" for (k, e), n in sorted(self.errors.items())]
+            lines += [f"# HELP {prefix}_model_load_seconds Time to load and warm up each model.",
+                      f"# TYPE {prefix}_model_load_seconds gauge"]
+            lines += [f"{prefix}_model_load_seconds{_labels(model=m)} {s:.3f}" for m, s in sorted(self.model_load_seconds.items())]
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {int(current_rss_mb() * 1024 * 1024)}",
+            f"# HELP {prefix}_peak_resident_memory_bytes Peak resident memory size in bytes.",
+            f"# TYPE {prefix}_peak_resident_memory_bytes gauge",
+            f"{prefix}_peak_resident_memory_bytes {int(peak_rss_mb() * 1024 * 1024)}",
+            "# HELP process_start_time_seconds Start time of the process since unix epoch in seconds.",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started_at:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Written to a temp file and renamed, so a scraper never reads a half-written file
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(path + '.tmp', path)
+
+
+# 📡 GET /metrics on a daemon thread, for a Prometheus scrape job
+def start_http_exporter(telemetry, port, host='0.0.0.0'):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = telemetry.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    return server
+
+
+# 📝 Rewrite a .prom file every ``interval`` seconds (node_exporter textfile collector)
+def start_textfile_exporter(telemetry, path, interval=15.0):
+    def run():
+        while True:
+            try:
+                telemetry.write_prometheus(path)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="metrics-textfile", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the per-call cost of recording a latency sample.")
+    parser.add_argument('--samples', type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    telemetry = Telemetry()
+    timings = {'cache': 0.0004, 'decode': 0.004, 'inference': 0.12, 'render': 0.03}
+    start = time.perf_counter()
+    for _ in range(args.samples):
+        telemetry.observe('single', 'inference', 0.12)
+    per_observe = (time.perf_counter() - start) / args.samples
+    start = time.perf_counter()
+    for _ in range(args.samples // 10):
+        telemetry.observe_timings('single', timings)
+    per_request = (time.perf_counter() - start) / (args.samples // 10)
+    print(f"observe(): {per_observe * 1e6:.2f} us; observe_timings() for a {len(timings)}-stage scan: {per_request * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Accumulates wall-clock time per named stage using a monotonic clock.
+
+    ``on_stage`` is called with the stage name as each stage starts, which lets
+    a UI drive its progress indicator from the real pipeline.
+    """
+
+    def __init__(self, on_stage=None):
+        self.timings = {}
+        self.on_stage = on_stage
+
+    @contextmanager
+    def stage(self, name):
+        if self.on_stage is not None:
+            self.on_stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from .inference import DEFAULT_MODEL_PATH, IMG_SIZE, MODELS_DIR
+from .memory import current_rss_mb, peak_rss_mb
+from .score_dir import iter_image_paths
+
+# Notebook defaults: the meningioma weight is boosted on top of the balanced weights
+DEFAULT_CLASS_WEIGHT_BOOST = {'meningioma': 1.3}
+
+
+# 📂 Kaggle-style tree (root/<class>/<file>): class names sorted like image_dataset_from_directory
+def list_training_files(data_dir):
+    class_names = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    paths, labels = [], []
+    for rel_path in iter_image_paths(data_dir):
+        cls = rel_path.split(os.sep)[0]
+        if cls in class_names:
+            paths.append(os.path.join(data_dir, rel_path))
+            labels.append(class_names.index(cls))
+    return paths, np.array(labels, dtype=np.int32), class_names
+
+
+# 🎲 Seeded shuffle, then the last `validation_split` fraction is held out
+def split_files(paths, labels, validation_split=0.2, seed=42):
+    order = np.random.default_rng(seed).permutation(len(paths))
+    num_val = int(len(paths) * validation_split)
+    train_idx, val_idx = order[:len(order) - num_val], order[len(order) - num_val:]
+    return ([paths[i] for i in train_idx], labels[train_idx]), ([paths[i] for i in val_idx], labels[val_idx])
+
+
+# ⚖️ Balanced class weights from file counts (no pass over the decoded dataset)
+def compute_class_weights(labels, class_names, boost=None):
+    counts = Counter(labels.tolist())
+    total = len(labels)
+    weights = {i: total / (len(class_names) * counts[i]) if counts[i] else 0.0 for i in range(len(class_names))}
+    for cls, factor in (boost or {}).items():
+        if cls in class_names:
+            weights[class_names.index(cls)] *= factor
+    return weights
+
+
+# 🎨 The notebook's augmentation, applied to pixel values in [0, 255] before rescaling
+def build_augmentation(seed=None):
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    return tf.keras.Sequential([
+        layers.RandomFlip('horizontal_and_vertical', seed=seed),
+        layers.RandomRotation(0.2, seed=seed),
+        layers.RandomZoom(0.15, seed=seed),
+        layers.RandomBrightness(0.2, seed=seed),
+        layers.RandomContrast(0.2, seed=seed),
+        layers.RandomTranslation(0.1, 0.1, seed=seed),
+    ], name='augmentation')
+
+
+def make_dataset(paths, labels, batch_size=32, image_size=IMG_SIZE, training=False, augmentation=None,
+                 cache_path='', seed=42):
+    """Decode -> uint8 cache -> (shuffle) -> batch -> (augment) -> rescale -> prefetch.
+
+    Decoded images are cached as uint8 (a quarter of the float32 size) and
+    augmentation runs after the cache, so every epoch sees fresh views.
+    ``cache_path=''`` caches in memory; a file prefix caches on disk.
+    ``cache_path=None`` skips the cache, for pipelines that are read once.
+    """
+    import tensorflow as tf
+
+    autotune = tf.data.AUTOTUNE
+
+    def decode(path, label):
+        img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        img = tf.image.resize(img, (image_size[1], image_size[0]))
+        return tf.cast(tf.clip_by_value(tf.round(img), 0, 255), tf.uint8), label
+
+    ds = tf.data.Dataset.from_tensor_slices((list(paths), labels))
+    ds = ds.map(decode, num_parallel_calls=autotune)
+    if cache_path is not None:
+        ds = ds.cache(cache_path)
+    if training:
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    if training and augmentation is not None:
+        ds = ds.map(lambda x, y: (augmentation(tf.cast(x, tf.float32), training=True), y), num_parallel_calls=autotune)
+    ds = ds.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=autotune)
+    return ds.prefetch(autotune)
+
+
+# 🧬 InceptionV3 backbone with the notebook's GAP -> Dropout(0.5) -> Dense(softmax) head
+def build_model(num_classes, weights='imagenet', image_size=IMG_SIZE):
+    import tensorflow as tf
+    from tensorflow.keras import layers
+    from tensorflow.keras.applications import InceptionV3
+
+    base_model = InceptionV3(weights=weights, include_top=False, input_shape=(image_size[1], image_size[0], 3))
+    base_model.trainable = False
+    inputs = tf.keras.Input(shape=(image_size[1], image_size[0], 3))
+    x = base_model(inputs, training=False)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.5)(x)
+    outputs = layers.Dense(num_classes, activation='softmax')(x)
+    return tf.keras.Model(inputs, outputs), base_model
+
+
+def make_epoch_stats_callback(phase, records):
+    import tensorflow as tf
+
+    class EpochStats(tf.keras.callbacks.Callback):
+        """Records wall time, RSS and metrics for every epoch."""
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            record = {
+                'phase': phase,
+                'epoch': epoch + 1,
+                'seconds': time.perf_counter() - self.start,
+                'rss_mb': current_rss_mb(),
+                'peak_rss_mb': peak_rss_mb(),
+            }
+            record.update({k: float(v) for k, v in (logs or {}).items()})
+            records.append(record)
+            print(f"[{phase}] epoch {record['epoch']}: {record['seconds']:.1f}s, "
+                  f"RSS {record['rss_mb']:.0f} MB (peak {record['peak_rss_mb']:.0f} MB), "
+                  f"val_accuracy {record.get('val_accuracy', float('nan')):.4f}", file=sys.stderr)
+
+    return EpochStats()
+
+
+# 💾 Write to a temporary name and rename, so a running app never loads a half-written model
+def save_artifacts(model, class_names, output_dir, model_name=os.path.basename(DEFAULT_MODEL_PATH)):
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, model_name)
+    tmp_path = os.path.join(output_dir, f".tmp-{model_name}")
+    model.save(tmp_path)
+    os.replace(tmp_path, model_path)
+    class_names_path = os.path.join(output_dir, 'class_names.json')
+    with open(class_names_path + '.tmp', 'w') as f:
+        json.dump(class_names, f)
+    os.replace(class_names_path + '.tmp', class_names_path)
+    return model_path, class_names_path
+
+
+def train(data_dir, output_dir=MODELS_DIR, epochs=15, finetune_epochs=15, finetune_layers=150,
+          learning_rate=1e-3, finetune_learning_rate=1e-6, batch_size=32, validation_split=0.2, seed=42,
+          weights='imagenet', cache_dir=None, class_weight_boost=DEFAULT_CLASS_WEIGHT_BOOST,
+          patience=3, deterministic=False, bottleneck_dir=None):
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+    if deterministic:
+        tf.config.experimental.enable_op_determinism()
+
+    paths, labels, class_names = list_training_files(data_dir)
+    (train_paths, train_labels), (val_paths, val_labels) = split_files(paths, labels, validation_split, seed)
+    class_weights = compute_class_weights(train_labels, class_names, class_weight_boost)
+    print(f"{len(train_paths)} training / {len(val_paths)} validation images, classes {class_names}", file=sys.stderr)
+    print(f"Class weights: {class_weights}", file=sys.stderr)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    cache_path = lambda name: os.path.join(cache_dir, name) if cache_dir else ''
+    train_ds = make_dataset(train_paths, train_labels, batch_size, training=True, augmentation=build_augmentation(seed),
+                            cache_path=cache_path('train'), seed=seed)
+    val_ds = make_dataset(val_paths, val_labels, batch_size, cache_path=cache_path('val'))
+
+    model, base_model = build_model(len(class_names), weights=weights)
+    records = []
+    early_stop = lambda: tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+
+    start = time.perf_counter()
+    extract_seconds = None
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    if epochs and bottleneck_dir:
+        # The backbone is frozen in this phase: run it once and train the head on cached pooled features
+        from .features import build_head, extract_features, transfer_head
+
+        features = extract_features(base_model, train_paths + val_paths, bottleneck_dir, batch_size)
+        extract_seconds = time.perf_counter() - start
+        train_features, val_features = features[:len(train_paths)], features[len(train_paths):]
+        head = build_head(len(class_names), features.shape[1])
+        head.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+        head.fit(train_features, train_labels, validation_data=(val_features, val_labels), epochs=epochs,
+                 batch_size=batch_size, shuffle=True, class_weight=class_weights,
+                 callbacks=[early_stop(), make_epoch_stats_callback('head', records)], verbose=2)
+        transfer_head(head, model)
+    elif epochs:
+        model.fit(train_ds, validation_data=val_ds, epochs=epochs, class_weight=class_weights,
+                  callbacks=[early_stop(), make_epoch_stats_callback('head', records)], verbose=2)
+
+    # Fine-tune the top of the backbone with a much lower learning rate
+    if finetune_epochs:
+        base_model.trainable = True
+        for layer in base_model.layers[:-finetune_layers]:
+            layer.trainable = False
+        model.compile(optimizer=tf.keras.optimizers.Adam(finetune_learning_rate), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+        model.fit(train_ds, validation_data=val_ds, epochs=finetune_epochs, class_weight=class_weights,
+                  callbacks=[early_stop(), make_epoch_stats_callback('finetune', records)], verbose=2)
+    train_seconds = time.perf_counter() - start
+
+    model_path, class_names_path = save_artifacts(model, class_names, output_dir)
+    return {
+        'model_path': model_path,
+        'class_names_path': class_names_path,
+        'class_names': class_names,
+        'class_weights': {class_names[i]: w for i, w in class_weights.items()},
+        'train_images': len(train_paths),
+        'val_images': len(val_paths),
+        'train_seconds': train_seconds,
+        'feature_extraction_seconds': extract_seconds,
+        'mean_epoch_seconds': float(np.mean([r['seconds'] for r in records])) if records else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'epochs': records,
+    }
+
+
+def parse_boost(values):
+    boost = {}
+    for value in values:
+        cls, _, factor = value.partition('=')
+        boost[cls] = float(factor)
+    return boost
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the InceptionV3 brain tumor classifier and write the app's model artifacts.")
+    parser.add_argument('data_dir', help="Training directory with one sub-directory per class, e.g. brain_tumor_dataset/Training")
+    parser.add_argument('--output-dir', default=MODELS_DIR, help="Where to write the .keras model and class_names.json")
+    parser.add_argument('--epochs', type=int, default=15, help="Epochs with the backbone frozen")
+    parser.add_argument('--finetune-epochs', type=int, default=15, help="Epochs fine-tuning the top of the backbone")
+    parser.add_argument('--finetune-layers', type=int, default=150, help="Backbone layers unfrozen for fine-tuning")
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    parser.add_argument('--finetune-learning-rate', type=float, default=1e-6)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--validation-split', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--patience', type=int, default=3, help="Early-stopping patience on val_loss")
+    parser.add_argument('--weights', default='imagenet', help="Backbone initialization: 'imagenet' or 'none'")
+    parser.add_argument('--cache-dir', help="Cache decoded uint8 images on disk instead of in memory")
+    parser.add_argument('--class-weight-boost', nargs='*', default=[f"{k}={v}" for k, v in DEFAULT_CLASS_WEIGHT_BOOST.items()],
+                        metavar='CLASS=FACTOR', help="Extra factors on top of the balanced class weights")
+    parser.add_argument('--bottleneck-cache', metavar='DIR',
+                        help="Train the head from backbone features cached here (extracted once, resumable)")
+    parser.add_argument('--deterministic', action='store_true', help="Enable TF op determinism (slower)")
+    parser.add_argument('--report', help="Write per-epoch timings and memory as JSON (default: <output-dir>/training_report.json)")
+    args = parser.parse_args(argv)
+
+    report = train(
+        args.data_dir, output_dir=args.output_dir, epochs=args.epochs, finetune_epochs=args.finetune_epochs,
+        finetune_layers=args.finetune_layers, learning_rate=args.learning_rate,
+        finetune_learning_rate=args.finetune_learning_rate, batch_size=args.batch_size,
+        validation_split=args.validation_split, seed=args.seed,
+        weights=None if args.weights.lower() == 'none' else args.weights, cache_dir=args.cache_dir,
+        class_weight_boost=parse_boost(args.class_weight_boost), patience=args.patience,
+        deterministic=args.deterministic, bottleneck_dir=args.bottleneck_cache,
+    )
+    with open(args.report or os.path.join(args.output_dir, 'training_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {report['model_path']} and {report['class_names_path']}; "
+          f"{len(report['epochs'])} epochs in {report['train_seconds']:.0f}s "
+          f"(mean {report['mean_epoch_seconds'] or 0:.1f}s/epoch), peak RSS {report['peak_rss_mb']:.0f} MB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+from PIL import Image
+
+from .inference import normalize_batch
+
+
+def _rotate(degrees):
+    return lambda img: img.rotate(degrees, resample=Image.BILINEAR)
+
+
+def _center_crop(fraction):
+    def crop(img):
+        width, height = img.size
+        dx, dy = int(width * (1 - fraction) / 2), int(height * (1 - fraction) / 2)
+        return img.crop((dx, dy, width - dx, height - dy)).resize((width, height), Image.BILINEAR)
+    return crop
+
+
+def _compose(*ops):
+    def apply(img):
+        for op in ops:
+            img = op(img)
+        return img
+    return apply
+
+
+_hflip = lambda img: img.transpose(Image.FLIP_LEFT_RIGHT)
+_vflip = lambda img: img.transpose(Image.FLIP_TOP_BOTTOM)
+
+# 🎲 Views in the order they are added as N grows; all stay inside the notebook's training
+# augmentation (flips, RandomRotation(0.2), RandomZoom(0.15)), and the raw image always comes first
+TTA_VIEWS = [
+    ('original', lambda img: img),
+    ('hflip', _hflip),
+    ('rotate+10', _rotate(10)),
+    ('rotate-10', _rotate(-10)),
+    ('crop90', _center_crop(0.9)),
+    ('vflip', _vflip),
+    ('hflip+crop90', _compose(_hflip, _center_crop(0.9))),
+    ('hflip+rotate+10', _compose(_hflip, _rotate(10))),
+    ('rotate+20', _rotate(20)),
+    ('rotate-20', _rotate(-20)),
+    ('crop85', _center_crop(0.85)),
+    ('hflip+vflip', _compose(_hflip, _vflip)),
+]
+MAX_TTA_VIEWS = len(TTA_VIEWS)
+
+
+# 🧩 N augmented copies of each model-sized uint8 scan, stacked image-major into one NHWC batch
+def make_tta_batch(img_batch, num_views):
+    if not 1 <= num_views <= MAX_TTA_VIEWS:
+        raise ValueError(f"num_views must be between 1 and {MAX_TTA_VIEWS}, got {num_views}")
+    img_batch = np.asarray(img_batch, dtype=np.uint8)
+    views = np.empty((len(img_batch) * num_views,) + img_batch.shape[1:], dtype=np.uint8)
+    for i, arr in enumerate(img_batch):
+        img = Image.fromarray(arr)
+        for j, (_, view) in enumerate(TTA_VIEWS[:num_views]):
+            views[i * num_views + j] = np.asarray(view(img), dtype=np.uint8)
+    return views
+
+
+def predict_tta(predict_fn, img_batch, num_views=8):
+    """Score every scan as ``num_views`` augmented views in a single forward pass.
+
+    ``img_batch`` is NHWC uint8 at the model input size and ``predict_fn`` maps a
+    normalized float32 batch to softmax rows (``classifier.predict_array`` or
+    ``scheduler.predict``). Returns ``(mean_probs, view_std)``: the softmax
+    averaged over views, and its per-class standard deviation across views as
+    an uncertainty signal.
+    """
+    views = make_tta_batch(img_batch, num_views)
+    probs = np.asarray(predict_fn(normalize_batch(views))).reshape(len(img_batch), num_views, -1)
+    return probs.mean(axis=1), probs.std(axis=1)
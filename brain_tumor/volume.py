@@ -0,0 +1,262 @@
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from .backends import BACKENDS, DEFAULT_BACKEND
+from .inference import IMG_SIZE, BrainTumorClassifier, load_image_uint8, normalize_batch
+
+VOLUME_EXTENSIONS = ('.dcm', '.nii', '.nii.gz')
+VOLUME_READERS = {'.dcm': 'pydicom', '.nii': 'nibabel', '.nii.gz': 'nibabel'}
+
+# Transfer syntaxes whose pixel data is stored raw and can be memory-mapped
+_NATIVE_LITTLE_ENDIAN = ('1.2.840.10008.1.2', '1.2.840.10008.1.2.1')
+_NATIVE_BIG_ENDIAN = ('1.2.840.10008.1.2.2',)
+
+
+def is_volume_path(name):
+    return name.lower().endswith(VOLUME_EXTENSIONS)
+
+
+# Extensions whose reader library is installed (both are in requirements.txt, but imported lazily)
+def readable_volume_extensions():
+    return tuple(ext for ext in VOLUME_EXTENSIONS if importlib.util.find_spec(VOLUME_READERS[ext]) is not None)
+
+
+class NiftiVolume:
+    """NIfTI volume read one axial slice at a time.
+
+    Uncompressed ``.nii`` files are memory-mapped; ``.nii.gz`` is decompressed
+    as slices are requested. Only the requested slice is ever scaled to float.
+    """
+
+    def __init__(self, path):
+        import nibabel as nib
+
+        self.path = path
+        self.image = nib.load(path, mmap='r')
+        self.shape = self.image.shape
+        self.num_slices = self.shape[2]
+        header = self.image.header
+        cal_min, cal_max = float(header['cal_min']), float(header['cal_max'])
+        self.window = ((cal_min + cal_max) / 2, cal_max - cal_min) if cal_max > cal_min else None
+        self.invert = False
+
+    def __len__(self):
+        return self.num_slices
+
+    def get_slice(self, z):
+        index = (slice(None), slice(None), z) + (0,) * (len(self.shape) - 3)
+        pixels = np.asarray(self.image.dataobj[index], dtype=np.float32)
+        # NIfTI stores (x, y); show rows top to bottom like the 2D scans
+        return pixels.T[::-1]
+
+
+class DicomSeries:
+    """DICOM series (one file per slice, or a multi-frame file) read one slice at a time.
+
+    Headers are parsed without pixel data and slices are ordered along the
+    z-axis. Uncompressed monochrome pixel data is memory-mapped straight from
+    the file; compressed frames are decoded individually.
+    """
+
+    def __init__(self, paths):
+        import pydicom
+
+        frames = []
+        for path in paths:
+            ds = pydicom.dcmread(path, defer_size=1024)
+            for frame in range(int(ds.get('NumberOfFrames', 1) or 1)):
+                position = ds.get('ImagePositionPatient')
+                order = float(position[2]) if position else float(ds.get('InstanceNumber', 0) or 0)
+                frames.append((order, path, frame))
+            header = ds
+        if not frames:
+            raise ValueError("No DICOM slices found")
+        frames.sort(key=lambda f: (f[0], f[2]))
+        self.frames = [(path, frame) for _, path, frame in frames]
+        self.num_slices = len(self.frames)
+        self.rows, self.columns = int(header.Rows), int(header.Columns)
+        self.slope = float(header.get('RescaleSlope', 1) or 1)
+        self.intercept = float(header.get('RescaleIntercept', 0) or 0)
+        self.invert = header.get('PhotometricInterpretation') == 'MONOCHROME1'
+        center, width = header.get('WindowCenter'), header.get('WindowWidth')
+        if center is not None and width is not None:
+            first = lambda v: float(v[0] if isinstance(v, pydicom.multival.MultiValue) else v)
+            self.window = (first(center), first(width))
+        else:
+            self.window = None
+        self._memmaps = {}
+
+    def __len__(self):
+        return self.num_slices
+
+    def _memmap(self, path):
+        import pydicom
+
+        if path not in self._memmaps:
+            ds = pydicom.dcmread(path, defer_size=1024)
+            syntax = str(ds.file_meta.TransferSyntaxUID)
+            pixel_data = ds.get_item('PixelData', keep_deferred=True)
+            mappable = (syntax in _NATIVE_LITTLE_ENDIAN + _NATIVE_BIG_ENDIAN
+                        and int(ds.get('SamplesPerPixel', 1)) == 1
+                        and int(ds.BitsAllocated) in (8, 16, 32)
+                        and getattr(pixel_data, 'value_tell', None) is not None)
+            if mappable:
+                kind = 'i' if int(ds.get('PixelRepresentation', 0)) else 'u'
+                byteorder = '>' if syntax in _NATIVE_BIG_ENDIAN else '<'
+                dtype = np.dtype(f"{byteorder}{kind}{int(ds.BitsAllocated) // 8}")
+                frames = int(ds.get('NumberOfFrames', 1) or 1)
+                self._memmaps[path] = np.memmap(path, dtype=dtype, mode='r', offset=pixel_data.value_tell,
+                                                shape=(frames, int(ds.Rows), int(ds.Columns)))
+            else:
+                self._memmaps[path] = None
+        return self._memmaps[path]
+
+    def get_slice(self, z):
+        path, frame = self.frames[z]
+        mapped = self._memmap(path)
+        if mapped is not None:
+            pixels = mapped[frame]
+        else:
+            from pydicom.pixels import pixel_array
+
+            pixels = pixel_array(path, index=frame)
+            if pixels.ndim == 3:
+                pixels = pixels.mean(axis=-1)
+        return pixels.astype(np.float32) * self.slope + self.intercept
+
+
+# 📂 A .nii/.nii.gz file, a single (multi-frame) .dcm file, a directory of .dcm slices, or a list of them
+def open_volume(source):
+    if isinstance(source, (list, tuple)):
+        if len(source) == 1:
+            return open_volume(source[0])
+        return DicomSeries(list(source))
+    if os.path.isdir(source):
+        return DicomSeries(sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith('.dcm')))
+    if source.lower().endswith(('.nii', '.nii.gz')):
+        return NiftiVolume(source)
+    if source.lower().endswith('.dcm'):
+        return DicomSeries([source])
+    raise ValueError(f"Unsupported volume {source!r}, expected one of {VOLUME_EXTENSIONS} or a DICOM directory")
+
+
+# 🪟 Window from robust percentiles of a few evenly spaced, subsampled slices
+def estimate_window(volume, samples=16, percentiles=(0.5, 99.5)):
+    indices = np.unique(np.linspace(0, len(volume) - 1, min(samples, len(volume))).round().astype(int))
+    values = np.concatenate([volume.get_slice(z)[::4, ::4].ravel() for z in indices])
+    low, high = np.percentile(values, percentiles)
+    return float((low + high) / 2), float(max(high - low, 1e-6))
+
+
+def apply_window(pixels, center, width, invert=False):
+    scaled = (pixels - (center - width / 2)) * (255.0 / width)
+    windowed = np.clip(scaled, 0, 255).astype(np.uint8)
+    return 255 - windowed if invert else windowed
+
+
+def windowed_slice(volume, z, window):
+    return apply_window(volume.get_slice(z), *window, invert=volume.invert)
+
+
+# 🧵 Window and resize slice by slice into a reused uint8 NHWC buffer; float32 only ever exists per batch
+def iter_slice_batches(volume, batch_size=16, window=None, target_size=IMG_SIZE):
+    window = window or volume.window or estimate_window(volume)
+    buffer = np.empty((batch_size, target_size[1], target_size[0], 3), dtype=np.uint8)
+    for start in range(0, len(volume), batch_size):
+        count = min(batch_size, len(volume) - start)
+        for i in range(count):
+            # Same RGB conversion and resize as 2D uploads, so slices match what predict_image expects
+            buffer[i] = load_image_uint8(windowed_slice(volume, start + i, window), target_size)
+        yield start, buffer[:count]
+
+
+def predict_volume(classifier, volume, batch_size=16, window=None, num_thumbnails=12, thumbnail_size=96,
+                   predict_fn=None, progress_callback=None):
+    """Stream every slice through the model and aggregate the study.
+
+    Returns a dict with ``slice_probs`` (one softmax per slice, i.e. the
+    per-class probability curve along z), the slice and tumor class with the
+    highest probability, and evenly spaced ``(z, thumbnail)`` pairs.
+    """
+    predict_fn = predict_fn or classifier.predict_array
+    window = window or volume.window or estimate_window(volume)
+    class_names = classifier.class_names
+    num_slices = len(volume)
+    slice_probs = np.empty((num_slices, len(class_names)), dtype=np.float32)
+    thumbnail_indices = set(np.linspace(0, num_slices - 1, min(num_thumbnails, num_slices)).round().astype(int).tolist())
+    thumbnails = []
+
+    start_time = time.perf_counter()
+    for start, batch in iter_slice_batches(volume, batch_size, window, classifier.input_size):
+        slice_probs[start:start + len(batch)] = predict_fn(normalize_batch(batch))
+        for i in range(len(batch)):
+            if start + i in thumbnail_indices:
+                thumbnails.append((start + i, Image.fromarray(batch[i]).resize((thumbnail_size, thumbnail_size))))
+        if progress_callback:
+            progress_callback(start + len(batch), num_slices)
+    elapsed = time.perf_counter() - start_time
+
+    # The peak finding ignores "notumor" so a single suspicious slice is not averaged away
+    tumor_idx = [i for i, c in enumerate(class_names) if c != 'notumor'] or list(range(len(class_names)))
+    tumor_probs = slice_probs[:, tumor_idx]
+    max_slice, max_col = np.unravel_index(int(np.argmax(tumor_probs)), tumor_probs.shape)
+    return {
+        'num_slices': num_slices,
+        'window': tuple(float(v) for v in window),
+        'class_names': list(class_names),
+        'slice_probs': slice_probs,
+        'max_slice': int(max_slice),
+        'max_class': class_names[tumor_idx[max_col]],
+        'max_probability': float(tumor_probs[max_slice, max_col]),
+        'thumbnails': thumbnails,
+        'seconds': elapsed,
+    }
+
+
+# 🎞 Thumbnails side by side with a thin gap
+def make_thumbnail_strip(thumbnails, gap=4):
+    if not thumbnails:
+        return None
+    width, height = thumbnails[0][1].size
+    strip = Image.new('RGB', (len(thumbnails) * (width + gap) - gap, height), 'white')
+    for i, (_, thumb) in enumerate(thumbnails):
+        strip.paste(thumb, (i * (width + gap), 0))
+    return strip
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a DICOM series or NIfTI volume slice by slice.")
+    parser.add_argument('source', nargs='+', help="A .nii/.nii.gz file, a DICOM directory, or .dcm files of one series")
+    parser.add_argument('--model', help="Path to the model artifact (default: the backend's file under models/)")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument('--batch-size', type=int, default=16, help="Slices per forward pass")
+    parser.add_argument('--window', type=float, nargs=2, metavar=('CENTER', 'WIDTH'),
+                        help="Intensity window (default: from the header, else robust percentiles)")
+    parser.add_argument('--output', help="Write the per-slice report as JSON")
+    parser.add_argument('--strip', help="Save the slice thumbnail strip as an image")
+    args = parser.parse_args(argv)
+
+    volume = open_volume(args.source)
+    classifier = BrainTumorClassifier(model_path=args.model, batch_size=args.batch_size, backend=args.backend)
+    result = predict_volume(classifier, volume, batch_size=args.batch_size, window=args.window)
+    print(f"{result['num_slices']} slices in {result['seconds']:.1f}s; peak {result['max_class']} "
+          f"{result['max_probability'] * 100:.1f}% at slice {result['max_slice']}", file=sys.stderr)
+
+    if args.output:
+        report = {k: v for k, v in result.items() if k not in ('slice_probs', 'thumbnails')}
+        report['class_curves'] = {c: result['slice_probs'][:, i].round(6).tolist() for i, c in enumerate(result['class_names'])}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.strip:
+        make_thumbnail_strip(result['thumbnails']).save(args.strip)
+
+
+if __name__ == "__main__":
+    main()
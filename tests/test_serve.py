@@ -0,0 +1,79 @@
+import asyncio
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from brain_tumor.serve import InferenceServer, MicroBatcher
+
+CLASS_NAMES = ['glioma', 'meningioma', 'notumor', 'pituitary']
+
+
+# Stand-ins for the model worker (module level, so the spawned processes can import them)
+def fake_worker(conn, model_path, backend, threads):
+    conn.send(('ready', os.getpid(), 'fake-model'))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        batch_id, batch = task
+        conn.send(('done', batch_id, np.full((len(batch), len(CLASS_NAMES)), 0.25, dtype=np.float32)))
+
+
+def dies_before_ready(conn, model_path, backend, threads):
+    os._exit(1)
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('L', (64, 64), 128).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+async def request(port, method, path, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+def test_requests_get_503_once_every_worker_is_gone():
+    async def scenario():
+        batcher = MicroBatcher(workers=2, max_wait_ms=1, worker_target=fake_worker)
+        batcher.start(timeout=60)
+        server = InferenceServer(batcher, CLASS_NAMES, decode_threads=2)
+        batch_loop = asyncio.ensure_future(batcher.run())
+        http_server = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0)
+        port = http_server.sockets[0].getsockname()[1]
+        image = png_bytes()
+        try:
+            assert await request(port, 'POST', '/predict', image) == 200
+
+            # Replacements cannot load their model, so killing the workers leaves none
+            batcher.worker_target = dies_before_ready
+            for worker in list(batcher.workers.values()):
+                worker.process.kill()
+            # A request racing the deaths is answered (failed), never left waiting
+            assert await asyncio.wait_for(request(port, 'POST', '/predict', image), 30) in (200, 500, 503)
+
+            deadline = time.monotonic() + 30
+            while not batcher.out_of_workers:
+                assert time.monotonic() < deadline, "the batcher never noticed that no worker is left"
+                await asyncio.sleep(0.05)
+            start = time.monotonic()
+            assert await asyncio.wait_for(request(port, 'POST', '/predict', image), 5) == 503
+            assert time.monotonic() - start < 1
+            assert await request(port, 'GET', '/health') == 503
+        finally:
+            http_server.close()
+            batch_loop.cancel()
+            batcher.stop()
+
+    asyncio.run(scenario())